@@ -7,8 +7,6 @@
 from .cloptionparser import CLOptionParser
 from .util import *
 from .storagemanager import StorageManager, StorageManagerSQLite
-from .mpmanager import MPManager
-from .mpreaderwriter import DockingFileReader, Writer
 from .parsers import parse_single_dlg, parse_vina_result
 from .receptormanager import ReceptorManager
 from .resultsmanager import ResultsManager
@@ -31,6 +29,22 @@ from .exceptions import FileParsingError, WriteToStorageError, MultiprocessingEr
 from .exceptions import ResultsProcessingError
 from .exceptions import OutputError
 
+# multiprocess is only imported when the file parsing classes are first used
+_lazy_imports = {
+    "MPManager": ".mpmanager",
+    "DockingFileReader": ".mpreaderwriter",
+    "Writer": ".mpreaderwriter",
+}
+
+
+def __getattr__(name):
+    if name in _lazy_imports:
+        import importlib
+
+        return getattr(importlib.import_module(_lazy_imports[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 __all__ = [
     "CLOptionParser",
     "StorageManager",
@@ -140,6 +140,7 @@ def cmdline_parser(defaults={}):
 
     return args
 
+
 def main():
     time0 = time.perf_counter()
     logger = logutils.LOGGER
@@ -267,8 +268,10 @@ def main():
                     csv_name = args.save_bookmark + ".csv"
                 else:
                     csv_name = "crossref.csv"
-                dataframe = dbman.to_dataframe(previous_bookmarkname, table=True)
-                dataframe.to_csv(csv_name)
+                output_manager.write_csv(
+                    csv_name,
+                    *dbman.fetch_data_chunks(previous_bookmarkname, table=True),
+                )
                 logger.info("Exported bookmark to csv")
 
         logger.info(
@@ -288,5 +291,6 @@ def main():
         sys.exit(1)
     return
 
+
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
@@ -52,6 +52,10 @@ def main():
                     enumerate_interaction_combs=outopts.enumerate_interaction_combs,
                 )
 
+            # -#-#- Filter with a batch of filter sets
+            if readopts["filter_sets"]:
+                rtcore.filter_batch(readopts["filter_sets"])
+
             # Write log with new data for previous filtering results
             if cmdinput.data_from_bookmark and not cmdinput.filtering:
                 rtcore.get_previous_filter_data()
@@ -60,9 +64,25 @@ def main():
             if readopts["find_similar_ligands"]:
                 rtcore.find_similar_ligands(readopts["find_similar_ligands"])
 
+            # search for the ligands most similar to the given ligand name or SMILES
+            if readopts["similarity_search"]:
+                rtcore.search_similar_ligands(
+                    readopts["similarity_search"],
+                    readopts["num_neighbors"],
+                    readopts["similarity_cutoff"],
+                )
+
+            # search for the poses with interactions most similar to the given pose or interactions
+            if readopts["similar_poses"] is not None:
+                rtcore.search_similar_poses(
+                    readopts["similar_poses"],
+                    readopts["num_neighbors"],
+                    readopts["similarity_metric"],
+                )
+
             # write out molecules if requested
             if outopts.export_sdf_path:
-                rtcore.write_molecule_sdfs()
+                rtcore.write_molecule_sdfs(compress=bool(cmdinput.compress_sdf))
 
             # write out requested CSVs
             if readopts["export_bookmark_csv"]:
@@ -70,11 +90,25 @@ def main():
                     readopts["export_bookmark_csv"],
                     readopts["export_bookmark_csv"] + ".csv",
                     table=True,
+                    columns=readopts["export_columns"],
                 )
 
             # export query as csv
             if readopts["export_query_csv"]:
-                rtcore.export_csv(readopts["export_query_csv"], "query.csv")
+                rtcore.export_csv(
+                    readopts["export_query_csv"],
+                    "query.csv",
+                    columns=readopts["export_columns"],
+                )
+
+            # write out requested Parquet file
+            if readopts["export_bookmark_parquet"]:
+                rtcore.export_parquet(
+                    readopts["export_bookmark_parquet"],
+                    readopts["export_bookmark_parquet"] + ".parquet",
+                    table=True,
+                    columns=readopts["export_columns"],
+                )
 
             # export bookmark as database
             if cmdinput.export_bookmark_db:
@@ -357,6 +357,20 @@ def cmdline_parser(defaults: dict = {}):
         const=0.5,
         nargs="?",
     )
+    output_group.add_argument(
+        "--cluster_method",
+        help="Clustering algorithm used by mfpt_cluster and interaction_cluster. 'butina' (default) clusters with the Butina algorithm. 'sphere_exclusion' picks the ligand with the lowest ligand efficiency that is not yet in a cluster and assigns the unclustered ligands within the cutoff to it, in a single pass over the fingerprints, which is faster for very large numbers of passing ligands. 'lsh' does the same but only compares ligands bucketed together by MinHash locality-sensitive hashing, in near-linear time, and may miss some ligands within the cutoff (see --lsh_bands).",
+        action="store",
+        type=str,
+        choices=["butina", "sphere_exclusion", "lsh"],
+    )
+    output_group.add_argument(
+        "--lsh_bands",
+        help="Number of MinHash bands used by cluster_method 'lsh'. Fingerprints sharing the MinHash values of a band are compared when clustering, so more bands find more of the ligands within the clustering cutoff (higher recall, closer to 'sphere_exclusion') at the cost of speed.",
+        action="store",
+        type=int,
+        metavar="INT",
+    )
     output_group.add_argument(
         "-xs",
         "--export_bookmark_csv",
@@ -373,6 +387,30 @@ def cmdline_parser(defaults: dict = {}):
         type=str,
         metavar="[VALID SQL QUERY]",
     )
+    output_group.add_argument(
+        "-xp",
+        "--export_bookmark_parquet",
+        help="Create Parquet file of the bookmark given with bookmark_name (requires pyarrow). Output as <bookmark_name>.parquet. Can also export full database tables",
+        action="store",
+        type=str,
+        metavar="BOOKMARK_NAME",
+    )
+    output_group.add_argument(
+        "-xc",
+        "--export_columns",
+        help="Comma-separated names of the columns to write with --export_bookmark_csv, --export_bookmark_parquet and --export_query_csv. All columns are written by default.",
+        action="store",
+        type=str,
+        metavar="COLUMN_NAMES",
+    )
+    output_group.add_argument(
+        "-fbs",
+        "--filter_sets_file",
+        help="Filter with each filter set in the given JSON file in shared passes over the database, and write a bookmark for each filter set. The file holds a list of filter sets, each a dictionary with filter keywords as used by the API (e.g., 'eworst', 'hb_interactions') and optionally its own 'bookmark_name'. Bookmarks are otherwise named <bookmark_name>_<index of filter set>. The number of ligands passing each filter set is written to the log file.",
+        action="store",
+        type=str,
+        metavar="JSON_FILE",
+    )
     output_group.add_argument(
         "-sdf",
         "--export_sdf_path",
@@ -381,6 +419,12 @@ def cmdline_parser(defaults: dict = {}):
         type=str,
         metavar="DIRECTORY_NAME",
     )
+    output_group.add_argument(
+        "-sdfgz",
+        "--compress_sdf",
+        help="Write the SDF file given by --export_sdf_path gzip-compressed (.sdf.gz).",
+        action="store_true",
+    )
     output_group.add_argument(
         "-xdb",
         "--export_bookmark_db",
@@ -406,6 +450,37 @@ def cmdline_parser(defaults: dict = {}):
         action="store",
         type=str,
     )
+    output_group.add_argument(
+        "-mb",
+        "--materialize_bookmarks",
+        help="Store the poses of new bookmarks in indexed tables, so that using the bookmark (e.g., with --filter_bookmark or for exports) does not re-run the filtering query. Materialized bookmarks are refreshed when new results are added to the database.",
+        action="store_true",
+    )
+    output_group.add_argument(
+        "-pq",
+        "--profile_queries",
+        help="Record the SQL, query plan (EXPLAIN QUERY PLAN), number of rows and time of each stage of the filtering queries, and suggest indices that would speed up the numerical filters.",
+        action="store_true",
+    )
+    output_group.add_argument(
+        "--auto_index",
+        help="Create the single-column indices on Results suggested for the numerical filters and result ordering (docking_score, leff, nr_interactions, num_hb) before filtering.",
+        action="store_true",
+    )
+    output_group.add_argument(
+        "-cf",
+        "--cache_filters",
+        help="Store the Pose_IDs passing each filter set in the database, and reuse them when the same filters are run again on unchanged results. Cluster assignments are cached by clustering method, cutoff and set of clustered poses in the same way.",
+        action="store_true",
+    )
+    output_group.add_argument(
+        "-k",
+        "--top_k",
+        help="Keep only the best ranked ligands passing the filters (or poses, with output_all_poses), ranked by the order_results field or by docking score. Candidates are read in order of the ranking column and filtering stops after top_k ligands.",
+        action="store",
+        type=int,
+        metavar="INT",
+    )
     output_group.add_argument(
         "-fsl",
         "--find_similar_ligands",
@@ -413,6 +488,43 @@ def cmdline_parser(defaults: dict = {}):
         action="store",
         type=str,
     )
+    output_group.add_argument(
+        "-ss",
+        "--similarity_search",
+        help="Find the ligands with Morgan fingerprints most similar by Tanimoto similarity to the given ligand name or SMILES, and bookmark their best poses.",
+        action="store",
+        type=str,
+        metavar="STRING",
+    )
+    output_group.add_argument(
+        "--num_neighbors",
+        help="Largest number of similar ligands or poses returned by --similarity_search and --similar_poses.",
+        action="store",
+        type=int,
+        metavar="INT",
+    )
+    output_group.add_argument(
+        "--similarity_cutoff",
+        help="Smallest Tanimoto similarity of the ligands returned by --similarity_search.",
+        action="store",
+        type=float,
+        metavar="FLOAT",
+    )
+    output_group.add_argument(
+        "-sp",
+        "--similar_poses",
+        help="Find the poses with interaction fingerprints most similar to the given Pose_ID or comma-separated interactions (<type>:<chain>:<resname>:<resid>:<atom>), and bookmark them.",
+        action="store",
+        type=str,
+        metavar="STRING",
+    )
+    output_group.add_argument(
+        "--similarity_metric",
+        help="Similarity of interaction fingerprints used by --similar_poses, 'tanimoto' or 'tversky' (the fraction of the reference interactions a pose has).",
+        action="store",
+        type=str,
+        choices=["tanimoto", "tversky"],
+    )
     output_group.add_argument(
         "-p",
         "--plot",
@@ -724,14 +836,20 @@ class CLOptionParser:
             # set read-only rt_process options to None to prevent errors
             parsed_opts.plot = None
             parsed_opts.find_similar_ligands = None
+            parsed_opts.similarity_search = None
+            parsed_opts.similar_poses = None
             parsed_opts.export_bookmark_csv = None
             parsed_opts.export_query_csv = None
+            parsed_opts.export_bookmark_parquet = None
+            parsed_opts.export_columns = None
+            parsed_opts.filter_sets_file = None
             parsed_opts.export_bookmark_db = None
             parsed_opts.export_receptor = None
             parsed_opts.data_from_bookmark = None
             parsed_opts.pymol = None
             parsed_opts.log_file = None
             parsed_opts.export_sdf_path = None
+            parsed_opts.compress_sdf = None
             parsed_opts.enumerate_interaction_combs = None
 
             # Create dictionary of all file sources
@@ -923,10 +1041,47 @@ class CLOptionParser:
             "max_proc": parsed_opts.max_proc,
         }
 
+        # filter sets to filter with in a batch
+        filter_sets = None
+        if parsed_opts.filter_sets_file is not None:
+            import json
+
+            if self.filtering:
+                raise OptionError(
+                    "Filters given on the command line cannot be combined with --filter_sets_file, please add them to each filter set."
+                )
+            try:
+                with open(parsed_opts.filter_sets_file) as json_file:
+                    filter_sets = json.load(json_file)
+            except (OSError, json.JSONDecodeError) as e:
+                raise OptionError(
+                    f"Error while reading filter sets from {parsed_opts.filter_sets_file}: {e}"
+                ) from e
+            if not isinstance(filter_sets, list) or not all(
+                isinstance(filter_set, dict) for filter_set in filter_sets
+            ):
+                raise OptionError(
+                    "--filter_sets_file must contain a list of filter sets, each a dictionary of filters."
+                )
+
+        # reference of pose similarity search, a Pose_ID or a list of interactions
+        similar_poses = parsed_opts.similar_poses
+        if similar_poses is not None:
+            similar_poses = (
+                int(similar_poses)
+                if similar_poses.isdigit()
+                else similar_poses.split(",")
+            )
+
+        export_columns = parsed_opts.export_columns
+        if export_columns is not None:
+            export_columns = [column.strip() for column in export_columns.split(",")]
+
         # parse read methods without inputs
         self.plot = parsed_opts.plot
         self.export_bookmark_db = parsed_opts.export_bookmark_db
         self.export_receptor = parsed_opts.export_receptor
+        self.compress_sdf = parsed_opts.compress_sdf
         self.pymol = parsed_opts.pymol
         self.data_from_bookmark = parsed_opts.data_from_bookmark
 
@@ -947,6 +1102,13 @@ class CLOptionParser:
             "output_all_poses": parsed_opts.output_all_poses,
             "mfpt_cluster": parsed_opts.mfpt_cluster,
             "interaction_cluster": parsed_opts.interaction_cluster,
+            "materialize_bookmarks": parsed_opts.materialize_bookmarks,
+            "profile_queries": parsed_opts.profile_queries,
+            "auto_index": parsed_opts.auto_index,
+            "cache_filters": parsed_opts.cache_filters,
+            "top_k": parsed_opts.top_k,
+            "cluster_method": parsed_opts.cluster_method,
+            "lsh_bands": parsed_opts.lsh_bands,
             "bookmark_name": parsed_opts.bookmark_name,
         }
 
@@ -954,5 +1116,13 @@ class CLOptionParser:
         self.readopts = {
             "export_query_csv": parsed_opts.export_query_csv,
             "find_similar_ligands": parsed_opts.find_similar_ligands,
+            "similarity_search": parsed_opts.similarity_search,
+            "num_neighbors": parsed_opts.num_neighbors,
+            "similarity_cutoff": parsed_opts.similarity_cutoff,
+            "similar_poses": similar_poses,
+            "similarity_metric": parsed_opts.similarity_metric,
+            "filter_sets": filter_sets,
             "export_bookmark_csv": parsed_opts.export_bookmark_csv,
+            "export_bookmark_parquet": parsed_opts.export_bookmark_parquet,
+            "export_columns": export_columns,
         }
@@ -6,8 +6,6 @@
 
 import numpy as np
 import tempfile
-import meeko
-from meeko import PDBQTReceptor
 
 
 class InteractionFinder:
@@ -19,6 +17,8 @@ class InteractionFinder:
     """
 
     def __init__(self, rec_string, interaction_cutoff_radii):
+        from meeko import PDBQTReceptor
+
         self.rec_string = rec_string
         try:
             self.pdb = PDBQTReceptor(rec_string)
@@ -8,14 +8,12 @@ from .receptormanager import ReceptorManager
 from .exceptions import OutputError
 from .ringtailoptions import Filters
 import os
+import gzip
+import csv
 import json
 import numpy as np
 import time
-import matplotlib.pyplot as plt
-from matplotlib import cm
-from matplotlib import colors
-from rdkit.Chem import SDWriter
-from meeko import RDKitMolCreate
+from contextlib import contextmanager
 from .logutils import LOGGER
 
 
@@ -232,6 +230,28 @@ class OutputManager:
             f"Found ligands similar to {query_ligname} in clustering {cluster_name}:\n"
         )
 
+    def write_similarity_search_header(self, query, num_neighbors, similarity_cutoff):
+        """
+        Properly formats header for the log file of search_similar_ligands
+        """
+        if not self._log_open:
+            self.open_logfile(write_filters_header=False)
+        self.log_file.write("\n---------------\n")
+        self.log_file.write(
+            f"Found up to {num_neighbors} ligands with Tanimoto similarity of at least {similarity_cutoff} to {query}:\n"
+        )
+
+    def write_similar_poses_header(self, reference, metric):
+        """
+        Properly formats header for the log file of search_similar_poses
+        """
+        if not self._log_open:
+            self.open_logfile(write_filters_header=False)
+        self.log_file.write("\n---------------\n")
+        self.log_file.write(
+            f"Found poses with interactions similar to {reference} by {metric} similarity:\n"
+        )
+
     # -#-#- Non-logfile methods -#-#-#
 
     def write_out_mol(self, filename, mol, flexres_mols, properties):
@@ -247,6 +267,18 @@ class OutputManager:
         Raises:
             OutputError
         """
+        self.write_mol_file(self.sdf_file_path(filename), mol, flexres_mols, properties)
+
+    def sdf_file_path(self, filename) -> str:
+        """Returns the path of the given SDF file in the SDF export path. Will create the specified sdf folder in
+        current working directory if needed.
+
+        Args:
+            filename (str): name of SDF file that will be written to
+
+        Returns:
+            str: path of the SDF file
+        """
         if (
             self.export_sdf_path is not None
             and not self.export_sdf_path == ""
@@ -256,7 +288,52 @@ class OutputManager:
             self.logger.info(
                 "Specified directory for SDF files was created in current working directory."
             )
-        filename = self.export_sdf_path + "/" + filename
+        return self.export_sdf_path + "/" + filename
+
+    @contextmanager
+    def open_sdf(self, filename, compress: bool = False):
+        """Opens one SDF file that molecules can be streamed to with write_mol, appending
+        to the file like write_out_mol.
+
+        Args:
+            filename (str): name of SDF file that will be written to
+            compress (bool): gzip-compress the SDF file
+
+        Raises:
+            OutputError
+
+        Yields:
+            file: the open SDF file
+        """
+        with self._open_sdf_file(self.sdf_file_path(filename), compress) as sdf_file:
+            yield sdf_file
+
+    @staticmethod
+    def _open_sdf_file(path, compress: bool = False):
+        """Opens (or creates) SDF file so it can be appended to, with gzip compression if requested"""
+        try:
+            if compress:
+                return gzip.open(path, "at")
+            return open(path, "a")
+        except OSError as e:
+            raise OutputError(f"Error occurred while opening SDF {path}") from e
+
+    @staticmethod
+    def write_mol(sdf_file, mol, flexres_mols, properties):
+        """Writes given mol with its flexible residues and properties, one record per conformer, to an open SDF file
+
+        Args:
+            sdf_file (file): open SDF file to write the mol to
+            mol (RDKit.Chem.Mol): RDKit molobject to be written to SDF
+            flexres_mols (list): dictionary of rdkit molecules for flexible residues
+            properties (dict): dictionary of list of properties to add to mol before writing
+
+        Raises:
+            OutputError
+        """
+        from rdkit.Chem import SDWriter
+        from meeko import RDKitMolCreate
+
         try:
             mol_flexres_list = [mol]
             mol_flexres_list += flexres_mols
@@ -269,16 +346,35 @@ class OutputManager:
                     v = str(v)
                 mol.SetProp(k, v)
 
-            # open/create file so it can be appended to if requested
-            with open(filename, "a") as sdf_file:
-                w = SDWriter(sdf_file)
-                for conf in mol.GetConformers():
-                    w.write(mol, conf.GetId())
-                w.close()
+            # closing the writer leaves sdf_file open for the next mol
+            w = SDWriter(sdf_file)
+            for conf in mol.GetConformers():
+                w.write(mol, conf.GetId())
+            w.close()
 
         except Exception as e:
             raise OutputError("Error occurred while writing SDF from RDKit Mol") from e
 
+    @classmethod
+    def write_mol_file(
+        cls, path, mol, flexres_mols, properties, compress: bool = False
+    ):
+        """Writes out given mol to the SDF file at path, appending to it if it exists. Does not need
+        an OutputManager instance, so it can be used from worker processes.
+
+        Args:
+            path (str): path of SDF file that will be written to
+            mol (RDKit.Chem.Mol): RDKit molobject to be written to SDF
+            flexres_mols (list): dictionary of rdkit molecules for flexible residues
+            properties (dict): dictionary of list of properties to add to mol before writing
+            compress (bool): gzip-compress the SDF file
+
+        Raises:
+            OutputError
+        """
+        with cls._open_sdf_file(path, compress) as sdf_file:
+            cls.write_mol(sdf_file, mol, flexres_mols, properties)
+
     def write_receptor_pdbqt(self, recname: str, receptor_compbytes):
         """
         Writes a pdbqt file from receptor "blob"
@@ -294,6 +390,119 @@ class OutputManager:
         with open(recname, "w") as f:
             f.write(receptor_str)
 
+    def write_csv(self, csv_name: str, column_names: list, row_chunks) -> int:
+        """
+        Writes rows given in chunks to a CSV file as they come, with a leading row index column
+        like pandas.DataFrame.to_csv
+
+        Args:
+            csv_name (str): name of the CSV file
+            column_names (list): names of the columns
+            row_chunks (iter): lists of rows
+
+        Raises:
+            OutputError
+
+        Returns:
+            int: number of rows written
+        """
+        num_rows = 0
+        try:
+            with open(csv_name, "w", newline="") as f:
+                writer = csv.writer(f, lineterminator=os.linesep)
+                writer.writerow([""] + list(column_names))
+                for rows in row_chunks:
+                    writer.writerows(
+                        (num_rows + idx,) + tuple(row) for idx, row in enumerate(rows)
+                    )
+                    num_rows += len(rows)
+        except OSError as e:
+            raise OutputError(f"Error occurred while writing CSV {csv_name}") from e
+        return num_rows
+
+    def write_parquet(
+        self, parquet_name: str, column_names: list, row_chunks, column_type=None
+    ) -> int:
+        """
+        Writes rows given in chunks to a Parquet file as they come, one row group per chunk. The column types
+        are those of the values in the first chunk, columns with only NULL values in it take the type given
+        by column_type.
+
+        Args:
+            parquet_name (str): name of the Parquet file
+            column_names (list): names of the columns
+            row_chunks (iter): lists of rows
+            column_type (callable, optional): returns the SQLite storage class ("integer", "real", "text", "blob" or None)
+                of the values in the column of the given name
+
+        Raises:
+            OutputError
+
+        Returns:
+            int: number of rows written
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise OutputError(
+                "Writing Parquet files requires pyarrow, which can be installed with 'pip install pyarrow'"
+            ) from e
+
+        sqlite_types = {
+            "integer": pa.int64(),
+            "real": pa.float64(),
+            "text": pa.string(),
+            "blob": pa.binary(),
+        }
+        schema = None
+        writer = None
+        num_rows = 0
+        try:
+            for rows in row_chunks:
+                columns = list(zip(*rows))
+                if schema is None:
+                    fields = []
+                    for name, values in zip(column_names, columns):
+                        data_type = pa.array(values).type
+                        if pa.types.is_null(data_type):
+                            sqlite_type = (
+                                column_type(name) if column_type is not None else None
+                            )
+                            data_type = sqlite_types.get(sqlite_type, pa.string())
+                        fields.append(pa.field(name, data_type))
+                    schema = pa.schema(fields)
+                    writer = pq.ParquetWriter(parquet_name, schema)
+                writer.write_table(
+                    pa.Table.from_arrays(
+                        [
+                            pa.array(values, type=field.type)
+                            for values, field in zip(columns, schema)
+                        ],
+                        schema=schema,
+                    ),
+                    row_group_size=len(rows),
+                )
+                num_rows += len(rows)
+            if writer is None:
+                # no rows, only write the columns
+                schema = pa.schema(
+                    [pa.field(name, pa.string()) for name in column_names]
+                )
+                writer = pq.ParquetWriter(parquet_name, schema)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise OutputError(
+                f"Column values of different types cannot be written to Parquet file {parquet_name}"
+            ) from e
+        except OSError as e:
+            raise OutputError(
+                f"Error occurred while writing Parquet file {parquet_name}"
+            ) from e
+        finally:
+            if writer is not None:
+                writer.close()
+        return num_rows
+
     def scatter_hist(self, x, y, z, ax, ax_histx, ax_histy):
         """
         Makes scatterplot with a histogram on each axis
@@ -345,6 +554,10 @@ class OutputManager:
         Raises:
             OutputError
         """
+        import matplotlib.pyplot as plt
+        from matplotlib import cm
+        from matplotlib import colors
+
         try:
             # gather data
             energies = []
@@ -411,6 +624,8 @@ class OutputManager:
         Raises:
             OutputError
         """
+        import matplotlib.pyplot as plt
+
         try:
             plt.savefig("scatter.png", bbox_inches="tight")
             plt.close()
@@ -4,7 +4,6 @@
 # Ringtail results manager
 #
 
-from .mpmanager import MPManager
 from .exceptions import ResultsProcessingError
 from .storagemanager import StorageManager
 from .logutils import LOGGER as logger
@@ -112,6 +111,8 @@ class ResultsManager:
             logmsg = f'This is the list of ligands whos strings ware being procssed: {str(self.string_sources.todict()["results_strings"].keys())}'
         logger.debug(logmsg)
 
+        from .mpmanager import MPManager
+
         # NOTE: if implementing a new parser manager (i.e. serial) must add it to this dict
         implemented_parser_managers = {
             "multiprocess": MPManager,
@@ -4,9 +4,7 @@
 # Ringtail virtual screening manager
 #
 
-import matplotlib.pyplot as plt
 import json
-from meeko import RDKitMolCreate
 from .storagemanager import StorageManager
 from .resultsmanager import ResultsManager
 from .receptormanager import ReceptorManager
@@ -14,7 +12,6 @@ from .outputmanager import OutputManager
 from .ringtailoptions import *
 from .util import *
 from .exceptions import RTCoreError, OutputError, StorageError
-from rdkit import Chem
 import itertools
 import os
 from .logutils import LOGGER
@@ -33,8 +30,14 @@ class RingtailCore:
         outputman (OutputManager): Manager for output tasks of log-writting, plotting, ligand SDF writing, starting pymol sessions
         filters (Filters): object holding all optional filters
         _run_mode (str): refers to whether ringtail is ran from the command line or through direct API use, where the former is more restrictive
+        _flexres_templates (dict): flexible residue templates for RDKit mols, by flexible residue info of the receptor
     """
 
+    # ligands per chunk for which poses and interactions are fetched at once when building RDKit mols
+    _mol_chunk_size = 1000
+    # number of ligands from which RDKit mols are built in a process pool
+    _mol_parallel_min_ligands = 500
+
     # region #-#-#- Base methods -#-#-#
 
     def __init__(
@@ -77,6 +80,7 @@ class RingtailCore:
         self.storageman = storageman(db_file)
         self._run_mode = "api"
         self._docking_mode = docking_mode
+        self._flexres_templates = {}
         self.set_storageman_attributes()
 
     def update_database_version(self, consent=False, new_version="2.0.0"):
@@ -85,6 +89,36 @@ class RingtailCore:
             self.storageman.update_database_version(new_version, consent)
         # return self.storageman.update_database_version(new_version, consent)
 
+    def open_session(self):
+        """Open a persistent database session. The database connection, TEMP views/tables,
+        and cached database metadata are kept between API calls until close_session is called.
+
+        Returns:
+            RingtailCore: self, with an open database session
+        """
+        self.storageman.open_session()
+        return self
+
+    def close_session(self, vacuum=False):
+        """Close a persistent database session opened with open_session
+
+        Args:
+            vacuum (bool, optional): vacuum the database before closing the connection
+        """
+        self.storageman.close_session(vacuum=vacuum)
+
+    def __enter__(self):
+        """Opens a persistent database session when ringtail core is used as a context manager
+
+        Returns:
+            RingtailCore: self, with an open database session
+        """
+        return self.open_session()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        """Closes the persistent database session when leaving the context"""
+        self.close_session()
+
     # -#-#- Private methods -#-#-#
 
     def _validate_docking_mode(self, docking_mode: str):
@@ -121,8 +155,8 @@ class RingtailCore:
     # making docking mode a property of the ringtail core object
     docking_mode = property(fget=_get_docking_mode, fset=_validate_docking_mode)
 
+    @staticmethod
     def _add_poses(
-        self,
         atom_indices,
         poses,
         mol,
@@ -132,11 +166,12 @@ class RingtailCore:
         flexres_saved_coords,
         properties,
     ):
-        """Add poses from given cursor to rdkit mols for ligand and flexible residues
+        """Add poses from given iterable to rdkit mols for ligand and flexible residues
 
         Args:
             atom_indices (list): List of ints indicating mapping of coordinate indices to smiles indices
-            poses (iterable): iterable containing ligand_pose, flexres_pose, flexres_names
+            poses (iterable): iterable containing docking_score, leff, ligand_pose, flexres_pose and the interactions of the
+                pose (None if the database has no interactions)
             mol (RDKit.Chem.Mol): RDKit molecule for ligand
             flexres_mols (list): list of rdkit molecules for flexible residues
             flexres_info (list): list of tuples containing info for each flexible residue (res_smiles, res_index_map, res_h_parents)
@@ -145,28 +180,23 @@ class RingtailCore:
             properties (dict): Dictionary of lists of properties, with each element corresponding to that conformer in the rdkit mol
 
         """
+        from meeko import RDKitMolCreate
+
         for (
-            Pose_ID,
             docking_score,
             leff,
             ligand_pose,
             flexres_pose,
+            interactions,
         ) in poses:
-            # fetch info about pose interactions and format into string with format <type>-<chain>:<resname>:<resnum>:<atomname>:<atomnumber>, joined by commas
-            interactions = self.storageman.fetch_pose_interactions(Pose_ID)
-            # if that pose id has interactions
+            # format pose interactions into string with format <type>-<chain>:<resname>:<resnum>:<atomname>:<atomnumber>, joined by commas
             if interactions is not None:
-                # make a list of all of them
-                interactions_list = []
-                # for each interaction row, make into a string according to format above
-                for interaction_info in interactions:
-                    interaction = (
+                properties["Interactions"].append(
+                    ", ".join(
                         interaction_info[0] + "-" + ":".join(interaction_info[1:])
+                        for interaction_info in interactions
                     )
-                    interactions_list.append(interaction)
-
-                interactions_str = ", ".join(interactions_list)
-                properties["Interactions"].append(interactions_str)
+                )
 
             # add properties to dictionary lists
             properties["Binding energies"].append(docking_score)
@@ -183,18 +213,27 @@ class RingtailCore:
             ligand_saved_coords.append(ligand_pose)
         return mol, flexres_mols, ligand_saved_coords, flexres_saved_coords, properties
 
-    def _generate_interaction_combinations(self, max_miss=0):
-        """Recursive function to list of tuples of possible interaction filter combinations, excluding up to max_miss interactions per filtering round
+    def _list_interaction_filters(self) -> list:
+        """Lists the interaction filters as "<interaction_type>-<interaction>", in the order used for interaction combinations
 
-        Args:
-            max_miss (int): Maximum number of interactions to be excluded
+        Returns:
+            list: of interaction filter strings
         """
-
         all_interactions = []
         for _type in Filters.get_filter_keys("interaction"):
             interactions = getattr(self.filters, _type)
             for interact in interactions:
                 all_interactions.append(_type + "-" + interact[0])
+        return all_interactions
+
+    def _generate_interaction_combinations(self, max_miss=0):
+        """Recursive function to list of tuples of possible interaction filter combinations, excluding up to max_miss interactions per filtering round
+
+        Args:
+            max_miss (int): Maximum number of interactions to be excluded
+        """
+
+        all_interactions = self._list_interaction_filters()
         # warn if max_miss greater than number of interactions
         if max_miss > len(all_interactions):
             self.logger.warning(
@@ -215,6 +254,63 @@ class RingtailCore:
                 max_miss=max_miss - 1
             )
 
+    def _filter_interaction_combinations_separately(self, interaction_combs: list):
+        """Filters the results once for each interaction combination, needed when the results of
+        each combination are clustered. Storage manager must be open.
+
+        Args:
+            interaction_combs (list): list of tuples of interaction filters in each combination
+
+        Yields:
+            tuple: combination, name of bookmark, and passing results of the combination
+        """
+        for ic_idx, combination in enumerate(interaction_combs):
+            # prepare Filter object with only desired interaction combination for storageManager
+            filters_dict = self._prepare_filters_for_storageman(combination)
+            # set storageMan's internal ic_counter to reflect current ic_idx
+            if len(interaction_combs) > 1:
+                self.storageman.set_bookmark_suffix(ic_idx)
+            # ask storageManager to fetch results
+            filtered_results = self._peek_results(
+                self.storageman.filter_results(filters_dict)
+            )
+            result_bookmark_name = self.storageman.get_current_bookmark_name()
+            if not filtered_results and len(interaction_combs) > 1:
+                self.storageman.drop_bookmark(result_bookmark_name)
+            yield combination, result_bookmark_name, filtered_results
+
+    @staticmethod
+    def _peek_results(results: iter):
+        """Checks if there are any results without losing the first row of the results
+
+        Args:
+            results (iter): iterable of results, e.g. generator from StorageManager.filter_results
+
+        Returns:
+            iter | None: iterable of all results, None if there are no results
+        """
+        results = iter(results)
+        first_result = next(results, None)
+        if first_result is None:
+            return None
+        return itertools.chain([first_result], results)
+
+    def _stream_results(self, results: iter, close_session: bool = False):
+        """Yields the results, closing the database session once they are consumed if requested
+
+        Args:
+            results (iter): iterable of results
+            close_session (bool, optional): close the database session opened to read the results
+
+        Yields:
+            tuple: row of results
+        """
+        try:
+            yield from results
+        finally:
+            if close_session:
+                self.storageman.close_session()
+
     def _prepare_filters_for_storageman(self, interaction_combination):
         """Takes desired interaction combination, formats Filter object to dict, removes interactions not in given interaction_combination
 
@@ -268,16 +364,53 @@ class RingtailCore:
 
         Note: needs to be ran inside a storageman context manager, will not be able to access the temporary table otherwise.
         """
+        if pose_ID is None:  # get all passing and nonpassing poses (if requested)
+            poses = self.storageman.fetch_passing_pose_properties(ligname).fetchall()
+            # fetch coordinates for non-passing poses
+            if write_nonpassing:
+                poses += self.storageman.fetch_nonpassing_pose_properties(
+                    ligname
+                ).fetchall()
+        else:
+            poses = self.storageman.fetch_single_pose_properties(pose_ID).fetchall()
+        interactions = self.storageman.fetch_interactions_of_poses(
+            pose[0] for pose in poses
+        )
+        return self._build_rdkit_mol(
+            ligname,
+            smiles,
+            atom_indices,
+            h_parent_line,
+            self._make_flexres_templates(flexible_residues, flexres_atomnames),
+            [
+                pose[1:]
+                + (
+                    (interactions.get(pose[0], []),)
+                    if interactions is not None
+                    else (None,)
+                )
+                for pose in poses
+            ],
+        )
 
-        mol = Chem.MolFromSmiles(smiles)
-        flexres_mols = []
-        flexres_info = []
-        atom_indices = json.loads(atom_indices)
-        ligand_saved_coords = []
-        flexres_saved_coords = []
-        # make flexible residue molecules
+    @staticmethod
+    def _make_flexres_templates(flexible_residues, flexres_atomnames) -> list:
+        """Guesses the SMILES of the flexible residues of the receptor, used as templates for their rdkit molecules
+
+        Args:
+            flexible_residues (list): list of flexible residue names
+            flexres_atomnames (list): list of atomtypes in flexible residue
+
+        Raises:
+            OutputError: raises error if there is an issue with determining a flexible residue identity
+
+        Returns:
+            list: (res, res_smiles, res_index_map, res_h_parents) for each flexible residue
+        """
+        from meeko import RDKitMolCreate
+
+        flexres_templates = []
         for res, res_ats in zip(flexible_residues, flexres_atomnames):
-            flexres_saved_coords.append([])
             resname = res[:3]
             res_ats = [
                 at.strip() for at in res_ats
@@ -291,92 +424,136 @@ class RingtailCore:
                 raise OutputError(
                     f"Error while creating Mol for flexible residue {res}: unrecognized residue or incorrect atomtypes"
                 )
+            flexres_templates.append((res, res_smiles, res_index_map, res_h_parents))
+        return flexres_templates
+
+    def _fetch_flexres_templates(self) -> list:
+        """Flexible residue templates of the receptor in the database, guessed once per receptor
+
+        Returns:
+            list: (res, res_smiles, res_index_map, res_h_parents) for each flexible residue
+
+        Note: needs to be ran inside a storageman context manager
+        """
+        flexres_info = self.storageman.fetch_flexres_info()
+        if flexres_info is None or not flexres_info[0]:
+            return []
+        if flexres_info not in self._flexres_templates:
+            self._flexres_templates[flexres_info] = self._make_flexres_templates(
+                json.loads(flexres_info[0]), json.loads(flexres_info[1])
+            )
+        return self._flexres_templates[flexres_info]
+
+    @classmethod
+    def _build_rdkit_mol(
+        cls, ligname, smiles, atom_indices, h_parent_line, flexres_templates, poses
+    ):
+        """Creates rdkit molecule for given ligand from its poses, without database access so it can run in a process pool
+
+        Args:
+            ligname (string): ligand name
+            smiles (string): ligand smiles string
+            atom_indices (list): list of atom indices converting pdbqt to rdkit mol
+            h_parent_line (list): list of atom indices for heteroatoms with attached hydrogens
+            flexres_templates (list): flexible residue templates from _make_flexres_templates
+            poses (list): docking_score, leff, ligand_pose, flexres_pose and interactions of each pose
+
+        Returns:
+            tuple: (ligand rdkit mol, [flexres rdkit mols], {properties for ligand})
+        """
+        from rdkit import Chem
+        from meeko import RDKitMolCreate
+
+        mol = Chem.MolFromSmiles(smiles)
+        atom_indices = json.loads(atom_indices)
+        ligand_saved_coords = []
+        # make flexible residue molecules
+        flexres_mols = []
+        flexres_info = []
+        flexres_saved_coords = []
+        for res, res_smiles, res_index_map, res_h_parents in flexres_templates:
             frm = Chem.MolFromSmiles(res_smiles)
             frm.SetProp("resinfo", res)
             flexres_mols.append(frm)
             flexres_info.append((res_smiles, res_index_map, res_h_parents))
+            flexres_saved_coords.append([])
 
-        # fetch coordinates for passing poses and add to
-        # rdkit ligand mol, add flexible residues
+        # add coordinates of poses to rdkit ligand mol and flexible residues
         properties = {
             "Binding energies": [],
             "Ligand effiencies": [],
             "Interactions": [],
         }
-
-        if pose_ID is None:  # get all passing and nonpassing poses (if requested)
-            passing_properties = self.storageman.fetch_passing_pose_properties(ligname)
-            (
-                mol,
-                flexres_mols,
-                ligand_saved_coords,
-                flexres_saved_coords,
-                properties,
-            ) = self._add_poses(
-                atom_indices,
-                passing_properties,
-                mol,
-                flexres_mols,
-                flexres_info,
-                ligand_saved_coords,
-                flexres_saved_coords,
-                properties,
-            )
-
-            # fetch coordinates for non-passing poses
-            # and add to ligand mol, flexible residue mols
-            if write_nonpassing:
-                nonpassing_properties = (
-                    self.storageman.fetch_nonpassing_pose_properties(ligname)
-                )
-                (
-                    mol,
-                    flexres_mols,
-                    ligand_saved_coords,
-                    flexres_saved_coords,
-                    properties,
-                ) = self._add_poses(
-                    atom_indices,
-                    nonpassing_properties,
-                    mol,
-                    flexres_mols,
-                    flexres_info,
-                    ligand_saved_coords,
-                    flexres_saved_coords,
-                    properties,
-                )
-        else:
-            pose_properties = self.storageman.fetch_single_pose_properties(pose_ID)
-            (
-                mol,
-                flexres_mols,
-                ligand_saved_coords,
-                flexres_saved_coords,
-                properties,
-            ) = self._add_poses(
-                atom_indices,
-                pose_properties,
-                mol,
-                flexres_mols,
-                flexres_info,
-                ligand_saved_coords,
-                flexres_saved_coords,
-                properties,
-            )
+        (
+            mol,
+            flexres_mols,
+            ligand_saved_coords,
+            flexres_saved_coords,
+            properties,
+        ) = cls._add_poses(
+            atom_indices,
+            poses,
+            mol,
+            flexres_mols,
+            flexres_info,
+            ligand_saved_coords,
+            flexres_saved_coords,
+            properties,
+        )
         # add ligand name to properties
         properties["_Name"] = ligname
         # add hydrogens to mols
         lig_h_parents = [int(idx) for idx in json.loads(h_parent_line)]
         mol = RDKitMolCreate.add_hydrogens(mol, ligand_saved_coords, lig_h_parents)
-        flexres_hparents = []
         for idx, res in enumerate(flexres_mols):
-            flexres_hparents = flexres_info[idx][2]
             flexres_mols[idx] = RDKitMolCreate.add_hydrogens(
-                res, flexres_saved_coords[idx], flexres_hparents
+                res, flexres_saved_coords[idx], flexres_info[idx][2]
             )
 
         return mol, flexres_mols, properties
 
+    @classmethod
+    def _build_rdkit_mol_binary(cls, mol_input: tuple) -> tuple:
+        """Creates rdkit molecules as in _build_rdkit_mol in a worker process, returned as binaries
+        that keep the molecule properties and full precision coordinates when sent back to the main process
+
+        Args:
+            mol_input (tuple): arguments of _build_rdkit_mol
+
+        Returns:
+            tuple: (ligand mol binary, [flexres mol binaries], {properties for ligand})
+        """
+        from rdkit import Chem
+
+        mol, flexres_mols, properties = cls._build_rdkit_mol(*mol_input)
+        pickle_options = (
+            Chem.PropertyPickleOptions.AllProps
+            | Chem.PropertyPickleOptions.CoordsAsDouble
+        )
+        return (
+            mol.ToBinary(pickle_options),
+            [frm.ToBinary(pickle_options) for frm in flexres_mols],
+            properties,
+        )
+
+    @classmethod
+    def _write_ligand_sdf(cls, sdf_input: tuple) -> str:
+        """Creates rdkit molecules as in _build_rdkit_mol and writes them to their own SDF file,
+        so that one-file-per-ligand export can run in worker processes
+
+        Args:
+            sdf_input (tuple): (arguments of _build_rdkit_mol, path of the SDF file, bool to gzip-compress the file)
+
+        Returns:
+            str: path of the written SDF file
+        """
+        mol_input, sdf_file_path, compress = sdf_input
+        mol, flexres_mols, properties = cls._build_rdkit_mol(*mol_input)
+        OutputManager.write_mol_file(
+            sdf_file_path, mol, flexres_mols, properties, compress
+        )
+        return sdf_file_path
+
     def _set_file_sources(
         self,
         file=None,
@@ -667,6 +844,13 @@ class RingtailCore:
         output_all_poses: str = None,
         mfpt_cluster: float = None,
         interaction_cluster: float = None,
+        materialize_bookmarks: bool = None,
+        profile_queries: bool = None,
+        auto_index: bool = None,
+        cache_filters: bool = None,
+        top_k: int = None,
+        cluster_method: str = None,
+        lsh_bands: int = None,
         bookmark_name: str = None,
         dict: dict = None,
     ):
@@ -711,6 +895,13 @@ class RingtailCore:
             output_all_poses (bool): By default, will output only top-scoring pose passing filters per ligand. This flag will cause each pose passing the filters to be logged.
             mfpt_cluster (float): Cluster filered ligands by Tanimoto distance of Morgan fingerprints with Butina clustering and output ligand with lowest ligand efficiency from each cluster. Default clustering cutoff is 0.5. Useful for selecting chemically dissimilar ligands.
             interaction_cluster (float): Cluster filered ligands by Tanimoto distance of interaction fingerprints with Butina clustering and output ligand with lowest ligand efficiency from each cluster. Default clustering cutoff is 0.5. Useful for enhancing selection of ligands with diverse interactions.
+            materialize_bookmarks (bool): Store the poses of new bookmarks in indexed tables instead of re-running the filtering query every time the bookmark is used. Refreshed when results are added.
+            profile_queries (bool): Record the SQL, query plan, number of rows and time of each stage of the filtering, and suggest indices for the numerical filters
+            auto_index (bool): Create single-column indices on Results suggested for the numerical filters and result ordering before filtering
+            cache_filters (bool): store the Pose_IDs passing each filter set in the database, and reuse them (and percentile cutoffs) when the same filters, filtering options and results are filtered again, and cache cluster assignments. Default value is False
+            top_k (int): number of best ranked ligands (or poses, with output_all_poses) to keep, ranked by order_results or by docking score
+            cluster_method (str): clustering algorithm, 'butina' (default), 'sphere_exclusion' or 'lsh'
+            lsh_bands (int): number of MinHash bands used by cluster_method 'lsh', more bands give a higher recall at the cost of speed. Default value is 16
             bookmark_name (str): name for resulting book mark file. Default value is "passing_results"
             dict (dict): dictionary of one or more of the above args, is overwritten by individual args
         """
@@ -725,6 +916,13 @@ class RingtailCore:
             "output_all_poses": output_all_poses,
             "mfpt_cluster": mfpt_cluster,
             "interaction_cluster": interaction_cluster,
+            "materialize_bookmarks": materialize_bookmarks,
+            "profile_queries": profile_queries,
+            "auto_index": auto_index,
+            "cache_filters": cache_filters,
+            "top_k": top_k,
+            "cluster_method": cluster_method,
+            "lsh_bands": lsh_bands,
             "bookmark_name": bookmark_name,
         }
 
@@ -1227,6 +1425,13 @@ class RingtailCore:
         outfields: str = None,
         bookmark_name: str = None,
         filter_bookmark: str = None,
+        materialize_bookmarks: bool = None,
+        profile_queries: bool = None,
+        auto_index: bool = None,
+        cache_filters: bool = None,
+        top_k: int = None,
+        cluster_method: str = None,
+        lsh_bands: int = None,
         options_dict: dict | None = None,
         return_iter=False,
     ):
@@ -1290,8 +1495,15 @@ class RingtailCore:
                     "receptor" (receptor name)
                 bookmark_name (str): name for resulting book mark file. Default value is 'passing_results'
                 filter_bookmark (str): name of bookmark to perform filtering over
+                materialize_bookmarks (bool): store the poses of the resulting bookmark in an indexed table, refreshed when results are added
+                profile_queries (bool): Record the SQL, query plan, number of rows and time of each stage of the filtering, and suggest indices for the numerical filters
+                auto_index (bool): Create single-column indices on Results suggested for the numerical filters and result ordering before filtering
+                cache_filters (bool): store the Pose_IDs passing each filter set in the database, and reuse them (and percentile cutoffs) when the same filters, filtering options and results are filtered again, and cache cluster assignments. Default value is False
+                top_k (int): number of best ranked ligands (or poses, with output_all_poses) to keep, ranked by order_results or by docking score
+                cluster_method (str): clustering algorithm, 'butina' (default), 'sphere_exclusion' or 'lsh'
+                lsh_bands (int): number of MinHash bands used by cluster_method 'lsh', more bands give a higher recall at the cost of speed. Default value is 16
                 options_dict (dict): write options as a dict
-                return_inter (bool): return an iterable of all of the filtering results
+                return_inter (bool): return an iterable of all of the filtering results, read from the database as it is consumed
 
         Returns:
             int: number of ligands passing filter
@@ -1336,6 +1548,13 @@ class RingtailCore:
             outfields=outfields,
             bookmark_name=bookmark_name,
             filter_bookmark=filter_bookmark,
+            materialize_bookmarks=materialize_bookmarks,
+            profile_queries=profile_queries,
+            auto_index=auto_index,
+            cache_filters=cache_filters,
+            top_k=top_k,
+            cluster_method=cluster_method,
+            lsh_bands=lsh_bands,
             dict=storage_dict,
         )
         self.set_output_options(
@@ -1372,63 +1591,35 @@ class RingtailCore:
         else:
             write_one_bookmark = True
 
-        with self.storageman:
-            # pre-process if filtering to multiple bookmark combinations
-            if write_one_bookmark:
-                filtered_results = self.storageman.filter_results(
-                    self.filters.todict(),
-                )
-                # if there were results of the filtering
-                if filtered_results:
-                    # if retuning an iterable with the resulting pose ids
-                    if return_iter:
-                        return filtered_results
-                    result_bookmark_name = self.storageman.get_current_bookmark_name()
-                    # write output log file
-                    with self.outputman:
-                        self.outputman.write_filters_to_log(
+        # results are read from the database as they are consumed, returned results need the connection to stay open
+        stream_session = return_iter and not self.storageman.session_active
+        if stream_session:
+            self.storageman.open_session()
+        try:
+            with self.storageman:
+                # pre-process if filtering to multiple bookmark combinations
+                if write_one_bookmark:
+                    filtered_results = self._peek_results(
+                        self.storageman.filter_results(
                             self.filters.todict(),
-                            [],
-                            f"Morgan Fingerprints butina clustering cutoff: {self.storageman.mfpt_cluster}\nInteraction Fingerprints clustering cutoff: {self.storageman.interaction_cluster}",
-                        )
-                        self.outputman.write_results_bookmark_to_log(
-                            result_bookmark_name
-                        )
-                        number_passing = self.outputman.write_filter_log(
-                            filtered_results
                         )
-                        self.outputman.log_num_passing_ligands(number_passing)
-                        print("\nNumber of ligands passing filters:", number_passing)
-                        ligands_passed = number_passing
-                else:
-                    self.logger.warning(f"WARNING: No ligands found passing filter.")
-                    self.storageman.drop_bookmark(self.storageman.bookmark_name)
-            # else produce a bookmark for each interaction combination
-            elif not write_one_bookmark:
-                interaction_combs = self._generate_interaction_combinations(
-                    self.filters.max_miss
-                )
-                for ic_idx, combination in enumerate(interaction_combs):
-                    # prepare Filter object with only desired interaction combination for storageManager
-                    filters_dict = self._prepare_filters_for_storageman(combination)
-                    # set storageMan's internal ic_counter to reflect current ic_idx
-                    if len(interaction_combs) > 1:
-                        self.storageman.set_bookmark_suffix(ic_idx)
-                    # ask storageManager to fetch results
-                    filtered_results = self.storageman.filter_results(
-                        filters_dict,
-                        not self.outputopts.enumerate_interaction_combs,
                     )
+                    # if there were results of the filtering
                     if filtered_results:
+                        # if retuning an iterable with the resulting pose ids
                         if return_iter:
-                            return filtered_results
+                            stream_session = False
+                            return self._stream_results(
+                                filtered_results, close_session=True
+                            )
                         result_bookmark_name = (
                             self.storageman.get_current_bookmark_name()
                         )
+                        # write output log file
                         with self.outputman:
                             self.outputman.write_filters_to_log(
                                 self.filters.todict(),
-                                combination,
+                                [],
                                 f"Morgan Fingerprints butina clustering cutoff: {self.storageman.mfpt_cluster}\nInteraction Fingerprints clustering cutoff: {self.storageman.interaction_cluster}",
                             )
                             self.outputman.write_results_bookmark_to_log(
@@ -1442,47 +1633,224 @@ class RingtailCore:
                                 "\nNumber of ligands passing filters:", number_passing
                             )
                             ligands_passed = number_passing
-                    elif len(interaction_combs) > 1:
+                    else:
                         self.logger.warning(
-                            f"WARNING: No ligands found passing given interaction combination {combination}"
+                            f"WARNING: No ligands found passing filter."
                         )
                         self.storageman.drop_bookmark(self.storageman.bookmark_name)
-                if len(interaction_combs) > 1:
-                    maxmiss_union_results = self.storageman.get_maxmiss_union(
-                        len(interaction_combs)
-                    )
-                with self.outputman:
-                    self.outputman.write_maxmiss_union_header()
-                    self.outputman.write_results_bookmark_to_log(
-                        self.storageman.bookmark_name + "_union"
+                # else produce a bookmark for each interaction combination
+                elif not write_one_bookmark:
+                    interaction_combs = self._generate_interaction_combinations(
+                        self.filters.max_miss
                     )
-                    number_passing_union = self.outputman.write_filter_log(
-                        maxmiss_union_results
+                    clustering = bool(
+                        self.storageman.mfpt_cluster
+                        or self.storageman.interaction_cluster
                     )
-                    self.outputman.log_num_passing_ligands(number_passing_union)
-                    print(
-                        "\nNumber passing ligands in max_miss union:",
-                        number_passing_union,
-                    )
-                    ligands_passed = number_passing_union
+                    if clustering:
+                        # results of each combination are clustered separately
+                        combination_results = (
+                            self._filter_interaction_combinations_separately(
+                                interaction_combs
+                            )
+                        )
+                    else:
+                        # all combinations are evaluated in one pass over the interaction bitsets of the poses
+                        all_interactions = self._list_interaction_filters()
+                        bookmarks_results, maxmiss_union_results = (
+                            self.storageman.filter_interaction_combinations(
+                                self.filters.todict(),
+                                [
+                                    [all_interactions.index(i) for i in combination]
+                                    for combination in interaction_combs
+                                ],
+                            )
+                        )
+                        combination_results = (
+                            (combination,) + bookmark_results
+                            for combination, bookmark_results in zip(
+                                interaction_combs, bookmarks_results
+                            )
+                        )
+                    for (
+                        combination,
+                        result_bookmark_name,
+                        filtered_results,
+                    ) in combination_results:
+                        if filtered_results:
+                            if return_iter:
+                                stream_session = False
+                                return self._stream_results(
+                                    filtered_results, close_session=True
+                                )
+                            with self.outputman:
+                                self.outputman.write_filters_to_log(
+                                    self.filters.todict(),
+                                    combination,
+                                    f"Morgan Fingerprints butina clustering cutoff: {self.storageman.mfpt_cluster}\nInteraction Fingerprints clustering cutoff: {self.storageman.interaction_cluster}",
+                                )
+                                self.outputman.write_results_bookmark_to_log(
+                                    result_bookmark_name
+                                )
+                                number_passing = self.outputman.write_filter_log(
+                                    filtered_results
+                                )
+                                self.outputman.log_num_passing_ligands(number_passing)
+                                print(
+                                    "\nNumber of ligands passing filters:",
+                                    number_passing,
+                                )
+                                ligands_passed = number_passing
+                        elif len(interaction_combs) > 1:
+                            self.logger.warning(
+                                f"WARNING: No ligands found passing given interaction combination {combination}"
+                            )
+                    if clustering and len(interaction_combs) > 1:
+                        maxmiss_union_results = self.storageman.get_maxmiss_union(
+                            len(interaction_combs)
+                        )
+                    with self.outputman:
+                        self.outputman.write_maxmiss_union_header()
+                        self.outputman.write_results_bookmark_to_log(
+                            self.storageman.bookmark_name + "_union"
+                        )
+                        number_passing_union = self.outputman.write_filter_log(
+                            maxmiss_union_results
+                        )
+                        self.outputman.log_num_passing_ligands(number_passing_union)
+                        print(
+                            "\nNumber passing ligands in max_miss union:",
+                            number_passing_union,
+                        )
+                        ligands_passed = number_passing_union
+        finally:
+            if stream_session:
+                self.storageman.close_session()
 
         return ligands_passed
 
+    def filter_batch(
+        self,
+        filter_sets: list,
+        bookmark_names: list = None,
+        output_all_poses: bool = None,
+        log_file: str = None,
+        overwrite: bool = None,
+        order_results: str = None,
+        bookmark_name: str = None,
+        filter_bookmark: str = None,
+        materialize_bookmarks: bool = None,
+        top_k: int = None,
+        options_dict: dict | None = None,
+    ) -> dict:
+        """Filters with several filter sets in shared passes over the database, writing one bookmark for each filter set.
+        Clustering and the enumeration of interaction combinations are not available for a batch, max_miss keeps the
+        poses passing the union of interaction combinations.
+
+        Args:
+            filter_sets (list[dict]): filters of each filter set, with keys as in ringtail.Filters(). A filter set may give its own "bookmark_name"
+            bookmark_names (list[str]): names of the bookmarks for the filter sets. Default value is '<bookmark_name>_<index of filter set>'
+            output_all_poses (bool): By default, will output only top-scoring pose passing filters per ligand. This flag will cause each pose passing the filters to be logged.
+            log_file (str): by default, results are saved in `output_log.txt`; if this option is used, the filters and number of passing ligands of each filter set will be written to specified file
+            overwrite (bool): by default, if a log file exists, it doesn't get overwritten and an error is returned; this option enable overwriting existing log files
+            order_results (str): Stipulates how to order the results in the bookmarks, see `filter`
+            bookmark_name (str): prefix of the default bookmark names. Default value is 'passing_results'
+            filter_bookmark (str): name of bookmark to perform filtering over
+            materialize_bookmarks (bool): store the poses of the resulting bookmarks in indexed tables
+            top_k (int): number of best ranked ligands (or poses, with output_all_poses) to keep for each filter set
+            options_dict (dict): write options as a dict
+
+        Returns:
+            dict: number of ligands (or poses, with output_all_poses) passing each filter set, by bookmark name
+        """
+        if options_dict is not None:
+            storage_dict, output_dict = split_dict(
+                options_dict, ["log_file", "enumerate_interaction_combs"]
+            )
+        else:
+            storage_dict = None
+            output_dict = None
+        self.set_storageman_attributes(
+            output_all_poses=output_all_poses,
+            overwrite=overwrite,
+            order_results=order_results,
+            bookmark_name=bookmark_name,
+            filter_bookmark=filter_bookmark,
+            materialize_bookmarks=materialize_bookmarks,
+            top_k=top_k,
+            dict=storage_dict,
+        )
+        self.set_output_options(log_file=log_file, dict=output_dict)
+        if not filter_sets:
+            raise OptionError("No filter sets given to filter in a batch.")
+        if bookmark_names is not None and len(bookmark_names) != len(filter_sets):
+            raise OptionError(
+                f"Number of bookmark names ({len(bookmark_names)}) does not match number of filter sets ({len(filter_sets)})."
+            )
+
+        # validate each filter set with a filter object
+        all_filters = []
+        names = []
+        for i, filter_set in enumerate(filter_sets):
+            filter_set = dict(filter_set)
+            name = filter_set.pop("bookmark_name", None)
+            if bookmark_names is not None:
+                name = bookmark_names[i]
+            if name is None:
+                name = f"{self.storageman.bookmark_name}_{i}"
+            if not RTOptions.valid_bookmark_name(name):
+                raise OptionError(
+                    f"The chosen bookmark name {name} is not valid, as it contains symbols other than letters, numbers, and underscore (_)"
+                )
+            self.set_filters(dict=filter_set)
+            if self.docking_mode == "vina" and self.filters.react_any:
+                self.logger.warning(
+                    "Cannot use reaction filters with Vina mode. Removing react_any filter."
+                )
+                self.filters.react_any = False
+            all_filters.append(self.filters.todict())
+            names.append(name)
+        if len(set(names)) != len(names):
+            raise OptionError("Each filter set in a batch needs its own bookmark name.")
+
+        self.logger.info(f"Filtering results with {len(all_filters)} filter sets...")
+        with self.storageman:
+            batch_results = self.storageman.filter_results_batch(all_filters, names)
+        with self.outputman:
+            for filters, (result_bookmark_name, number_passing) in zip(
+                all_filters, batch_results
+            ):
+                self.outputman.write_filters_to_log(dict(filters), [])
+                self.outputman.write_results_bookmark_to_log(result_bookmark_name)
+                self.outputman.log_num_passing_ligands(number_passing)
+                print(
+                    f"Number of ligands passing filters of bookmark {result_bookmark_name}:",
+                    number_passing,
+                )
+                if not number_passing:
+                    self.logger.warning(
+                        f"WARNING: No ligands found passing filters of bookmark {result_bookmark_name}."
+                    )
+        return dict(batch_results)
+
     def write_molecule_sdfs(
         self,
         sdf_path: str | None = None,
         all_in_one: bool = True,
         bookmark_name: str = None,
         write_nonpassing: bool = None,
+        compress: bool = False,
     ):
         """
-        Have output manager write molecule sdf files for passing results in given results bookmark
+        Have output manager write molecule sdf files for passing results in given results bookmark. Molecules are
+        created and written in chunks, so memory use does not grow with the size of the bookmark.
 
         Args:
             sdf_path (str, optional): Optional path existing or to be created in cd where SDF files will be saved
             all_in_one (bool, optional): If True will write all molecules to one SDF (separated by $$$$), if False will write one molecule pre SDF
             bookmark_name (str, optional): Option to run over specified bookmark other than that just used for filtering
             write_nonpassing (bool, optional): Option to include non-passing poses for passing ligands
+            compress (bool, optional): If True will write gzip-compressed SDF files (.sdf.gz)
 
         Raises:
             StorageError: if bookmark or data not found
@@ -1492,42 +1860,62 @@ class RingtailCore:
             self.set_output_options(export_sdf_path=sdf_path)
         else:
             self.set_output_options(export_sdf_path=".")
-        try:
-            all_mols = self.ligands_rdkit_mol(
-                bookmark_name=bookmark_name, write_nonpassing=write_nonpassing
-            )
-        except StorageError as e:
-            self.logger.error(str(e))
-            return
+        if bookmark_name is not None:
+            self.set_storageman_attributes(bookmark_name=bookmark_name)
+        sdf_extension = ".sdf.gz" if compress else ".sdf"
 
-        if all_mols is None:
-            self.logger.error(
-                "Selected bookmark {0} does not exist or does not have any data, cannot write molecule SDFS.".format(
-                    bookmark_name
-                )
-            )
-            return
+        with self.storageman:
+            try:
+                self._prepare_sdf_bookmark()
+            except StorageError as e:
+                self.logger.error(str(e))
+                return
 
-        for ligname, info in all_mols.items():
-            # determine filename
             if all_in_one:
                 # will write one SDF file for all molecules in bookmark (_None if no bookmark present)
                 db_file_name = os.path.splitext(self.db_file)[0]
-                sdf_file_name = ("{0}_{1}.sdf").format(
-                    db_file_name, str(self.storageman.bookmark_name)
+                sdf_file_name = ("{0}_{1}{2}").format(
+                    db_file_name, str(self.storageman.bookmark_name), sdf_extension
                 )
-                self.logger.info("Writing " + ligname + " to {0}".format(sdf_file_name))
-            else:
-                # filename is name of ligand
-                sdf_file_name = ligname + ".sdf"
-                self.logger.info("Writing " + ligname + ".sdf")
-
-            self.outputman.write_out_mol(
-                sdf_file_name,
-                info["ligand"],
-                info["flex_residues"],
-                info["properties"],
-            )
+                with self.outputman.open_sdf(sdf_file_name, compress) as sdf_file:
+                    for ligname, info in self._iter_ligands_rdkit_mol(write_nonpassing):
+                        self.logger.info(
+                            "Writing " + ligname + " to {0}".format(sdf_file_name)
+                        )
+                        self.outputman.write_mol(
+                            sdf_file,
+                            info["ligand"],
+                            info["flex_residues"],
+                            info["properties"],
+                        )
+                return
+
+            # filename is name of ligand, mols are created and written in the worker processes if using a pool
+            pool, num_procs = self._rdkit_mol_pool()
+            try:
+                for mol_inputs in self._iter_rdkit_mol_inputs(write_nonpassing):
+                    sdf_inputs = [
+                        (
+                            mol_input,
+                            self.outputman.sdf_file_path(mol_input[0] + sdf_extension),
+                            compress,
+                        )
+                        for mol_input in mol_inputs
+                    ]
+                    if pool is not None:
+                        sdf_files = pool.imap(
+                            self._write_ligand_sdf,
+                            sdf_inputs,
+                            chunksize=max(1, len(sdf_inputs) // (4 * num_procs)),
+                        )
+                    else:
+                        sdf_files = map(self._write_ligand_sdf, sdf_inputs)
+                    for sdf_file in sdf_files:
+                        self.logger.info("Writing " + os.path.basename(sdf_file))
+            finally:
+                if pool is not None:
+                    pool.close()
+                    pool.join()
 
     def ligands_rdkit_mol(self, bookmark_name=None, write_nonpassing=False) -> dict:
         """
@@ -1546,90 +1934,187 @@ class RingtailCore:
             self.set_storageman_attributes(bookmark_name=bookmark_name)
 
         with self.storageman:
-            # Ensure bookmarks exist and have data
-            all_bookmarks = self.storageman.get_all_bookmark_names()
-
-            # is bookmark name actually in database
-            if self.storageman.bookmark_name in all_bookmarks:
-                # check if has max_miss filter
-                bookmark_filters = self.storageman.fetch_filters_from_bookmark(
-                    self.storageman.bookmark_name
+            self._prepare_sdf_bookmark()
+            return dict(self._iter_ligands_rdkit_mol(write_nonpassing))
+
+    def _prepare_sdf_bookmark(self):
+        """
+        Checks that the bookmark of the storage manager exists and has data, switching to its union bookmark
+        if needed, and creates the passing_temp table from it for creating RDKit mols
+
+        Raises:
+            StorageError: if bookmark or data not found
+        """
+        # Ensure bookmarks exist and have data
+        all_bookmarks = self.storageman.get_all_bookmark_names()
+
+        # is bookmark name actually in database
+        if self.storageman.bookmark_name in all_bookmarks:
+            # check if has max_miss filter
+            bookmark_filters = self.storageman.fetch_filters_from_bookmark(
+                self.storageman.bookmark_name
+            )
+            try:
+                max_miss_present = bool(
+                    bookmark_filters["max_miss"] > 0
+                    and not bookmark_filters["enumerate_interaction_combs"]
+                    and not "_union" in self.storageman.bookmark_name
                 )
-                try:
-                    max_miss_present = bool(
-                        bookmark_filters["max_miss"] > 0
-                        and not bookmark_filters["enumerate_interaction_combs"]
-                        and not "_union" in self.storageman.bookmark_name
-                    )
-                except:
-                    #  in case bookmark query string does not contain the phrase 'max_miss', carry on
-                    pass
-                else:
-                    if max_miss_present:
-                        self.logger.warning(
-                            "'max_miss' used in filtering, but the bookmark used for sdfs writing is not the union of the search"
-                        )
-            # if bookmark name is not in the database
-            elif not self.storageman.bookmark_name in all_bookmarks:
-                # does bookmark name + _union resolve the issue
-                if self.storageman.check_passing_bookmark_exists(
-                    self.storageman.bookmark_name + "_union"
-                ):
-                    self.storageman.bookmark_name = (
-                        self.storageman.bookmark_name + "_union"
-                    )
+            except:
+                #  in case bookmark query string does not contain the phrase 'max_miss', carry on
+                pass
+            else:
+                if max_miss_present:
                     self.logger.warning(
-                        "Requested 'export_sdf_path' with 'max_miss' and 'enumerate_interaction_combs' used in the filtering process. Exported SDFs will be for union of interaction combinations."
-                    )
-                # if not, raise error
-                else:
-                    raise StorageError(
-                        "Filtering bookmark {0} does not exist in database. Cannot write passing molecule SDFs".format(
-                            self.storageman.bookmark_name
-                        )
+                        "'max_miss' used in filtering, but the bookmark used for sdfs writing is not the union of the search"
                     )
-
-            if not self.storageman.bookmark_has_rows(self.storageman.bookmark_name):
+        # if bookmark name is not in the database
+        elif not self.storageman.bookmark_name in all_bookmarks:
+            # does bookmark name + _union resolve the issue
+            if self.storageman.check_passing_bookmark_exists(
+                self.storageman.bookmark_name + "_union"
+            ):
+                self.storageman.bookmark_name = self.storageman.bookmark_name + "_union"
+                self.logger.warning(
+                    "Requested 'export_sdf_path' with 'max_miss' and 'enumerate_interaction_combs' used in the filtering process. Exported SDFs will be for union of interaction combinations."
+                )
+            # if not, raise error
+            else:
                 raise StorageError(
-                    "Given results bookmark exists but does not have any data. Cannot write passing molecule SDFs"
+                    "Filtering bookmark {0} does not exist in database. Cannot write passing molecule SDFs".format(
+                        self.storageman.bookmark_name
+                    )
                 )
 
-            # make temp table
-            self.storageman.create_temp_table_from_bookmark()
-            passing_molecule_info = self.storageman.fetch_passing_ligand_output_info()
-            flexible_residues, flexres_atomnames = self.storageman.fetch_flexres_info()
+        if not self.storageman.bookmark_has_rows(self.storageman.bookmark_name):
+            raise StorageError(
+                "Given results bookmark exists but does not have any data. Cannot write passing molecule SDFs"
+            )
+
+        # make temp table
+        self.storageman.create_temp_table_from_bookmark()
 
-            if flexible_residues != []:
-                flexible_residues = json.loads(flexible_residues)
-                flexres_atomnames = json.loads(flexres_atomnames)
+    def _rdkit_mol_pool(self) -> tuple:
+        """
+        Creates a process pool for building RDKit mols if there are enough passing ligands and more than one CPU
 
-            all_mols = {}
-            for ligname, smiles, atom_indices, h_parent_line in passing_molecule_info:
-                self.logger.info("Creating an RDKIT mol for ligand: " + ligname + ".")
-                # create rdkit ligand molecule and flexible residue container
+        Returns:
+            tuple: (pool or None, number of processes)
+        """
+        if self.storageman.count_passing_ligands() < self._mol_parallel_min_ligands:
+            return None, 1
+        import multiprocess
+
+        num_procs = multiprocess.cpu_count()
+        if num_procs > 1:
+            return multiprocess.Pool(num_procs), num_procs
+        return None, 1
+
+    def _iter_rdkit_mol_inputs(self, write_nonpassing=False):
+        """
+        Yields the arguments of _build_rdkit_mol for the ligands in passing_temp, in chunks of _mol_chunk_size ligands
+        for which poses and interactions are fetched at once
+
+        Args:
+            write_nonpassing (bool, optional): Option to include non-passing poses for passing ligands
+
+        Yields:
+            list: of argument tuples for _build_rdkit_mol
+        """
+        flexres_templates = self._fetch_flexres_templates()
+        for ligand_info in self.storageman.iter_passing_ligand_output_info(
+            self._mol_chunk_size
+        ):
+            chunk = []
+            for ligname, smiles, atom_indices, h_parent_line in ligand_info:
                 if smiles == "":
                     self.logger.warning(
                         f"No SMILES found for {ligname}. Cannot create SDF."
                     )
                     continue
-                # some work needed bc of info needed for creating rd kit, can I remove more than flex stuff?
-                mol, flexres_mols, properties = self._create_rdkit_mol(
+                chunk.append((ligname, smiles, atom_indices, h_parent_line))
+            if not chunk:
+                continue
+            self.logger.info(
+                f"Creating RDKIT mols for {len(chunk)} ligands, from {chunk[0][0]}."
+            )
+            # poses and interactions of all ligands in the chunk in two queries
+            ligand_poses = {}
+            for (
+                ligname,
+                pose_id,
+                *pose,
+            ) in self.storageman.fetch_ligand_poses_for_output(
+                [info[0] for info in chunk], write_nonpassing
+            ).fetchall():
+                ligand_poses.setdefault(ligname, []).append((pose_id, pose))
+            interactions = self.storageman.fetch_interactions_of_poses(
+                pose_id for poses in ligand_poses.values() for pose_id, _ in poses
+            )
+            yield [
+                (
                     ligname,
                     smiles,
                     atom_indices,
                     h_parent_line,
-                    flexible_residues,
-                    flexres_atomnames,
-                    write_nonpassing=write_nonpassing,
+                    flexres_templates,
+                    [
+                        tuple(pose)
+                        + (
+                            (interactions.get(pose_id, []),)
+                            if interactions is not None
+                            else (None,)
+                        )
+                        for pose_id, pose in ligand_poses.get(ligname, [])
+                    ],
                 )
+                for ligname, smiles, atom_indices, h_parent_line in chunk
+            ]
 
-                all_mols[ligname] = {
-                    "ligand": mol,
-                    "flex_residues": flexres_mols,
-                    "properties": properties,
-                }
+    def _iter_ligands_rdkit_mol(self, write_nonpassing=False):
+        """
+        Yields the RDKit mols of the ligands in passing_temp one ligand at a time, building them chunk by chunk
+        (in a process pool for many ligands) so only one chunk of mols is held in memory
 
-        return all_mols
+        Args:
+            write_nonpassing (bool, optional): Option to include non-passing poses for passing ligands
+
+        Yields:
+            tuple: (ligand name, dict containing RDKit mol, flexible residue mols, and other ligand properties)
+        """
+        pool, num_procs = self._rdkit_mol_pool()
+        try:
+            for mol_inputs in self._iter_rdkit_mol_inputs(write_nonpassing):
+                if pool is not None:
+                    from rdkit import Chem
+
+                    for mol_input, (mol, flexres_mols, properties) in zip(
+                        mol_inputs,
+                        pool.imap(
+                            self._build_rdkit_mol_binary,
+                            mol_inputs,
+                            chunksize=max(1, len(mol_inputs) // (4 * num_procs)),
+                        ),
+                    ):
+                        yield mol_input[0], {
+                            "ligand": Chem.Mol(mol),
+                            "flex_residues": [Chem.Mol(frm) for frm in flexres_mols],
+                            "properties": properties,
+                        }
+                else:
+                    for mol_input in mol_inputs:
+                        mol, flexres_mols, properties = self._build_rdkit_mol(
+                            *mol_input
+                        )
+                        yield mol_input[0], {
+                            "ligand": mol,
+                            "flex_residues": flexres_mols,
+                            "properties": properties,
+                        }
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
 
     def find_similar_ligands(self, query_ligname: str):
         """
@@ -1660,6 +2145,86 @@ class RingtailCore:
                     print("Number similar ligands:", number_similar)
         return number_similar
 
+    def search_similar_ligands(
+        self, query: str, num_neighbors: int = 10, similarity_cutoff: float = 0.5
+    ) -> list:
+        """
+        Find the ligands with Morgan fingerprints most similar to the query ligand, and create a bookmark
+        with the best pose of each of them
+
+        Args:
+            query (str): name of a ligand in the database, or SMILES of the query ligand
+            num_neighbors (int): largest number of similar ligands to return
+            similarity_cutoff (float): smallest Tanimoto similarity of the returned ligands
+
+        Returns:
+            list: tuples of ligand name and Tanimoto similarity, most similar first
+        """
+        with self.storageman:
+            similar_ligands, bookmark_name = self.storageman.search_similar_ligands(
+                query, num_neighbors, similarity_cutoff
+            )
+        if not hasattr(self, "outputman"):
+            self.set_output_options()
+        with self.outputman:
+            self.outputman.write_similarity_search_header(
+                query, num_neighbors, similarity_cutoff
+            )
+            self.outputman.write_results_bookmark_to_log(bookmark_name)
+            number_similar = self.outputman.write_filter_log(
+                (ligname, round(similarity, 3))
+                for ligname, similarity in similar_ligands
+            )
+            self.outputman.log_num_passing_ligands(number_similar)
+        print("Number similar ligands:", number_similar)
+        return similar_ligands
+
+    def search_similar_poses(
+        self,
+        reference,
+        num_poses: int = 10,
+        metric: str = "tanimoto",
+        tversky_alpha: float = 1.0,
+        tversky_beta: float = 0.0,
+        within_bookmark: str = None,
+    ) -> list:
+        """
+        Find the poses with the interaction fingerprints most similar to those of a reference pose or list of
+        interactions, and create a bookmark with them
+
+        Args:
+            reference (int | list): Pose_ID of the reference pose, or list of interactions as
+                "<type>:<chain>:<resname>:<resid>:<atom>", e.g. "H:A:ARG:123:"
+            num_poses (int): largest number of similar poses to return
+            metric (str): "tanimoto" or "tversky"
+            tversky_alpha (float): weight of the reference interactions missing from a pose, for "tversky"
+            tversky_beta (float): weight of the interactions of a pose missing from the reference, for "tversky"
+            within_bookmark (str): only search the poses in this bookmark
+
+        Returns:
+            list: tuples of Pose_ID, ligand name and similarity, most similar first
+        """
+        with self.storageman:
+            similar_poses, bookmark_name = self.storageman.search_similar_poses(
+                reference,
+                num_poses,
+                metric,
+                tversky_alpha,
+                tversky_beta,
+                within_bookmark,
+            )
+        if not hasattr(self, "outputman"):
+            self.set_output_options()
+        with self.outputman:
+            self.outputman.write_similar_poses_header(reference, metric)
+            self.outputman.write_results_bookmark_to_log(bookmark_name)
+            number_similar = self.outputman.write_filter_log(
+                (pose_id, ligname, round(similarity, 3))
+                for pose_id, ligname, similarity in similar_poses
+            )
+        print("Number similar poses:", number_similar)
+        return similar_poses
+
     def plot(self, save=True, bookmark_name: str = None):
         """
         Get data needed for creating Ligand Efficiency vs
@@ -1705,6 +2270,8 @@ class RingtailCore:
         if save:
             self.outputman.save_scatterplot()
         else:
+            import matplotlib.pyplot as plt
+
             plt.show()
 
     def display_pymol(self, bookmark_name=None):
@@ -1716,6 +2283,8 @@ class RingtailCore:
         """
 
         import subprocess
+        import matplotlib.pyplot as plt
+        from rdkit import Chem
         from rdkit.Chem import PyMol
 
         # launch pymol session
@@ -1793,20 +2362,65 @@ class RingtailCore:
             cid = fig.canvas.mpl_connect("pick_event", onpick)
             plt.show()
 
-    def export_csv(self, requested_data: str, csv_name: str, table=False):
-        """Get requested data from database, export as CSV
+    def export_csv(
+        self, requested_data: str, csv_name: str, table=False, columns: list = None
+    ):
+        """Get requested data from database, export as CSV. Rows are written as they are fetched
+        from the database, so the data is never all held in memory.
 
         Args:
             requested_data (str): Table name or SQL-formatted query
             csv_name (str): Name for exported CSV file
             table (bool): flag indicating is requested data is a table name
+            columns (list, optional): names of the columns to export, all columns if None
         """
+        if not hasattr(self, "outputman"):
+            self.set_output_options()
         with self.storageman:
-            df = self.storageman.to_dataframe(requested_data, table=table)
-            df.to_csv(csv_name)
+            column_names, row_chunks = self.storageman.fetch_data_chunks(
+                requested_data, table=table, columns=columns
+            )
+            num_rows = self.outputman.write_csv(csv_name, column_names, row_chunks)
+        self.logger.info(f"Exported {num_rows} rows to {csv_name}")
+
+    def export_parquet(
+        self,
+        requested_data: str,
+        parquet_name: str,
+        table=False,
+        columns: list = None,
+        row_group_size: int = None,
+    ):
+        """Get requested data from database, export as Parquet file (requires pyarrow). Rows are written
+        as they are fetched from the database, one row group at a time.
+
+        Args:
+            requested_data (str): Table name or SQL-formatted query
+            parquet_name (str): Name for exported Parquet file
+            table (bool): flag indicating is requested data is a table name
+            columns (list, optional): names of the columns to export, all columns if None
+            row_group_size (int, optional): number of rows per row group, defaults to the fetch batch size of the storage manager
+        """
+        if not hasattr(self, "outputman"):
+            self.set_output_options()
+        with self.storageman:
+            column_names, row_chunks = self.storageman.fetch_data_chunks(
+                requested_data, table=table, columns=columns, chunk_size=row_group_size
+            )
+            num_rows = self.outputman.write_parquet(
+                parquet_name,
+                column_names,
+                row_chunks,
+                lambda column: self.storageman.fetch_column_type(
+                    requested_data, column, table
+                ),
+            )
+        self.logger.info(f"Exported {num_rows} rows to {parquet_name}")
 
     def export_bookmark_db(self, bookmark_name: str = None) -> str:
-        """Export database containing data from bookmark
+        """Export database containing data from bookmark. A new database is created with the Ringtail tables
+        and only the rows of the bookmark are copied into it, so the time and space needed scale with the
+        size of the bookmark rather than that of the database.
 
         Args:
             bookmark_name (str): name for bookmark_db
@@ -1825,15 +2439,23 @@ class RingtailCore:
                 "Requested export DB name already exists. Please rename or remove existing database. New database not exported."
             )
             return
-        with self.storageman:
-            self.storageman.clone(bookmark_db_name)
-        # connect to cloned database
         dictionary = self.storageopts.todict()
         dictionary["db_file"] = bookmark_db_name
+        dictionary["overwrite"] = False
         temp_storageman = StorageManager.check_storage_compatibility(self.storagetype)
-        with temp_storageman(**dictionary) as db_clone:
-            db_clone.prune()
-            db_clone.close_storage(vacuum=True)
+        try:
+            # create the new database with the Ringtail tables
+            with temp_storageman(**dictionary):
+                pass
+            with self.storageman:
+                self.storageman.copy_bookmark_to_db(bookmark_db_name)
+            with temp_storageman(**dictionary) as bookmark_db:
+                bookmark_db.rebuild_derived_tables()
+        except Exception:
+            # do not leave an incomplete database that blocks the next export
+            if os.path.exists(bookmark_db_name):
+                os.remove(bookmark_db_name)
+            raise
 
         return bookmark_db_name
 
@@ -1900,6 +2522,31 @@ class RingtailCore:
         with self.storageman:
             return self.storageman.get_all_bookmark_names()
 
+    def get_query_profile(self) -> list:
+        """
+        Method to retrieve the profile of the last filtering, recorded if the option 'profile_queries' was used
+
+        Returns:
+            list: of dicts with the "stage", "query", "query_plan", number of "rows" and "time" (seconds) of each filtering query
+        """
+        return self.storageman.query_profile
+
+    def suggest_indices(self, create: bool = False) -> list:
+        """
+        Method to suggest (and optionally create) single-column indices on the Results table that would
+        speed up the numerical filters and result ordering currently set
+
+        Args:
+            create (bool): create the suggested indices in the database
+
+        Returns:
+            list: SQLite statements creating the suggested indices
+        """
+        if not hasattr(self, "filters"):
+            self.set_filters()
+        with self.storageman:
+            return self.storageman.suggest_indices(self.filters.todict(), create)
+
     @staticmethod
     def default_dict() -> dict:
         """
@@ -405,6 +405,41 @@ class StorageOptions(RTOptions):
             "type": float,
             "description": "Cluster filtered ligands by Tanimoto distance of interaction fingerprints with Butina clustering and output ligand with lowest ligand efficiency from each cluster. Useful for enhancing selection of ligands with diverse interactions.",
         },
+        "cluster_method": {
+            "default": "butina",
+            "type": str,
+            "description": "Clustering algorithm used by mfpt_cluster and interaction_cluster. 'butina' (default) clusters with the Butina algorithm. 'sphere_exclusion' picks the ligand with the lowest ligand efficiency that is not yet in a cluster and assigns the unclustered ligands within the cutoff to it, in a single pass over the fingerprints, which is faster for very large numbers of passing ligands.",
+        },
+        "lsh_bands": {
+            "default": 16,
+            "type": int,
+            "description": "Number of MinHash bands used by cluster_method 'lsh'. Fingerprints sharing the MinHash values of a band are compared when clustering, so more bands find more of the ligands within the clustering cutoff (higher recall, closer to 'sphere_exclusion') at the cost of speed.",
+        },
+        "materialize_bookmarks": {
+            "default": None,
+            "type": bool,
+            "description": "Store the poses of new bookmarks in indexed tables, so that using the bookmark (e.g., filtering over it or exporting it) does not re-run the filtering query. Materialized bookmarks are refreshed when new results are added to the database.",
+        },
+        "profile_queries": {
+            "default": None,
+            "type": bool,
+            "description": "Record the SQL, query plan (EXPLAIN QUERY PLAN), number of rows and time of each stage of the filtering queries, and suggest indices that would speed up the numerical filters.",
+        },
+        "auto_index": {
+            "default": None,
+            "type": bool,
+            "description": "Create the single-column indices on Results suggested for the numerical filters and result ordering (docking_score, leff, nr_interactions, num_hb) before filtering.",
+        },
+        "cache_filters": {
+            "default": False,
+            "type": bool,
+            "description": "Store the Pose_IDs passing each filter set in the database, and reuse them when the same filters are run again on unchanged results. Cluster assignments are cached by clustering method, cutoff and set of clustered poses in the same way.",
+        },
+        "top_k": {
+            "default": None,
+            "type": int,
+            "description": "Keep only the best ranked ligands passing the filters (or poses, with output_all_poses), ranked by the order_results field or by docking score. Candidates are read in order of the ranking column and filtering stops after top_k ligands.",
+        },
         "bookmark_name": {
             "default": "passing_results",
             "type": str,
@@ -441,6 +476,18 @@ class StorageOptions(RTOptions):
                 raise OptionError(
                     "Requested ording option that is not available. Please see --help for available options."
                 )
+            if self.cluster_method not in [None, "butina", "sphere_exclusion", "lsh"]:
+                raise OptionError(
+                    f"'cluster_method' {self.cluster_method} not available, use 'butina', 'sphere_exclusion' or 'lsh'."
+                )
+            if self.lsh_bands is not None and self.lsh_bands < 1:
+                raise OptionError(
+                    f"'lsh_bands' has to be a positive number of bands, not {self.lsh_bands}."
+                )
+            if self.top_k is not None and self.top_k < 1:
+                raise OptionError(
+                    f"'top_k' has to be a positive number of ligands, not {self.top_k}."
+                )
             # Make sure we include ligand name in output columns
             if self.outfields is not None and "Ligand_name" not in self.outfields:
                 self.outfields = "Ligand_name," + self.outfields
@@ -711,6 +758,31 @@ class ReadOptions(RTOptions):
             "type": str,
             "description": "Allows user to find similar ligands to given ligand name based on previously performed morgan fingerprint or interaction clustering.",
         },
+        "similarity_search": {
+            "default": None,
+            "type": str,
+            "description": "Find the ligands with Morgan fingerprints most similar by Tanimoto similarity to the given ligand name or SMILES, and bookmark their best poses.",
+        },
+        "num_neighbors": {
+            "default": 10,
+            "type": int,
+            "description": "Largest number of similar ligands or poses returned by --similarity_search and --similar_poses.",
+        },
+        "similarity_cutoff": {
+            "default": 0.5,
+            "type": float,
+            "description": "Smallest Tanimoto similarity of the ligands returned by --similarity_search.",
+        },
+        "similar_poses": {
+            "default": None,
+            "type": str,
+            "description": "Find the poses with interaction fingerprints most similar to the given Pose_ID or comma-separated interactions (<type>:<chain>:<resname>:<resid>:<atom>), and bookmark them.",
+        },
+        "similarity_metric": {
+            "default": "tanimoto",
+            "type": str,
+            "description": "Similarity of interaction fingerprints used by --similar_poses, 'tanimoto' or 'tversky' (the fraction of the reference interactions a pose has).",
+        },
         "export_bookmark_csv": {
             "default": None,
             "type": str,
@@ -7,13 +7,11 @@
 import sqlite3
 import time
 import json
-import pandas as pd
+import re
+import hashlib
 from .logutils import LOGGER as logger
 import sys
 from signal import signal, SIGINT
-from rdkit import Chem
-from rdkit import DataStructs
-from rdkit.ML.Cluster import Butina
 import numpy as np
 import time
 from importlib.metadata import version
@@ -27,8 +25,6 @@ from .exceptions import (
 )
 from .exceptions import DatabaseQueryError, DatabaseViewCreationError, OptionError
 
-import multiprocess
-
 
 class StorageManager:
 
@@ -78,9 +74,13 @@ class StorageManager:
         """Initialize instance variables common to all StorageManager subclasses"""
         self.logger = logger
         self.closed_connection = False
+        self.session_active = False
+        self._metadata_cache = {}
 
     def __enter__(self):
-        """Used to access the database if using storage manager as a context manager
+        """Used to access the database if using storage manager as a context manager.
+        If a persistent session is active, the already open connection is reused
+        (and the database is reset if self.overwrite, as when opening the storage).
 
         Raises:
             StorageError
@@ -88,6 +88,15 @@ class StorageManager:
         Returns:
             instance: of class with open database connection
         """
+        if self.session_active and not self.closed_connection:
+            if self.overwrite:
+                try:
+                    self._initialize_storage()
+                except Exception as e:
+                    raise StorageError(
+                        f"Error while overwriting database in open session: {e}."
+                    ) from e
+            return self
         try:
             self._open_storage()
         except StorageError as e:
@@ -106,7 +115,13 @@ class StorageManager:
         Returns:
             instance: of class with closed database connection
         """
-        if not self.closed_connection:
+        if self.session_active:
+            # keep connection alive for the session, only release cursors
+            self._close_open_cursors()
+            if exc_type:
+                # do not leave a half-written transaction on the session connection
+                self.conn.rollback()
+        elif not self.closed_connection:
             self.close_storage()
         if exc_type:
             if exc_type == Exception:
@@ -118,6 +133,7 @@ class StorageManager:
     def _sigint_handler(self, signal_received, frame):
         """Handles and reports if program is interrupted through the terminal"""
         self.logger.critical("Ctrl + C pressed, keyboard interupt initiated")
+        self.session_active = False
         self.__exit__(None, None, None)
         sys.exit(0)
 
@@ -125,8 +141,30 @@ class StorageManager:
         """
         Methods to finalize when a database has been written to, and saving the current database schema to the sqlite database.
         """
+        # cached filter results are stale
+        self._clear_filter_cache()
         # index certain tables
         self._create_indices()
+        # bring per-ligand best poses up to date, in-place replaced results require a rebuild
+        self._create_ligand_best_table()
+        self._update_ligand_best_table(
+            full_rebuild=bool(
+                self.duplicate_handling and self.duplicate_handling.upper() == "REPLACE"
+            )
+        )
+        self._create_ligand_screening_tables()
+        self._update_ligand_screening_tables()
+        self._create_interaction_bitmap_table()
+        self._update_interaction_bitmaps(
+            full_rebuild=bool(
+                self.duplicate_handling and self.duplicate_handling.upper() == "REPLACE"
+            )
+        )
+        self._refresh_materialized_bookmarks(
+            full_refresh=bool(
+                self.duplicate_handling and self.duplicate_handling.upper() == "REPLACE"
+            )
+        )
         # set version of the database
         self._set_ringtail_db_schema_version(self._db_schema_ver)
         self.logger.info("Database write session completed successfully.")
@@ -148,6 +186,48 @@ class StorageManager:
         # close db itself
         self._close_connection()
         self.closed_connection = True
+        self._clear_metadata_cache()
+
+    def open_session(self):
+        """Opens a persistent database session. While the session is active the
+        connection (and any TEMP views/tables) is kept open between uses of the
+        storage manager as a context manager, and database metadata is cached.
+
+        Raises:
+            StorageError
+
+        Returns:
+            instance: of class with open database connection
+        """
+        if not self.session_active:
+            if self.closed_connection or not hasattr(self, "conn"):
+                self._open_storage()
+            self.session_active = True
+            self.logger.info("Persistent database session opened.")
+        return self
+
+    def close_session(self, vacuum=False):
+        """Closes a persistent database session and the underlying connection
+
+        Args:
+            vacuum (bool, optional): indicates that database should be vacuumed before closing
+        """
+        if self.session_active:
+            self.session_active = False
+            if not self.closed_connection:
+                self.close_storage(vacuum=vacuum)
+            self.logger.info("Persistent database session closed.")
+
+    def _clear_metadata_cache(self, key: str | None = None):
+        """Clears cached database metadata (column names, bookmark names, schema version)
+
+        Args:
+            key (str, optional): only clear this entry of the cache
+        """
+        if key is None:
+            self._metadata_cache = {}
+        else:
+            self._metadata_cache.pop(key, None)
 
     # endregion
 
@@ -215,22 +295,37 @@ class StorageManager:
             suppress_output (bool): prints filtering summary to sdout
 
         Returns:
-             iter: iterable, such as an sqlite cursor, of passing results
+             iter: generator of passing results, rows are fetched from the database as they are consumed
         """
         # before we do anything, check that the DB version matches the version number of our module
-        rt_version_same, db_rt_version = self.check_ringtaildb_version()
-        if not rt_version_same:
-            # NOTE will cause error when any version int is > 10
-            # catch version 1.0.0 where returned db_rt_version will be 0
-            if db_rt_version == 0:
-                db_rt_version = 100
-            raise StorageError(
-                f"Input database was created with Ringtail v{'.'.join([i for i in db_rt_version[:2]] + [db_rt_version[2:]])}. Confirm that this matches current Ringtail version and use Ringtail update script(s) to update database if needed."
+        self._check_db_version_for_filtering()
+        self.query_profile = []
+        if self.auto_index or self.profile_queries:
+            suggested_indices = self.suggest_indices(
+                all_filters, create=bool(self.auto_index)
+            )
+            if suggested_indices and not self.auto_index:
+                self.logger.info(
+                    "Indices that may speed up this filtering (use 'auto_index' to create them): "
+                    + "; ".join(suggested_indices)
+                )
+        cache_key = None
+        cached_view_query = None
+        if self.cache_filters:
+            cache_key = self._filter_cache_key(all_filters)
+            cached_view_query = self._fetch_cached_filter(cache_key)
+        if cached_view_query is not None:
+            # passing Pose_IDs are known, only fetch output columns
+            self.logger.info(
+                "Reusing results of identical filters from the filter cache."
+            )
+            view_query = cached_view_query
+            filter_results_str = self._generate_cached_results_query(cache_key)
+        else:
+            # create view of passing results
+            filter_results_str, view_query = self._generate_result_filtering_query(
+                all_filters
             )
-        # create view of passing results
-        filter_results_str, view_query = self._generate_result_filtering_query(
-            all_filters
-        )
         self.logger.debug(f"Query for filtering results: {filter_results_str}")
 
         # if max_miss> and we are enumerating interaction combinations, we want to give each passing view a new name by changing the self.bookmark_name
@@ -249,151 +344,1083 @@ class StorageManager:
             return None
 
         self.logger.debug("Running filtering query...")
+        if cache_key is not None and cached_view_query is None:
+            # also select Pose_ID to store the passing poses in the cache
+            return self._stream_filtered_results(
+                filter_results_str.replace("SELECT ", "SELECT R.Pose_ID, ", 1),
+                cache_entry=(cache_key, all_filters, view_query),
+            )
+        return self._stream_filtered_results(filter_results_str)
+
+    def _stream_filtered_results(self, query: str, cache_entry: tuple = None) -> iter:
+        """Yields the rows of the filtering query, fetched in batches of self._fetch_batch_size rows
+        so that passing results are never all held in memory. The query profile is recorded (and the
+        passing poses cached) once all rows are consumed.
+
+        Args:
+            query (str): filtering query
+            cache_entry (tuple, optional): (cache key, filters, bookmark query) if the passing poses should be cached,
+                the query then selects Pose_ID as first column, which is not yielded
+
+        Yields:
+            tuple: row of passing results
+        """
         time0 = time.perf_counter()
-        filtered_results = self._run_query(filter_results_str).fetchall()
+        # cursor is not in self.open_cursors, it has to outlive the storage manager context in a session
+        self._load_chemicalite_if_needed(query)
+        try:
+            cur = self.conn.cursor()
+            cur.execute(query)
+        except sqlite3.OperationalError as e:
+            raise DatabaseQueryError(
+                "Unable to execute query {0}: {1}".format(query, e)
+            ) from e
+        num_rows = 0
+        pose_ids = []
+        try:
+            while rows := cur.fetchmany(self._fetch_batch_size):
+                num_rows += len(rows)
+                if cache_entry is not None:
+                    pose_ids.extend(row[0] for row in rows)
+                    rows = [row[1:] for row in rows]
+                yield from rows
+        finally:
+            cur.close()
+        query_time = time.perf_counter() - time0
         self.logger.debug(
-            f"Time to run query: {time.perf_counter() - time0:.2f} seconds"
+            f"Time to run query and fetch results: {query_time:.2f} seconds"
         )
-        return filtered_results
-
-    def check_passing_bookmark_exists(self, bookmark_name: str | None = None):
-        """Checks if bookmark name is in database
+        if cache_entry is not None:
+            self._insert_cached_filter(*cache_entry, pose_ids=pose_ids)
+        self._record_query_profile("filtering", query, query_time, num_rows)
 
-        Args:
-            bookmark_name (str, optional): name of bookmark name to check if exist, or else will use storageman bookmark_name attribute
+    def _check_db_version_for_filtering(self):
+        """Checks that the database version matches the version number of the Ringtail module
 
-        Returns:
-            bool: indicates if bookmark_name exists in the current database
+        Raises:
+            StorageError
         """
-        if bookmark_name is None:
-            bookmark_name = self.bookmark_name
+        rt_version_same, db_rt_version = self.check_ringtaildb_version()
+        if not rt_version_same:
+            # NOTE will cause error when any version int is > 10
+            # catch version 1.0.0 where returned db_rt_version will be 0
+            if db_rt_version == 0:
+                db_rt_version = 100
+            raise StorageError(
+                f"Input database was created with Ringtail v{'.'.join([i for i in db_rt_version[:2]] + [db_rt_version[2:]])}. Confirm that this matches current Ringtail version and use Ringtail update script(s) to update database if needed."
+            )
 
-        bookmark_exists = bookmark_name in self.get_all_bookmark_names()
+    def _create_filter_cache_tables(self):
+        """Create tables caching the poses passing filters. Filter_cache holds one row per cached filter set
+        (or percentile cutoff), and Filter_cache_poses the passing Pose_IDs of each filter set. Columns of
+        Filter_cache are:
+        cache_key           VARCHAR PRIMARY KEY,
+        filters             VARCHAR,
+        view_query          VARCHAR,
+        cutoff              FLOAT(4),
+        num_poses           INTEGER,
+        last_used           INTEGER
 
-        return bookmark_exists
+        last_used orders the entries by last use, the least recently used entries are dropped when
+        there are more than _filter_cache_max_entries.
 
-    def get_plot_data(self, bookmark_name: str = None, only_passing=False):
-        """This function is expected to return an ascii plot
-        representation of the results
+        Raises:
+            DatabaseTableCreationError
+        """
+        try:
+            cur = self.conn.cursor()
+            cur.execute("""CREATE TABLE IF NOT EXISTS Filter_cache (
+                cache_key           VARCHAR PRIMARY KEY,
+                filters             VARCHAR,
+                view_query          VARCHAR,
+                cutoff              FLOAT(4),
+                num_poses           INTEGER,
+                last_used           INTEGER)""")
+            cur.execute("""CREATE TABLE IF NOT EXISTS Filter_cache_poses (
+                cache_key           VARCHAR,
+                Pose_ID             INTEGER,
+                PRIMARY KEY (cache_key, Pose_ID)) WITHOUT ROWID""")
+            self.conn.commit()
+            cur.close()
+        except sqlite3.OperationalError as e:
+            raise DatabaseTableCreationError(
+                "Error while creating filter cache tables."
+            ) from e
+
+    def _filter_cache_key(self, all_filters: dict, kind: str = "filters") -> str:
+        """Canonical hash of filters, the options deciding which poses pass them, and the version of the database content
+        (highest Pose_ID in Results, the cache is also cleared when results are written). Filters given as lists
+        are sorted, as their order does not change the passing poses.
 
         Args:
-            bookmark_name (str): name of bookmark for which to fetch passing data. Will use default bookmark name if None. Returns empty list if bookmark does not exist.
-            only_passing (bool): Only return data for passing ligands. Will return empty list for all data.
+            all_filters (dict): filters, or other values to be cached
+            kind (str, optional): what is cached, "filters" or e.g. "percentile"
 
         Returns:
-            tuple: cursors as (<all data cursor>, <passing data cursor>)
+            str: cache key
         """
+        filters = {
+            key: (
+                sorted(value, key=json.dumps)
+                if isinstance(value, (list, tuple))
+                else value
+            )
+            for key, value in all_filters.items()
+        }
+        filter_bookmark_query = None
+        if self.filter_bookmark:
+            filter_bookmark_query = self.conn.execute(
+                "SELECT Query FROM Bookmarks WHERE Bookmark_name = ?",
+                (self.filter_bookmark,),
+            ).fetchone()
+        payload = {
+            "kind": kind,
+            "filters": filters,
+            "filter_bookmark": self.filter_bookmark,
+            "filter_bookmark_query": filter_bookmark_query,
+            "output_all_poses": self.output_all_poses,
+            "mfpt_cluster": self.mfpt_cluster,
+            "interaction_cluster": self.interaction_cluster,
+            "cluster_method": (
+                [self.cluster_method, self.lsh_bands]
+                if self.mfpt_cluster or self.interaction_cluster
+                else None
+            ),
+            "top_k": [self.top_k, self.order_results] if self.top_k else None,
+            "content_version": self.conn.execute(
+                "SELECT IFNULL(MAX(Pose_ID), 0) FROM Results"
+            ).fetchone()[0],
+        }
+        return hashlib.sha1(
+            json.dumps(payload, sort_keys=True, default=str).encode()
+        ).hexdigest()
 
-        # checks if we have filtered by looking for view name in list of view names
-        if self.check_passing_bookmark_exists(bookmark_name):
-            if only_passing:
-                return [], self._fetch_passing_plot_data(bookmark_name)
-            else:
-                return self._fetch_all_plot_data(), self._fetch_passing_plot_data(
-                    bookmark_name
-                )
-        else:
-            return self._fetch_all_plot_data(), []
+    def _fetch_cached_filter(self, cache_key: str, column: str = "view_query"):
+        """Looks up a cache entry and marks it as used
 
-    def crossref_filter(
+        Args:
+            cache_key (str): key from _filter_cache_key
+            column (str, optional): cached value to return, "view_query" or "cutoff"
+
+        Returns:
+            str | float | None: cached value, None if not cached
+        """
+        if "Filter_cache" not in [
+            table[0] for table in self._fetch_existing_table_names()
+        ]:
+            return None
+        cur = self.conn.cursor()
+        row = cur.execute(
+            f"SELECT {column} FROM Filter_cache WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+        if row is not None:
+            cur.execute(
+                "UPDATE Filter_cache SET last_used = (SELECT MAX(last_used) + 1 FROM Filter_cache) WHERE cache_key = ?",
+                (cache_key,),
+            )
+            self.conn.commit()
+        cur.close()
+        return None if row is None else row[0]
+
+    def _insert_cached_filter(
         self,
-        new_db: str,
-        bookmark1_name: str,
-        bookmark2_name: str,
-        selection_type="-",
-        old_db=None,
-    ) -> tuple:
-        """Selects ligands found or not found in the given bookmark in both current db and new_db. Stores as temp view
+        cache_key: str,
+        all_filters: dict,
+        view_query: str = None,
+        pose_ids: list = [],
+        cutoff: float = None,
+    ):
+        """Stores the passing poses (or percentile cutoff) of a filter set in the filter cache, and drops the least recently used entries
 
         Args:
-            new_db (str): file name for database to attach
-            bookmark1_name (str): string for name of first bookmark/temp table to compare
-            bookmark2_name (str): string for name of second bookmark to compare
-            selection_type (str): "+" or "-" indicating if ligand names should ("+") or should not "-" be in both databases
-            old_db (str, optional): file name for previous database
+            cache_key (str): key from _filter_cache_key
+            all_filters (dict): filters, stored for reference
+            view_query (str, optional): query of the bookmark created by the filters
+            pose_ids (list, optional): passing Pose_IDs
+            cutoff (float, optional): percentile cutoff
 
-        Returns:
-            tuple: (name of new bookmark (str), number of ligands passing new bookmark (int))
+        Raises:
+            DatabaseInsertionError
         """
+        self._create_filter_cache_tables()
+        try:
+            cur = self.conn.cursor()
+            cur.execute(
+                "DELETE FROM Filter_cache_poses WHERE cache_key = ?", (cache_key,)
+            )
+            cur.execute(
+                """INSERT OR REPLACE INTO Filter_cache VALUES
+                (?,?,?,?,?,(SELECT IFNULL(MAX(last_used), 0) + 1 FROM Filter_cache))""",
+                (
+                    cache_key,
+                    json.dumps(all_filters, default=str),
+                    view_query,
+                    cutoff,
+                    len(pose_ids),
+                ),
+            )
+            cur.executemany(
+                "INSERT OR IGNORE INTO Filter_cache_poses (cache_key, Pose_ID) VALUES (?,?)",
+                ((cache_key, pose_id) for pose_id in pose_ids),
+            )
+            stale_keys = cur.execute(
+                "SELECT cache_key FROM Filter_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?",
+                (self._filter_cache_max_entries,),
+            ).fetchall()
+            cur.executemany("DELETE FROM Filter_cache WHERE cache_key = ?", stale_keys)
+            cur.executemany(
+                "DELETE FROM Filter_cache_poses WHERE cache_key = ?", stale_keys
+            )
+            self.conn.commit()
+            cur.close()
+        except sqlite3.OperationalError as e:
+            raise DatabaseInsertionError(
+                "Error while inserting into the filter cache"
+            ) from e
 
-        if old_db is not None:
-            self._detach_db(old_db.split(".")[0])  # remove file extension
+    def _generate_cached_results_query(self, cache_key: str) -> str:
+        """Query selecting the output columns of the cached passing poses of a filter set
 
-        new_db_name = new_db.split(".")[0]  # remove file extension
+        Args:
+            cache_key (str): key from _filter_cache_key
 
-        self._attach_db(new_db, new_db_name)
+        Returns:
+            str: SQLite-formatted query
+        """
+        filtering_window = self.filter_bookmark or "Results"
+        query = f"""SELECT {", ".join("R." + column for column in self._generate_outfield_list())} FROM {filtering_window} R
+            WHERE R.Pose_ID IN (SELECT Pose_ID FROM Filter_cache_poses WHERE cache_key = '{cache_key}')"""
+        if self.order_results or self.top_k:
+            query += " ORDER BY " + self._ranking_column()
+        return query
 
-        if selection_type == "-":
-            select_str = "NOT IN"
-        elif selection_type == "+":
-            select_str = "IN"
-        else:
-            raise StorageError(f"Unrecognized selection type {selection_type}")
+    def _clear_filter_cache(self):
+        """Drops all entries of the filter cache and of the cluster cache, needed when results change"""
+        existing_tables = [table[0] for table in self._fetch_existing_table_names()]
+        if "Cluster_cache" in existing_tables:
+            try:
+                self.conn.execute("DELETE FROM Cluster_cache")
+                self.conn.commit()
+            except sqlite3.OperationalError as e:
+                raise StorageError("Error while clearing the cluster cache") from e
+        if "Filter_cache" not in existing_tables:
+            return
+        try:
+            cur = self.conn.cursor()
+            cur.execute("DELETE FROM Filter_cache")
+            cur.execute("DELETE FROM Filter_cache_poses")
+            self.conn.commit()
+            cur.close()
+            self._drop_unused_filtering_tables()
+        except sqlite3.OperationalError as e:
+            raise StorageError("Error while clearing the filter cache") from e
+
+    def _create_cluster_cache_table(self):
+        """Create table caching cluster assignments, one row per clustered set of poses. Arrays are stored as
+        int64 binary blobs. Columns are:
+        cache_key           VARCHAR PRIMARY KEY,
+        cluster_type        VARCHAR,
+        cluster_method      VARCHAR,
+        cutoff              FLOAT(4),
+        num_poses           INTEGER,
+        pose_ids            BLOB,
+        cluster_ids         BLOB,
+        neighbor_pairs      BLOB,
+        last_used           INTEGER
+
+        pose_ids are the sorted Pose_IDs of the clustered poses, and cluster_ids the cluster of each of them.
+        neighbor_pairs holds the pairs of Pose_IDs within the cutoff for Butina clustering, used to recluster
+        subsets of the poses. last_used orders the entries by last use, the least recently used entries are
+        dropped when there are more than _filter_cache_max_entries.
 
-        temp_name = "temp_" + str(self.temptable_suffix)
-        self._create_temp_table(temp_name)
-        temp_insert_query = self._generate_selective_insert_query(
-            bookmark1_name, bookmark2_name, select_str, new_db_name, temp_name
-        )
+        Raises:
+            DatabaseTableCreationError
+        """
+        try:
+            cur = self.conn.cursor()
+            cur.execute("""CREATE TABLE IF NOT EXISTS Cluster_cache (
+                cache_key           VARCHAR PRIMARY KEY,
+                cluster_type        VARCHAR,
+                cluster_method      VARCHAR,
+                cutoff              FLOAT(4),
+                num_poses           INTEGER,
+                pose_ids            BLOB,
+                cluster_ids         BLOB,
+                neighbor_pairs      BLOB,
+                last_used           INTEGER)""")
+            self.conn.commit()
+            cur.close()
+        except sqlite3.OperationalError as e:
+            raise DatabaseTableCreationError(
+                "Error while creating cluster cache table."
+            ) from e
 
-        self._insert_into_temp_table(temp_insert_query)
+    def _cluster_cache_key(
+        self, cluster_type: str, cutoff: float, sorted_pose_ids: np.ndarray
+    ) -> str:
+        """Hash of the clustering method, cutoff and a digest of the clustered Pose_IDs
 
-        num_passing = self._get_number_passing_ligands(temp_name)
+        Args:
+            cluster_type (str): "ifp" or "mfp"
+            cutoff (float): Tanimoto distance cutoff
+            sorted_pose_ids (np.ndarray): sorted int64 Pose_IDs of the clustered poses
 
-        self.temptable_suffix += 1
+        Returns:
+            str: cache key
+        """
+        payload = {
+            "cluster_type": cluster_type,
+            "cluster_method": self._cluster_method_key(),
+            "cutoff": cutoff,
+            "pose_ids": hashlib.sha1(sorted_pose_ids.tobytes()).hexdigest(),
+        }
+        return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
 
-        return temp_name, num_passing
+    def _cluster_method_key(self) -> str:
+        """Clustering method as stored in the cluster cache, including the number of bands for LSH clustering
 
-    def prune(self):
-        """Deletes rows from results, ligands, and interactions in a bookmark
-        if they do not pass filtering criteria
+        Returns:
+            str: clustering method
         """
-        self._delete_from_results()
-        self._delete_from_ligands()
-        self._delete_from_interactions_not_in_view()
+        cluster_method = self.cluster_method or "butina"
+        if cluster_method == "lsh":
+            cluster_method += f"_{self.lsh_bands or 16}"
+        return cluster_method
 
-    # endregion
+    def _fetch_cached_clusters(self, cache_key: str) -> tuple | None:
+        """Looks up the cluster assignments of a set of poses and marks them as used
 
-    # region common keywords
-    @classmethod
-    def _data_kw_groups(cls, group):
-        """Method containing lists of keywords in specific data groups, used to associate data with database columns
+        Args:
+            cache_key (str): key from _cluster_cache_key
+
+        Returns:
+            tuple | None: sorted Pose_IDs and their cluster ids, None if not cached
+        """
+        if "Cluster_cache" not in [
+            table[0] for table in self._fetch_existing_table_names()
+        ]:
+            return None
+        row = self.conn.execute(
+            "SELECT pose_ids, cluster_ids FROM Cluster_cache WHERE cache_key = ?",
+            (cache_key,),
+        ).fetchone()
+        if row is None:
+            return None
+        self.conn.execute(
+            "UPDATE Cluster_cache SET last_used = (SELECT MAX(last_used) + 1 FROM Cluster_cache) WHERE cache_key = ?",
+            (cache_key,),
+        )
+        self.conn.commit()
+        return np.frombuffer(row[0], dtype=np.int64), np.frombuffer(
+            row[1], dtype=np.int64
+        )
+
+    def _fetch_cached_neighbor_pairs(
+        self, cluster_type: str, cutoff: float, sorted_pose_ids: np.ndarray
+    ) -> tuple | None:
+        """Looks up the Butina neighbor pairs of the smallest cached set of poses containing all given poses
 
         Args:
-            group (str): group of whose keywords are needed, including
-                stateVar_keys
-                ligand_data_keys
-                interaction_data_kws
-                outfield_options
+            cluster_type (str): "ifp" or "mfp"
+            cutoff (float): Tanimoto distance cutoff
+            sorted_pose_ids (np.ndarray): sorted int64 Pose_IDs of the poses to cluster
 
         Returns:
-            list: of keywords belonging to a specific group
+            tuple | None: arrays of the Pose_IDs i and j of the pairs within the cutoff, None if no cached set contains the poses
         """
-        groups = {
-            "stateVar_keys": ["pose_about", "pose_translations", "pose_quarternions"],
-            "ligand_data_keys": [
-                "cluster_rmsds",
-                "ref_rmsds",
-                "scores",
-                "leff",
-                "delta",
-                "intermolecular_energy",
-                "vdw_hb_desolv",
-                "electrostatics",
-                "flex_ligand",
-                "flexLigand_flexReceptor",
-                "internal_energy",
-                "torsional_energy",
-                "unbound_energy",
-            ],
-            "interaction_data_kws": [
-                "type",
-                "chain",
-                "residue",
-                "resid",
-                "recname",
-                "recid",
-            ],
+        if "Cluster_cache" not in [
+            table[0] for table in self._fetch_existing_table_names()
+        ]:
+            return None
+        cur = self.conn.cursor()
+        cur.execute(
+            """SELECT cache_key, pose_ids, neighbor_pairs FROM Cluster_cache
+            WHERE cluster_type = ? AND cluster_method = 'butina' AND cutoff = ? AND num_poses > ? AND neighbor_pairs IS NOT NULL
+            ORDER BY num_poses""",
+            (cluster_type, cutoff, len(sorted_pose_ids)),
+        )
+        for cache_key, pose_ids, neighbor_pairs in cur:
+            if np.isin(
+                sorted_pose_ids,
+                np.frombuffer(pose_ids, dtype=np.int64),
+                assume_unique=True,
+            ).all():
+                cur.close()
+                self.conn.execute(
+                    "UPDATE Cluster_cache SET last_used = (SELECT MAX(last_used) + 1 FROM Cluster_cache) WHERE cache_key = ?",
+                    (cache_key,),
+                )
+                self.conn.commit()
+                return tuple(
+                    np.frombuffer(neighbor_pairs, dtype=np.int64).reshape(2, -1)
+                )
+        cur.close()
+        return None
+
+    def _insert_cached_clusters(
+        self,
+        cache_key: str,
+        cluster_type: str,
+        cutoff: float,
+        sorted_pose_ids: np.ndarray,
+        cluster_ids: np.ndarray,
+        neighbor_pairs: tuple = None,
+    ):
+        """Stores the cluster assignments of a set of poses in the cluster cache, and drops the least recently used entries
+
+        Args:
+            cache_key (str): key from _cluster_cache_key
+            cluster_type (str): "ifp" or "mfp"
+            cutoff (float): Tanimoto distance cutoff
+            sorted_pose_ids (np.ndarray): sorted int64 Pose_IDs of the clustered poses
+            cluster_ids (np.ndarray): cluster of each pose
+            neighbor_pairs (tuple, optional): arrays of the Pose_IDs i and j of the pairs within the cutoff, for Butina clustering
+
+        Raises:
+            DatabaseInsertionError
+        """
+        self._create_cluster_cache_table()
+        try:
+            cur = self.conn.cursor()
+            cur.execute(
+                """INSERT OR REPLACE INTO Cluster_cache VALUES
+                (?,?,?,?,?,?,?,?,(SELECT IFNULL(MAX(last_used), 0) + 1 FROM Cluster_cache))""",
+                (
+                    cache_key,
+                    cluster_type,
+                    self._cluster_method_key(),
+                    cutoff,
+                    len(sorted_pose_ids),
+                    sorted_pose_ids.astype(np.int64).tobytes(),
+                    cluster_ids.astype(np.int64).tobytes(),
+                    (
+                        None
+                        if neighbor_pairs is None
+                        else np.array(neighbor_pairs, dtype=np.int64).tobytes()
+                    ),
+                ),
+            )
+            cur.execute(
+                "DELETE FROM Cluster_cache WHERE cache_key IN (SELECT cache_key FROM Cluster_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self._filter_cache_max_entries,),
+            )
+            self.conn.commit()
+            cur.close()
+        except sqlite3.OperationalError as e:
+            raise DatabaseInsertionError(
+                "Error while inserting into the cluster cache"
+            ) from e
+
+    def _cluster_poses(
+        self,
+        cluster_type: str,
+        cutoff: float,
+        pose_ids: list,
+        leffs: list,
+        fingerprints,
+    ) -> tuple:
+        """Clusters poses by the Tanimoto distance of their fingerprints. With cache_filters, cluster assignments are
+        cached by clustering method, cutoff and set of poses, and reused when the same poses are clustered again. A set of
+        poses contained in a set clustered before with Butina clustering is reclustered from the cached pairs of poses
+        within the cutoff, without computing fingerprints.
+
+        Args:
+            cluster_type (str): "ifp" or "mfp"
+            cutoff (float): Tanimoto distance cutoff
+            pose_ids (list): Pose_IDs of the poses to cluster
+            leffs (list): ligand efficiency of each pose
+            fingerprints (callable): returns the packed fingerprints of the poses, from _pack_fingerprints
+
+        Returns:
+            tuple: of clusters, each a tuple of indices in pose_ids starting with the cluster centroid (cached clusters are in index order)
+        """
+        if not self.cache_filters:
+            return self._cluster_fingerprints(fingerprints(), cutoff, leffs)
+
+        pose_ids = np.asarray(pose_ids, dtype=np.int64)
+        pose_id_order = np.argsort(pose_ids, kind="stable")
+        sorted_pose_ids = pose_ids[pose_id_order]
+        cache_key = self._cluster_cache_key(cluster_type, cutoff, sorted_pose_ids)
+        cached = self._fetch_cached_clusters(cache_key)
+        if cached is not None:
+            self.logger.info(f"Reusing cached {cluster_type} cluster assignments")
+            cached_pose_ids, cached_cluster_ids = cached
+            cluster_ids = cached_cluster_ids[np.searchsorted(cached_pose_ids, pose_ids)]
+            members = np.argsort(cluster_ids, kind="stable")
+            starts = np.flatnonzero(
+                np.r_[True, np.diff(cluster_ids[members]) != 0, True]
+            )
+            return tuple(
+                tuple(members[start:stop].tolist())
+                for start, stop in zip(starts[:-1], starts[1:])
+            )
+
+        neighbor_pairs = None
+        if (self.cluster_method or "butina") == "butina":
+            neighbor_pairs = self._fetch_cached_neighbor_pairs(
+                cluster_type, cutoff, sorted_pose_ids
+            )
+            if neighbor_pairs is not None:
+                self.logger.info(
+                    f"Reclustering {cluster_type} clusters from cached neighbor pairs"
+                )
+                # pairs between the poses to cluster, as indices in pose_ids
+                kept = np.isin(neighbor_pairs[0], sorted_pose_ids) & np.isin(
+                    neighbor_pairs[1], sorted_pose_ids
+                )
+                neighbor_pairs = (neighbor_pairs[0][kept], neighbor_pairs[1][kept])
+                pairs_i, pairs_j = (
+                    pose_id_order[np.searchsorted(sorted_pose_ids, pair_pose_ids)]
+                    for pair_pose_ids in neighbor_pairs
+                )
+            else:
+                pairs_i, pairs_j = self._tanimoto_neighbor_pairs(fingerprints(), cutoff)
+                neighbor_pairs = (pose_ids[pairs_i], pose_ids[pairs_j])
+            clusters = self._butina_from_neighbors(len(pose_ids), pairs_i, pairs_j)
+        else:
+            clusters = self._cluster_fingerprints(fingerprints(), cutoff, leffs)
+
+        cluster_ids = np.empty(len(pose_ids), dtype=np.int64)
+        for ci, cluster in enumerate(clusters):
+            cluster_ids[list(cluster)] = ci
+        self._insert_cached_clusters(
+            cache_key,
+            cluster_type,
+            cutoff,
+            sorted_pose_ids,
+            cluster_ids[pose_id_order],
+            neighbor_pairs,
+        )
+        return clusters
+
+    def filter_interaction_combinations(
+        self, all_filters: dict, interaction_combinations: list
+    ) -> tuple:
+        """Filters results for each combination of interaction filters in one pass. For every pose passing the
+        other filters, a bitset of the interaction filters it satisfies is stored in a new table
+        <bookmark_name>_<n>_interaction_masks. Poses satisfying at least (number of interaction filters - max_miss)
+        filters make up the union bookmark <bookmark_name>_union, and a pose passes an interaction combination if
+        its bitset contains all bits of the combination. Bookmarks for the combinations are views over the bitsets,
+        so no combination is filtered unless it is read, and passing results are read from the bookmarks in batches
+        as they are consumed.
+
+        Args:
+            all_filters (dict): dict containing all filters. Expects format and keys corresponding to ringtail.Filters().todict()
+            interaction_combinations (list): list of lists of positions of the interaction filters in each combination,
+                interaction filters ordered as in all_filters[interaction_type] for interaction types in Filters.get_filter_keys("interaction")
+
+        Raises:
+            OptionError
+            DatabaseQueryError
+
+        Returns:
+            list: of (bookmark name, generator of passing results) for each combination, bookmark name None if no results
+            iter: generator of passing results for the union of combinations
+        """
+        self._check_db_version_for_filtering()
+        self.query_profile = []
+        filtering_window = self.filter_bookmark or "Results"
+
+        # interaction filters in order, each as list of interaction indices
+        interaction_filters = []
+        for interaction_type in Filters.get_filter_keys("interaction"):
+            for interaction in all_filters[interaction_type]:
+                interaction_filters.append(
+                    (
+                        self._fetch_interaction_filter_indices(
+                            interaction_type, interaction[0]
+                        ),
+                        interaction[1],
+                    )
+                )
+        if len(interaction_filters) > 62:
+            raise OptionError(
+                "Cannot enumerate combinations of more than 62 interaction filters."
+            )
+        # react_any is required for all combinations
+        react_any_indices = []
+        if all_filters.get("react_any"):
+            react_any_indices = [
+                i[0] for i in self._get_interaction_indices(["R", "", "", "", ""])
+            ]
+            if not react_any_indices:
+                self.logger.warning(
+                    "Given 'react_any' filter, no reactive interactions found. Excluded from filtering."
+                )
+
+        # poses passing all non-interaction filters
+        candidate_filters = dict(all_filters)
+        for interaction_type in Filters.get_filter_keys("interaction"):
+            candidate_filters[interaction_type] = []
+        candidate_filters["react_any"] = None
+        candidate_filters["max_miss"] = 0
+        output_all_poses, order_results = self.output_all_poses, self.order_results
+        try:
+            self.output_all_poses, self.order_results = True, None
+            _, candidate_query = self._generate_result_filtering_query(
+                candidate_filters
+            )
+        except DatabaseQueryError:
+            # no other filters given
+            candidate_query = f"SELECT * FROM {filtering_window} R"
+        finally:
+            self.output_all_poses, self.order_results = output_all_poses, order_results
+
+        # bitset of satisfied interaction filters for each pose, poses without interactions satisfy only exclusions
+        satisfied = []
+        for indices, wanted in interaction_filters:
+            has_interaction = (
+                f"IFNULL(MAX(I.interaction_id IN ({numlist2str(indices, ',')})), 0)"
+            )
+            satisfied.append(has_interaction if wanted else f"(1 - {has_interaction})")
+        mask_expression = (
+            " + ".join(f"({bit} << {k})" for k, bit in enumerate(satisfied)) or "0"
+        )
+        count_expression = " + ".join(satisfied) or "0"
+        min_satisfied = len(interaction_filters) - min(
+            all_filters["max_miss"], len(interaction_filters)
+        )
+        having_condition = f"{count_expression} >= {min_satisfied}"
+        if react_any_indices:
+            having_condition += f" AND IFNULL(MAX(I.interaction_id IN ({numlist2str(react_any_indices, ',')})), 0) = 1"
+        masks_table = self._new_filtering_table_name("interaction_masks")
+        masks_query = f"""SELECT C.Pose_ID AS Pose_ID, {mask_expression} AS mask
+            FROM ({candidate_query}) C LEFT JOIN Interactions I ON I.Pose_ID = C.Pose_ID
+            GROUP BY C.Pose_ID HAVING {having_condition}"""
+        self.logger.debug(f"Query for interaction bitsets: {masks_query}")
+        self._load_chemicalite_if_needed(masks_query)
+        try:
+            time0 = time.perf_counter()
+            cur = self.conn.cursor()
+            cur.execute(
+                f"CREATE TABLE {masks_table} (Pose_ID INTEGER PRIMARY KEY, mask INTEGER)"
+            )
+            cur.execute(f"INSERT INTO {masks_table} (Pose_ID, mask) {masks_query}")
+            self.conn.commit()
+            num_masks = cur.execute(f"SELECT COUNT(*) FROM {masks_table}").fetchone()[0]
+            cur.close()
+        except sqlite3.OperationalError as e:
+            raise DatabaseQueryError(
+                f"Error ({e}) while filtering interaction combinations"
+            ) from e
+        self._record_query_profile(
+            "interaction bitsets",
+            masks_query,
+            time.perf_counter() - time0,
+            num_masks,
+        )
+
+        # a combination has passing results if any stored bitset contains all of its bits
+        distinct_masks = [
+            row[0]
+            for row in self._run_query(
+                f"SELECT DISTINCT mask FROM {masks_table}"
+            ).fetchall()
+        ]
+        combination_masks = [
+            sum(1 << position for position in combination)
+            for combination in interaction_combinations
+        ]
+
+        # create bookmarks as views over the interaction bitsets
+        passing_bookmarks = []
+        empty_bookmarks = []
+        for i, (combination, combination_mask) in enumerate(
+            zip(interaction_combinations, combination_masks)
+        ):
+            bookmark_name = (
+                f"{self.bookmark_name}_{i}"
+                if len(interaction_combinations) > 1
+                else self.bookmark_name
+            )
+            if not any(
+                mask & combination_mask == combination_mask for mask in distinct_masks
+            ):
+                empty_bookmarks.append(bookmark_name)
+                passing_bookmarks.append(None)
+                continue
+            combination_filters = dict(all_filters)
+            for interaction_type in Filters.get_filter_keys("interaction"):
+                combination_filters[interaction_type] = []
+            position = 0
+            for interaction_type in Filters.get_filter_keys("interaction"):
+                for interaction in all_filters[interaction_type]:
+                    if position in combination:
+                        combination_filters[interaction_type].append(interaction)
+                    position += 1
+            combination_filters["max_miss"] = 0
+            self.create_bookmark(
+                bookmark_name,
+                self._interaction_mask_view_query(
+                    filtering_window, masks_table, combination_mask
+                ),
+                filters=combination_filters,
+            )
+            passing_bookmarks.append(bookmark_name)
+
+        # union of all combinations
+        union_bookmark_name = f"{self.bookmark_name}_union"
+        self.create_bookmark(
+            union_bookmark_name,
+            self._interaction_mask_view_query(filtering_window, masks_table, 0),
+            filters=all_filters,
+        )
+        # dropped once the bitsets are read by the union view, so they are not dropped as unused
+        for bookmark_name in empty_bookmarks:
+            self.drop_bookmark(bookmark_name)
+        self.current_bookmark_name = union_bookmark_name
+
+        # passing results of each combination are streamed from its bookmark when they are consumed
+        outfield_columns = self._generate_outfield_list()
+        order_column = (
+            self.field_to_column_name[self.order_results]
+            if self.order_results
+            else "LigName"
+        )
+
+        def bookmark_results(bookmark_name):
+            return self._stream_filtered_results(
+                f"""SELECT {", ".join("R." + column for column in outfield_columns)} FROM {bookmark_name} R
+                ORDER BY R.{order_column}, R.docking_score, R.Pose_ID"""
+            )
+
+        combinations = [
+            (
+                (bookmark_name, bookmark_results(bookmark_name))
+                if bookmark_name
+                else (None, [])
+            )
+            for bookmark_name in passing_bookmarks
+        ]
+        return combinations, bookmark_results(union_bookmark_name)
+
+    def filter_results_batch(self, filter_sets: list, bookmark_names: list) -> list:
+        """Filters results with several filter sets in shared passes over the results. The partial queries of each
+        filter set are combined into one condition, and one scan of the filtering window stores a bitset of the filter
+        sets each pose passes in a new table <bookmark_name>_<n>_filter_masks (62 filter sets per table). Bookmarks for
+        the filter sets are views over the bitsets, and the number of passing ligands of all filter sets is counted in
+        one more pass over the bitsets.
+
+        Args:
+            filter_sets (list): of dicts containing all filters. Expects format and keys corresponding to ringtail.Filters().todict()
+            bookmark_names (list): name of bookmark for each filter set
+
+        Raises:
+            OptionError
+            DatabaseQueryError
+
+        Returns:
+            list: of (bookmark name, number of passing ligands, or poses if self.output_all_poses) for each filter set
+        """
+        self._check_db_version_for_filtering()
+        self.query_profile = []
+        if self.mfpt_cluster or self.interaction_cluster:
+            raise OptionError(
+                "Clustering is not available when filtering a batch of filter sets."
+            )
+        filtering_window = self.filter_bookmark or "Results"
+
+        # condition on the filtering window for each filter set
+        conditions = []
+        for all_filters in filter_sets:
+            processed_filters = self._process_filters_for_query(all_filters)
+            if not processed_filters:
+                raise DatabaseQueryError(
+                    "Ringtail query strings are empty, please check filter options."
+                )
+            (
+                num_query,
+                int_query,
+                lig_query,
+                ligand_substruct_queries,
+                join_stmnt,
+            ) = self._prepare_partial_filter_queries(processed_filters)
+            condition = [num_query] if num_query else []
+            if int_query:
+                condition.append(f"R.Pose_ID IN ({int_query})")
+            if lig_query:
+                condition.append(f"R.LigName IN ({lig_query})")
+            if ligand_substruct_queries:
+                condition.append("(" + join_stmnt.join(ligand_substruct_queries) + ")")
+            conditions.append(" AND ".join(condition))
+
+        results = []
+        for start in range(0, len(filter_sets), 62):
+            chunk_conditions = conditions[start : start + 62]
+            mask_expression = " + ".join(
+                f"(CASE WHEN {condition} THEN {1 << k} ELSE 0 END)"
+                for k, condition in enumerate(chunk_conditions)
+            )
+            masks_table = self._new_filtering_table_name("filter_masks")
+            masks_query = f"""SELECT Pose_ID, mask FROM (SELECT R.Pose_ID AS Pose_ID, {mask_expression} AS mask
+                FROM {filtering_window} R) WHERE mask != 0"""
+            self.logger.debug(f"Query for filter set bitsets: {masks_query}")
+            self._load_chemicalite_if_needed(masks_query)
+            try:
+                time0 = time.perf_counter()
+                cur = self.conn.cursor()
+                cur.execute(
+                    f"CREATE TABLE {masks_table} (Pose_ID INTEGER PRIMARY KEY, mask INTEGER)"
+                )
+                cur.execute(f"INSERT INTO {masks_table} (Pose_ID, mask) {masks_query}")
+                self.conn.commit()
+                num_masks = cur.execute(
+                    f"SELECT COUNT(*) FROM {masks_table}"
+                ).fetchone()[0]
+                cur.close()
+            except sqlite3.OperationalError as e:
+                raise DatabaseQueryError(
+                    f"Error ({e}) while filtering a batch of filter sets"
+                ) from e
+            self._record_query_profile(
+                "filter set bitsets",
+                masks_query,
+                time.perf_counter() - time0,
+                num_masks,
+            )
+
+            # number of passing ligands (or poses) of each filter set in one pass over the bitsets
+            if self.output_all_poses:
+                counts = [
+                    f"IFNULL(SUM((M.mask & {1 << k}) != 0), 0)"
+                    for k in range(len(chunk_conditions))
+                ]
+            else:
+                counts = [
+                    f"COUNT(DISTINCT CASE WHEN M.mask & {1 << k} THEN R.LigName END)"
+                    for k in range(len(chunk_conditions))
+                ]
+            num_passing = self._run_query(
+                f"""SELECT {", ".join(counts)} FROM {masks_table} M JOIN {filtering_window} R ON R.Pose_ID = M.Pose_ID"""
+            ).fetchone()
+
+            # create bookmarks as views over the bitsets
+            empty_bookmarks = []
+            for k, (all_filters, bookmark_name) in enumerate(
+                zip(filter_sets[start : start + 62], bookmark_names[start : start + 62])
+            ):
+                number_passing = num_passing[k]
+                if self.top_k:
+                    number_passing = min(number_passing, self.top_k)
+                if number_passing:
+                    self.create_bookmark(
+                        bookmark_name,
+                        self._interaction_mask_view_query(
+                            filtering_window, masks_table, 1 << k
+                        ),
+                        filters=all_filters,
+                    )
+                else:
+                    empty_bookmarks.append(bookmark_name)
+                results.append((bookmark_name, number_passing))
+            # bookmarks of the same name from earlier filtering, dropped once the bitsets are read by the other views
+            for bookmark_name in empty_bookmarks:
+                self.drop_bookmark(bookmark_name)
+            # bitsets are not read by any bookmark if no filter set had passing results
+            self._drop_unused_filtering_tables()
+        self.current_bookmark_name = bookmark_names[-1]
+        return results
+
+    def _new_filtering_table_name(self, suffix: str) -> str:
+        """Name for a new table of bitsets written when filtering. Bookmarks from earlier filtering keep reading
+        their own tables, which are dropped once no view or cached filter reads from them anymore.
+
+        Args:
+            suffix (str): kind of bitsets, "interaction_masks" or "filter_masks"
+
+        Returns:
+            str: <bookmark_name>_<n>_<suffix> for the lowest n not naming an existing table or view
+        """
+        existing_names = {
+            row[0]
+            for row in self.conn.execute("SELECT name FROM sqlite_master").fetchall()
+        }
+        n = 0
+        while f"{self.bookmark_name}_{n}_{suffix}" in existing_names:
+            n += 1
+        return f"{self.bookmark_name}_{n}_{suffix}"
+
+    def _interaction_mask_view_query(
+        self, filtering_window: str, masks_table: str, combination_mask: int
+    ) -> str:
+        """Query selecting the results whose interaction bitset contains all bits of combination_mask,
+        keeping the best scoring pose of each ligand unless self.output_all_poses
+
+        Args:
+            filtering_window (str): table or bookmark that was filtered
+            masks_table (str): table with Pose_ID and bitset of satisfied interaction filters (or passed filter sets)
+            combination_mask (int): bits of interaction filters that must be satisfied
+
+        Returns:
+            str: SQLite query for bookmark
+        """
+        condition = f"(M.mask & {combination_mask}) = {combination_mask}"
+        if self.output_all_poses:
+            passing_poses = f"SELECT M.Pose_ID FROM {masks_table} M WHERE {condition}"
+        else:
+            # bare column of MIN() aggregate is taken from the row holding the minimum
+            passing_poses = f"""SELECT Pose_ID FROM (SELECT R.Pose_ID, MIN(R.docking_score) FROM {filtering_window} R
+                JOIN {masks_table} M ON R.Pose_ID = M.Pose_ID WHERE {condition} GROUP BY R.LigName)"""
+        query = (
+            f"SELECT * FROM {filtering_window} R WHERE R.Pose_ID IN ({passing_poses})"
+        )
+        if self.order_results or self.top_k:
+            query += " ORDER BY " + self._ranking_column()
+        if self.top_k:
+            query += f" LIMIT {int(self.top_k)}"
+        return query
+
+    def check_passing_bookmark_exists(self, bookmark_name: str | None = None):
+        """Checks if bookmark name is in database
+
+        Args:
+            bookmark_name (str, optional): name of bookmark name to check if exist, or else will use storageman bookmark_name attribute
+
+        Returns:
+            bool: indicates if bookmark_name exists in the current database
+        """
+        if bookmark_name is None:
+            bookmark_name = self.bookmark_name
+
+        bookmark_exists = bookmark_name in self.get_all_bookmark_names()
+
+        return bookmark_exists
+
+    def get_plot_data(self, bookmark_name: str = None, only_passing=False):
+        """This function is expected to return an ascii plot
+        representation of the results
+
+        Args:
+            bookmark_name (str): name of bookmark for which to fetch passing data. Will use default bookmark name if None. Returns empty list if bookmark does not exist.
+            only_passing (bool): Only return data for passing ligands. Will return empty list for all data.
+
+        Returns:
+            tuple: cursors as (<all data cursor>, <passing data cursor>)
+        """
+
+        # checks if we have filtered by looking for view name in list of view names
+        if self.check_passing_bookmark_exists(bookmark_name):
+            if only_passing:
+                return [], self._fetch_passing_plot_data(bookmark_name)
+            else:
+                return self._fetch_all_plot_data(), self._fetch_passing_plot_data(
+                    bookmark_name
+                )
+        else:
+            return self._fetch_all_plot_data(), []
+
+    def crossref_filter(
+        self,
+        new_db: str,
+        bookmark1_name: str,
+        bookmark2_name: str,
+        selection_type="-",
+        old_db=None,
+    ) -> tuple:
+        """Selects ligands found or not found in the given bookmark in both current db and new_db. Stores as temp view
+
+        Args:
+            new_db (str): file name for database to attach
+            bookmark1_name (str): string for name of first bookmark/temp table to compare
+            bookmark2_name (str): string for name of second bookmark to compare
+            selection_type (str): "+" or "-" indicating if ligand names should ("+") or should not "-" be in both databases
+            old_db (str, optional): file name for previous database
+
+        Returns:
+            tuple: (name of new bookmark (str), number of ligands passing new bookmark (int))
+        """
+
+        if old_db is not None:
+            self._detach_db(old_db.split(".")[0])  # remove file extension
+
+        new_db_name = new_db.split(".")[0]  # remove file extension
+
+        self._attach_db(new_db, new_db_name)
+
+        if selection_type == "-":
+            select_str = "NOT IN"
+        elif selection_type == "+":
+            select_str = "IN"
+        else:
+            raise StorageError(f"Unrecognized selection type {selection_type}")
+
+        temp_name = "temp_" + str(self.temptable_suffix)
+        self._create_temp_table(temp_name)
+        temp_insert_query = self._generate_selective_insert_query(
+            bookmark1_name, bookmark2_name, select_str, new_db_name, temp_name
+        )
+
+        self._insert_into_temp_table(temp_insert_query)
+
+        num_passing = self._get_number_passing_ligands(temp_name)
+
+        self.temptable_suffix += 1
+
+        return temp_name, num_passing
+
+    def prune(self):
+        """Deletes rows from results, ligands, and interactions in a bookmark
+        if they do not pass filtering criteria
+        """
+        self._delete_from_results()
+        self._delete_from_ligands()
+        self._delete_from_interactions_not_in_view()
+        self._clear_filter_cache()
+        self.rebuild_derived_tables()
+
+    def rebuild_derived_tables(self):
+        """Rebuilds the per-ligand best poses, ligand screening tables and interaction bitmaps
+        from the results, ligands and interactions currently in the database
+        """
+        self._create_ligand_best_table()
+        self._update_ligand_best_table(full_rebuild=True)
+        self._create_ligand_screening_tables()
+        self._update_ligand_screening_tables()
+        self._create_interaction_bitmap_table()
+        self._update_interaction_bitmaps(full_rebuild=True)
+
+    # endregion
+
+    # region common keywords
+    @classmethod
+    def _data_kw_groups(cls, group):
+        """Method containing lists of keywords in specific data groups, used to associate data with database columns
+
+        Args:
+            group (str): group of whose keywords are needed, including
+                stateVar_keys
+                ligand_data_keys
+                interaction_data_kws
+                outfield_options
+
+        Returns:
+            list: of keywords belonging to a specific group
+        """
+        groups = {
+            "stateVar_keys": ["pose_about", "pose_translations", "pose_quarternions"],
+            "ligand_data_keys": [
+                "cluster_rmsds",
+                "ref_rmsds",
+                "scores",
+                "leff",
+                "delta",
+                "intermolecular_energy",
+                "vdw_hb_desolv",
+                "electrostatics",
+                "flex_ligand",
+                "flexLigand_flexReceptor",
+                "internal_energy",
+                "torsional_energy",
+                "unbound_energy",
+            ],
+            "interaction_data_kws": [
+                "type",
+                "chain",
+                "residue",
+                "resid",
+                "recname",
+                "recid",
+            ],
             "outfield_options": [
                 "Ligand_name",
                 "e",
@@ -452,6 +1479,13 @@ class StorageManagerSQLite(StorageManager):
         output_all_poses (bool): whether or not to output all poses of a ligand
         mfpt_cluster (float): distance in ångströms to cluster ligands based on morgan fingerprints
         interaction_cluster (float): distance in ångströms to cluster ligands based on interactions
+        materialize_bookmarks (bool): store the Pose_IDs of new bookmarks in indexed tables instead of re-running the bookmark query on every use
+        profile_queries (bool): Record the SQL, query plan, number of rows and time of each stage of the filtering, and suggest indices for the numerical filters
+        auto_index (bool): Create single-column indices on Results suggested for the numerical filters and result ordering before filtering
+        cache_filters (bool): store the Pose_IDs passing each filter set in the database, and reuse them (and percentile cutoffs) when the same filters, filtering options and results are filtered again, and cache cluster assignments. Default value is False
+        top_k (int): number of best ranked ligands (or poses, with output_all_poses) to keep, ranked by order_results or by docking score
+        cluster_method (str): clustering algorithm, 'butina' (default), 'sphere_exclusion' or 'lsh'
+        lsh_bands (int): number of MinHash bands used by cluster_method 'lsh', more bands give a higher recall at the cost of speed. Default value is 16
         bookmark_name (str): name of current bookmark being written to or read from
         duplicate_handling (str): optional attribute to deal with insertion of ligands already in the database
 
@@ -461,8 +1495,51 @@ class StorageManagerSQLite(StorageManager):
         view_suffix (int): current suffix for views
         temptable_suffix (int): current suffix for temporary tables
         field_to_column_name (dict): Dictionary for converting ringtail options into DB column names
+        _chemicalite_loaded (bool): whether the chemicalite extension has been loaded into the current connection
+        query_profile (list): stages of the last filtering if profile_queries, each a dict with the query, its query plan, number of rows and time
     """
 
+    # Pose_IDs per chunk of the interaction bitmaps, as a power of 2
+    _bitmap_chunk_bits = 16
+    # bits of the pattern fingerprints screening ligand substructure filters
+    _pattern_fp_bits = 2048
+    # length of the Morgan fingerprints (radius 2) stored for similarity searches
+    _morgan_fp_bits = 1024
+    # number of candidate fingerprints from which a similarity search is split over a process pool
+    _similarity_parallel_min_fps = 1000000
+    # number of rows fetched at a time when streaming filtering results
+    _fetch_batch_size = 10000
+    # number of filter sets kept in the filter cache
+    _filter_cache_max_entries = 32
+    # number of Interaction_poses tables kept for bookmarks, further interaction filters are queried from Interactions
+    _interaction_poses_max_tables = 32
+    # number of candidate poses from which ligand_substruct_pos filters are evaluated in a process pool
+    _substruct_pos_parallel_min_poses = 20000
+    # fingerprints per block of the pairwise Tanimoto similarities computed when clustering
+    _cluster_block_size = 512
+    # number of fingerprints from which the neighbors for clustering are computed in a process pool
+    _cluster_parallel_min_fps = 10000
+    # fingerprints per block when computing MinHash signatures for LSH clustering
+    _minhash_block_size = 8192
+    # poses per block of interaction fingerprints compared to the reference of a pose similarity search
+    _pose_similarity_block_size = 65536
+    # tables derived from the results that are rebuilt instead of copied when exporting a bookmark database
+    _export_rebuilt_tables = [
+        "Ligand_best",
+        "Ligand_screening",
+        "Ligand_pattern_fps",
+        "Ligand_morgan_fps",
+        "Interaction_bitmaps",
+        "Filter_cache",
+        "Filter_cache_poses",
+        "Cluster_cache",
+    ]
+    # single-column indices that can serve range filters and ordering on Results
+    _advisable_index_columns = ["docking_score", "leff", "nr_interactions", "num_hb"]
+
+    # matches calls to chemicalite functions, e.g. mol_from_smiles(
+    _chemicalite_function_pattern = re.compile(r"\bmol_\w+\s*\(")
+
     def __init__(
         self,
         db_file: str = None,
@@ -473,6 +1550,13 @@ class StorageManagerSQLite(StorageManager):
         output_all_poses: bool = None,
         mfpt_cluster: float = None,
         interaction_cluster: float = None,
+        materialize_bookmarks: bool = None,
+        profile_queries: bool = None,
+        auto_index: bool = None,
+        cache_filters: bool = None,
+        top_k: int = None,
+        cluster_method: str = None,
+        lsh_bands: int = None,
         bookmark_name: str = None,
         duplicate_handling: str = None,
     ):
@@ -483,6 +1567,13 @@ class StorageManagerSQLite(StorageManager):
         self.output_all_poses = output_all_poses
         self.mfpt_cluster = mfpt_cluster
         self.interaction_cluster = interaction_cluster
+        self.materialize_bookmarks = materialize_bookmarks
+        self.profile_queries = profile_queries
+        self.auto_index = auto_index
+        self.cache_filters = cache_filters
+        self.top_k = top_k
+        self.cluster_method = cluster_method
+        self.lsh_bands = lsh_bands
         self.filter_bookmark = filter_bookmark
         self.bookmark_name = bookmark_name
         self.duplicate_handling = duplicate_handling
@@ -497,12 +1588,15 @@ class StorageManagerSQLite(StorageManager):
         self.view_suffix = None
         self.temptable_suffix = 0
         self.open_cursors = []
+        self._chemicalite_loaded = False
+        self.query_profile = []
 
     # region Methods for inserting into/removing from the database
     def _create_tables(self):
         """
         Creates all tables needed for a Ringtail database of a specific version
         """
+        self._clear_metadata_cache()
         self._create_results_table()
         self._create_ligands_table()
         self._create_receptors_table()
@@ -510,6 +1604,8 @@ class StorageManagerSQLite(StorageManager):
         self._create_interaction_table()
         self._create_bookmark_table()
         self._create_db_properties_table()
+        self._create_ligand_best_table()
+        self._create_interaction_bitmap_table()
 
     @classmethod
     def format_for_storage(cls, ligand_dict: dict) -> tuple:
@@ -650,6 +1746,7 @@ class StorageManagerSQLite(StorageManager):
             smiles = ligand_entry[1]
             ligand_entry.insert(2, smiles)
 
+        self._load_chemicalite()
         try:
             cur = self.conn.cursor()
             cur.executemany(sql_insert, ligand_array)
@@ -1400,140 +2497,678 @@ class StorageManagerSQLite(StorageManager):
         Args:
             interaction_tuple (tuple): (rec_chain, rec_resname, rec_resid, rec_atom, rec_atomid)
 
-        Returns:
-            tuple: if interaction index (int_index,)
+        Returns:
+            tuple: if interaction index (int_index,)
+
+        Raises:
+            DatabaseInsertionError
+        """
+        # to insert interaction if unique
+        sql_insert = """INSERT OR IGNORE INTO Interaction_indices (interaction_id, interaction_type,rec_chain,rec_resname,rec_resid,rec_atom,rec_atomid) 
+                        VALUES (?,?,?,?,?,?,?);"""
+        # to get interaction_id from the given interaction
+        sql_query = f"""SELECT interaction_id FROM Interaction_indices 
+        WHERE interaction_type = ?
+        AND rec_chain = ?
+        AND rec_resname = ?
+        AND rec_resid = ?
+        AND rec_atom = ?
+        AND rec_atomid = ?"""
+
+        try:
+            cur = self.conn.cursor()
+            cur.execute(sql_query, interaction_tuple)
+            self.conn.commit()
+            interaction_index = cur.fetchall()
+            if not interaction_index:
+                # get table length and use that as index
+                interaction_index = (self._get_length_of_table("Interaction_indices"),)
+                # create and insert new interaction id
+                input_tuple = interaction_index + interaction_tuple
+                cur.execute(sql_insert, input_tuple)
+                self.conn.commit()
+            else:
+                interaction_index = interaction_index[0]
+            cur.close()
+            return interaction_index
+        except sqlite3.OperationalError as e:
+            raise DatabaseInsertionError(
+                f"Error inserting unique interaction tuples in index table: {e}"
+            ) from e
+
+    def _delete_interactions(self, Pose_IDs):
+        """Remove rows from interactions table where pose id is represented in Pose_IDs
+
+        Args:
+            Pose_IDs (list(int)): list of pose ids to delete from the table
+
+        Raises:
+            StorageError: Description
+        """
+        pose_id_table = self._create_pose_id_table(
+            Pose_IDs, "deleted_pose_ids", temp=True
+        )
+        sql_delete = f"DELETE FROM Interactions WHERE Pose_ID IN (SELECT Pose_ID FROM {pose_id_table});"
+        try:
+            cur = self.conn.cursor()
+            cur.execute(sql_delete)
+            self.conn.commit()
+            cur.close()
+
+        except sqlite3.OperationalError as e:
+            raise StorageError(
+                "Error while deleting rows in the Interaction table"
+            ) from e
+
+    def _delete_from_interactions_not_in_view(self):
+        """Remove rows from interactions table if they did not pass filtering.
+
+        Raises:
+            StorageError: Description
+        """
+        try:
+            cur = self.conn.cursor()
+            cur.execute(
+                "DELETE FROM Interactions WHERE Pose_ID NOT IN (SELECT Pose_ID FROM {view})".format(
+                    view=self.bookmark_name
+                )
+            )
+            self.conn.commit()
+            cur.close()
+        except sqlite3.OperationalError as e:
+            raise StorageError(
+                f"Error occured while pruning Interactions not in {self.bookmark_name}"
+            ) from e
+
+    def _create_bookmark_table(self):
+        """Create table of bookmark names and their queries. Columns are:
+        Bookmark_name
+        Query
+
+        Raises:
+            DatabaseTableCreationError: Description
+        """
+        sql_str = """CREATE TABLE IF NOT EXISTS Bookmarks (
+        Bookmark_name       VARCHAR[] PRIMARY KEY,
+        Query               VARCHAR[],
+        filters             VARCHAR[])"""
+
+        try:
+            cur = self.conn.cursor()
+            cur.execute(sql_str)
+            cur.close()
+        except sqlite3.OperationalError as e:
+            raise DatabaseTableCreationError(
+                "Error while creating bookmark table. If database already exists, use --overwrite to drop existing tables"
+            ) from e
+
+    def _insert_cluster_data(
+        self, clusters: list, poseid_list: list, cluster_type: str, cluster_cutoff: str
+    ):
+        """Insert cluster data into ligand cluster table
+
+        Args:
+            clusters (list)
+            poseid_list (list)
+            cluster_type (str)
+            cluster_cutoff (str)
+        """
+        cur = self.conn.cursor()
+        cur.execute(
+            "CREATE TABLE IF NOT EXISTS Ligand_clusters (pose_id  INT[] UNIQUE)"
+        )
+        ligand_cluster_columns = self._fetch_ligand_cluster_columns()
+        column_name = (
+            f"{self.bookmark_name}_{cluster_type}_{cluster_cutoff.replace('.', 'p')}"
+        )
+        if column_name not in ligand_cluster_columns:
+            cur.execute(f"ALTER TABLE Ligand_clusters ADD COLUMN {column_name}")
+        cluster_ids = np.empty(len(poseid_list), dtype=np.int64)
+        for ci, cl in enumerate(clusters):
+            cluster_ids[list(cl)] = ci
+        cur.executemany(
+            f"INSERT INTO Ligand_clusters (pose_id, {column_name}) VALUES (?,?) ON CONFLICT (pose_id) DO UPDATE SET {column_name}=excluded.{column_name}",
+            zip(poseid_list, cluster_ids.tolist()),
+        )
+
+        cur.close()
+        self.conn.commit()
+
+    def _create_ligand_best_table(self):
+        """Create table holding the best (lowest docking score) pose of each ligand,
+        indexed on docking score and on the best ligand efficiency of the ligand. Columns are:
+        LigName             VARCHAR NOT NULL PRIMARY KEY,
+        Pose_ID             INTEGER,
+        docking_score       FLOAT(4),
+        leff                FLOAT(4),
+        best_leff           FLOAT(4),
+        num_poses           INT[],
+        max_Pose_ID         INTEGER
+
+        Pose_ID, docking_score and leff are those of the best scoring pose, while best_leff is the lowest
+        ligand efficiency of any pose of the ligand (used for ligand efficiency percentiles).
+        max_Pose_ID is the highest Pose_ID of the ligand when the row was last updated, and is used
+        to find ligands with new results. A table from an earlier layout is dropped and recreated.
+
+        Raises:
+            DatabaseTableCreationError
+        """
+        sql_str = """CREATE TABLE IF NOT EXISTS Ligand_best (
+        LigName             VARCHAR NOT NULL PRIMARY KEY,
+        Pose_ID             INTEGER,
+        docking_score       FLOAT(4),
+        leff                FLOAT(4),
+        best_leff           FLOAT(4),
+        num_poses           INT[],
+        max_Pose_ID         INTEGER)"""
+
+        try:
+            cur = self.conn.cursor()
+            columns = [c[1] for c in cur.execute("PRAGMA table_info(Ligand_best)")]
+            if columns and "best_leff" not in columns:
+                cur.execute("DROP TABLE Ligand_best")
+            cur.execute(sql_str)
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS ak_ligand_best_score ON Ligand_best(docking_score)"
+            )
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS ak_ligand_best_leff ON Ligand_best(best_leff)"
+            )
+            self.conn.commit()
+            cur.close()
+        except sqlite3.OperationalError as e:
+            raise DatabaseTableCreationError(
+                "Error while creating ligand best pose table."
+            ) from e
+
+    def _update_ligand_best_table(self, full_rebuild: bool = False):
+        """Updates the Ligand_best table for all ligands that have results newer than the last update.
+
+        Args:
+            full_rebuild (bool, optional): recompute the table for all ligands, needed if results were deleted or replaced in place
+
+        Raises:
+            DatabaseInsertionError
+        """
+        try:
+            cur = self.conn.cursor()
+            if full_rebuild:
+                cur.execute("DELETE FROM Ligand_best")
+                last_pose_id = 0
+            else:
+                last_pose_id = cur.execute(
+                    "SELECT IFNULL(MAX(max_Pose_ID), 0) FROM Ligand_best"
+                ).fetchone()[0]
+            # bare columns of a MIN() aggregate are taken from the row holding the minimum
+            cur.execute(
+                """INSERT OR REPLACE INTO Ligand_best (LigName, Pose_ID, docking_score, leff, best_leff, num_poses, max_Pose_ID)
+                SELECT R.LigName, R.Pose_ID, MIN(R.docking_score), R.leff, C.best_leff, C.num_poses, C.max_Pose_ID
+                FROM Results R JOIN (
+                    SELECT LigName, MIN(leff) AS best_leff, COUNT(Pose_ID) AS num_poses, MAX(Pose_ID) AS max_Pose_ID FROM Results
+                    WHERE LigName IN (SELECT LigName FROM Results WHERE Pose_ID > ?) GROUP BY LigName
+                ) C ON R.LigName = C.LigName
+                GROUP BY R.LigName""",
+                (last_pose_id,),
+            )
+            self.conn.commit()
+            cur.close()
+            self._metadata_cache["ligand_best"] = True
+            self.logger.debug("Updated best pose per ligand in Ligand_best table.")
+        except sqlite3.OperationalError as e:
+            raise DatabaseInsertionError(
+                "Error while updating best pose per ligand table"
+            ) from e
+
+    def _ligand_best_table_current(self) -> bool:
+        """Checks if the Ligand_best table exists and covers all results in the database. The table is
+        only written when results are written, so read-only operations fall back to querying Results
+        if this is False (e.g., databases written before the table existed).
+
+        Returns:
+            bool: if Ligand_best can be used in place of the best pose of each ligand in Results
+        """
+        if "ligand_best" not in self._metadata_cache:
+            columns = [
+                c[1] for c in self.conn.execute("PRAGMA table_info(Ligand_best)")
+            ]
+            current = "best_leff" in columns and not bool(
+                self.conn.execute(
+                    "SELECT (SELECT IFNULL(MAX(Pose_ID), 0) FROM Results) > (SELECT IFNULL(MAX(max_Pose_ID), 0) FROM Ligand_best)"
+                ).fetchone()[0]
+            )
+            self._metadata_cache["ligand_best"] = current
+        return self._metadata_cache["ligand_best"]
+
+    def _create_ligand_screening_tables(self):
+        """Create tables used to screen ligands before exact substructure matches. Ligand_screening gives each
+        ligand a stable integer id and holds its number of heavy atoms, and the chemicalite rdtree virtual table
+        Ligand_pattern_fps indexes the pattern fingerprint of each ligand by that id. A ligand can only contain
+        a substructure if its pattern fingerprint contains all bits of the pattern fingerprint of the substructure.
+        Ligand_morgan_fps holds the Morgan fingerprint of each ligand for similarity searches, ordered by its
+        number of set bits, which bounds the Tanimoto similarity to a query fingerprint.
+        Columns of Ligand_screening are:
+        id                  INTEGER PRIMARY KEY,
+        LigName             VARCHAR NOT NULL UNIQUE,
+        num_heavy_atoms     INTEGER
+
+        Columns of Ligand_morgan_fps are:
+        num_on_bits         INTEGER,
+        id                  INTEGER,
+        fp                  BLOB,
+        PRIMARY KEY (num_on_bits, id)
+
+        Raises:
+            DatabaseTableCreationError
+        """
+        try:
+            self._load_chemicalite()
+            cur = self.conn.cursor()
+            cur.execute("""CREATE TABLE IF NOT EXISTS Ligand_screening (
+                id                  INTEGER PRIMARY KEY,
+                LigName             VARCHAR NOT NULL UNIQUE,
+                num_heavy_atoms     INTEGER)""")
+            cur.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS Ligand_pattern_fps USING rdtree(id, fp bits({self._pattern_fp_bits}))"
+            )
+            cur.execute("""CREATE TABLE IF NOT EXISTS Ligand_morgan_fps (
+                num_on_bits         INTEGER,
+                id                  INTEGER,
+                fp                  BLOB,
+                PRIMARY KEY (num_on_bits, id)) WITHOUT ROWID""")
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ligand_morgan_fps_id ON Ligand_morgan_fps(id)"
+            )
+            self.conn.commit()
+            cur.close()
+        except (sqlite3.OperationalError, DatabaseConnectionError) as e:
+            raise DatabaseTableCreationError(
+                "Error while creating ligand screening tables."
+            ) from e
+
+    def _update_ligand_screening_tables(self):
+        """Adds ligands new since the last update to the ligand screening tables, and removes ligands no longer in the database
 
         Raises:
             DatabaseInsertionError
         """
-        # to insert interaction if unique
-        sql_insert = """INSERT OR IGNORE INTO Interaction_indices (interaction_id, interaction_type,rec_chain,rec_resname,rec_resid,rec_atom,rec_atomid) 
-                        VALUES (?,?,?,?,?,?,?);"""
-        # to get interaction_id from the given interaction
-        sql_query = f"""SELECT interaction_id FROM Interaction_indices 
-        WHERE interaction_type = ?
-        AND rec_chain = ?
-        AND rec_resname = ?
-        AND rec_resid = ?
-        AND rec_atom = ?
-        AND rec_atomid = ?"""
-
         try:
             cur = self.conn.cursor()
-            cur.execute(sql_query, interaction_tuple)
+            cur.execute(
+                "DELETE FROM Ligand_pattern_fps WHERE id IN (SELECT id FROM Ligand_screening WHERE LigName NOT IN (SELECT LigName FROM Ligands))"
+            )
+            cur.execute(
+                "DELETE FROM Ligand_morgan_fps WHERE id IN (SELECT id FROM Ligand_screening WHERE LigName NOT IN (SELECT LigName FROM Ligands))"
+            )
+            cur.execute(
+                "DELETE FROM Ligand_screening WHERE LigName NOT IN (SELECT LigName FROM Ligands)"
+            )
+            last_id = cur.execute(
+                "SELECT IFNULL(MAX(id), 0) FROM Ligand_screening"
+            ).fetchone()[0]
+            cur.execute(
+                """INSERT INTO Ligand_screening (LigName, num_heavy_atoms)
+                SELECT LigName, mol_num_hvyatms(ligand_rdmol) FROM Ligands WHERE LigName NOT IN (SELECT LigName FROM Ligand_screening)"""
+            )
+            cur.execute(
+                f"""INSERT INTO Ligand_pattern_fps (id, fp)
+                SELECT S.id, mol_pattern_bfp(L.ligand_rdmol, {self._pattern_fp_bits}) FROM Ligand_screening S JOIN Ligands L ON L.LigName = S.LigName
+                WHERE S.id > ? AND L.ligand_rdmol IS NOT NULL""",
+                (last_id,),
+            )
+            # Morgan fingerprints are added from the last fingerprinted ligand, to fill in tables from before they existed
+            cur.execute(
+                f"""INSERT INTO Ligand_morgan_fps (num_on_bits, id, fp)
+                SELECT bfp_weight(fp), id, fp FROM (
+                    SELECT S.id AS id, mol_morgan_bfp(L.ligand_rdmol, 2, {self._morgan_fp_bits}) AS fp
+                    FROM Ligand_screening S JOIN Ligands L ON L.LigName = S.LigName
+                    WHERE S.id > (SELECT IFNULL(MAX(id), 0) FROM Ligand_morgan_fps) AND L.ligand_rdmol IS NOT NULL)"""
+            )
             self.conn.commit()
-            interaction_index = cur.fetchall()
-            if not interaction_index:
-                # get table length and use that as index
-                interaction_index = (self._get_length_of_table("Interaction_indices"),)
-                # create and insert new interaction id
-                input_tuple = interaction_index + interaction_tuple
-                cur.execute(sql_insert, input_tuple)
-                self.conn.commit()
-            else:
-                interaction_index = interaction_index[0]
             cur.close()
-            return interaction_index
+            self._metadata_cache["ligand_screening"] = True
+            self.logger.debug("Updated ligand screening tables.")
         except sqlite3.OperationalError as e:
             raise DatabaseInsertionError(
-                f"Error inserting unique interaction tuples in index table: {e}"
+                "Error while updating ligand screening tables"
             ) from e
 
-    def _delete_interactions(self, Pose_IDs):
-        """Remove rows from interactions table where pose id is represented in Pose_IDs
+    def _ligand_screening_current(self) -> bool:
+        """Checks if the ligand screening tables exist and hold all ligands in the database. Like Ligand_best,
+        the tables are only written when results are written, and ligand filters are evaluated on all ligands
+        if this is False (e.g., databases written before the tables existed).
 
-        Args:
-            Pose_IDs (list(int)): list of pose ids to delete from the table
+        Returns:
+            bool: if ligand filters can be screened with the ligand screening tables
+        """
+        if "ligand_screening" not in self._metadata_cache:
+            current = "Ligand_screening" in [
+                table[0] for table in self._fetch_existing_table_names()
+            ] and bool(
+                self.conn.execute(
+                    "SELECT (SELECT COUNT(*) FROM Ligand_screening) = (SELECT COUNT(*) FROM Ligands)"
+                ).fetchone()[0]
+            )
+            self._metadata_cache["ligand_screening"] = current
+        return self._metadata_cache["ligand_screening"]
+
+    def _create_interaction_bitmap_table(self):
+        """Create table holding an inverted index from interactions to the poses having them. Pose_IDs
+        are split in chunks of 2^16 (as in roaring bitmaps), and each interaction has one bitmap per chunk
+        it occurs in. Columns are:
+        interaction_id      INTEGER,
+        chunk               INTEGER,
+        num_poses           INTEGER,
+        bitmap              BLOB,
+        max_Pose_ID         INTEGER
+
+        Bit n of the bitmap of a chunk is set if the pose with Pose_ID chunk * 2^16 + n has the interaction,
+        and bitmaps are stored as zlib compressed little-endian bytes. Rows with interaction_id -1 hold the
+        bitmaps of all poses in Results. max_Pose_ID is the highest Pose_ID in Results when the row was written.
 
         Raises:
-            StorageError: Description
+            DatabaseTableCreationError
         """
-        Pose_IDs_string = ",".join(map(str, Pose_IDs))
-        sql_delete = f"DELETE FROM Interactions WHERE Pose_ID IN ({Pose_IDs_string});"
+        sql_str = """CREATE TABLE IF NOT EXISTS Interaction_bitmaps (
+        interaction_id      INTEGER,
+        chunk               INTEGER,
+        num_poses           INTEGER,
+        bitmap              BLOB,
+        max_Pose_ID         INTEGER,
+        PRIMARY KEY (interaction_id, chunk)) WITHOUT ROWID"""
+
         try:
             cur = self.conn.cursor()
-            cur.execute(sql_delete)
+            cur.execute(sql_str)
             self.conn.commit()
             cur.close()
-
         except sqlite3.OperationalError as e:
-            raise StorageError(
-                "Error while deleting rows in the Interaction table"
+            raise DatabaseTableCreationError(
+                "Error while creating interaction bitmap table."
             ) from e
 
-    def _delete_from_interactions_not_in_view(self):
-        """Remove rows from interactions table if they did not pass filtering.
+    def _update_interaction_bitmaps(self, full_rebuild: bool = False):
+        """Adds the poses with Pose_IDs higher than the last update to the Interaction_bitmaps table, one chunk at a time.
+
+        Args:
+            full_rebuild (bool, optional): recompute all bitmaps, needed if results were deleted or replaced in place
 
         Raises:
-            StorageError: Description
+            DatabaseInsertionError
         """
+        import zlib
+
         try:
             cur = self.conn.cursor()
-            cur.execute(
-                "DELETE FROM Interactions WHERE Pose_ID NOT IN (SELECT Pose_ID FROM {view})".format(
-                    view=self.bookmark_name
+            if full_rebuild:
+                cur.execute("DELETE FROM Interaction_bitmaps")
+                last_pose_id = 0
+            else:
+                last_pose_id = cur.execute(
+                    "SELECT IFNULL(MAX(max_Pose_ID), 0) FROM Interaction_bitmaps"
+                ).fetchone()[0]
+            max_pose_id = cur.execute(
+                "SELECT IFNULL(MAX(Pose_ID), 0) FROM Results"
+            ).fetchone()[0]
+            for chunk in range(
+                (last_pose_id + 1) >> self._bitmap_chunk_bits,
+                (max_pose_id >> self._bitmap_chunk_bits) + 1,
+            ):
+                first_pose_id = max(last_pose_id + 1, chunk << self._bitmap_chunk_bits)
+                end_pose_id = (chunk + 1) << self._bitmap_chunk_bits
+                rows = np.array(
+                    cur.execute(
+                        """SELECT -1, Pose_ID FROM Results WHERE Pose_ID >= ?1 AND Pose_ID < ?2
+                        UNION ALL SELECT interaction_id, Pose_ID FROM Interactions WHERE Pose_ID >= ?1 AND Pose_ID < ?2""",
+                        (first_pose_id, end_pose_id),
+                    ).fetchall(),
+                    dtype=np.int64,
+                ).reshape(-1, 2)
+                if not len(rows):
+                    continue
+                # group poses by interaction
+                rows = rows[np.argsort(rows[:, 0], kind="stable")]
+                interaction_ids, starts = np.unique(rows[:, 0], return_index=True)
+                existing_bitmaps = {}
+                if first_pose_id > chunk << self._bitmap_chunk_bits:
+                    # chunk was partially written by the last update
+                    existing_bitmaps = {
+                        row[0]: row[1]
+                        for row in cur.execute(
+                            "SELECT interaction_id, bitmap FROM Interaction_bitmaps WHERE chunk = ?",
+                            (chunk,),
+                        )
+                    }
+                bitmap_rows = []
+                for interaction_id, pose_ids in zip(
+                    interaction_ids.tolist(), np.split(rows[:, 1], starts[1:])
+                ):
+                    bits = np.zeros(1 << self._bitmap_chunk_bits, dtype=bool)
+                    bits[pose_ids - (chunk << self._bitmap_chunk_bits)] = True
+                    if interaction_id in existing_bitmaps:
+                        bits |= np.unpackbits(
+                            np.frombuffer(
+                                zlib.decompress(existing_bitmaps[interaction_id]),
+                                dtype=np.uint8,
+                            ),
+                            bitorder="little",
+                        ).astype(bool)
+                    bitmap_rows.append(
+                        (
+                            interaction_id,
+                            chunk,
+                            int(bits.sum()),
+                            zlib.compress(
+                                np.packbits(bits, bitorder="little").tobytes()
+                            ),
+                            max_pose_id,
+                        )
+                    )
+                cur.executemany(
+                    "INSERT OR REPLACE INTO Interaction_bitmaps (interaction_id, chunk, num_poses, bitmap, max_Pose_ID) VALUES (?,?,?,?,?)",
+                    bitmap_rows,
                 )
+            # record how far the bitmaps reach even if the newest results have no interactions
+            cur.execute(
+                "UPDATE Interaction_bitmaps SET max_Pose_ID = ? WHERE interaction_id = -1 AND chunk = (SELECT MAX(chunk) FROM Interaction_bitmaps WHERE interaction_id = -1)",
+                (max_pose_id,),
             )
             self.conn.commit()
             cur.close()
+            self._clear_metadata_cache("interaction_bitmaps")
+            self._clear_metadata_cache("interaction_bitmap_data")
+            self.logger.debug("Updated interaction bitmaps.")
         except sqlite3.OperationalError as e:
-            raise StorageError(
-                f"Error occured while pruning Interactions not in {self.bookmark_name}"
+            raise DatabaseInsertionError(
+                "Error while updating interaction bitmaps"
             ) from e
 
-    def _create_bookmark_table(self):
-        """Create table of bookmark names and their queries. Columns are:
-        Bookmark_name
-        Query
+    def _interaction_bitmaps_current(self) -> bool:
+        """Checks if the Interaction_bitmaps table exists and covers all results in the database. Like Ligand_best,
+        the bitmaps are only written when results are written, and interaction filters are queried from the
+        Interactions table if this is False.
 
-        Raises:
-            DatabaseTableCreationError: Description
+        Returns:
+            bool: if interaction filters can be evaluated from the interaction bitmaps
         """
-        sql_str = """CREATE TABLE IF NOT EXISTS Bookmarks (
-        Bookmark_name       VARCHAR[] PRIMARY KEY,
-        Query               VARCHAR[],
-        filters             VARCHAR[])"""
+        if "interaction_bitmaps" not in self._metadata_cache:
+            current = "Interaction_bitmaps" in [
+                table[0] for table in self._fetch_existing_table_names()
+            ] and bool(
+                self.conn.execute(
+                    "SELECT (SELECT IFNULL(MAX(Pose_ID), 0) FROM Results) <= (SELECT IFNULL(MAX(max_Pose_ID), 0) FROM Interaction_bitmaps)"
+                ).fetchone()[0]
+            )
+            self._metadata_cache["interaction_bitmaps"] = current
+        return self._metadata_cache["interaction_bitmaps"]
+
+    def _fetch_interaction_bitmaps(self, interaction_ids: list) -> dict:
+        """Loads the bitmaps of the given interactions, keeping them cached for later filters
+
+        Args:
+            interaction_ids (list): interaction indices, -1 for all poses
+
+        Returns:
+            dict: interaction index: dict of chunk: bitmap as int
+        """
+        import zlib
+
+        cached_bitmaps = self._metadata_cache.setdefault("interaction_bitmap_data", {})
+        missing_ids = [i for i in set(interaction_ids) if i not in cached_bitmaps]
+        if missing_ids:
+            for interaction_id in missing_ids:
+                cached_bitmaps[interaction_id] = {}
+            for interaction_id, chunk, bitmap in self.conn.execute(
+                f"SELECT interaction_id, chunk, bitmap FROM Interaction_bitmaps WHERE interaction_id IN ({numlist2str(missing_ids, ',')})"
+            ):
+                cached_bitmaps[interaction_id][chunk] = int.from_bytes(
+                    zlib.decompress(bitmap), "little"
+                )
+        return {i: cached_bitmaps[i] for i in interaction_ids}
 
+    def _create_pose_id_table(
+        self, pose_ids, table_name: str = None, temp: bool = False
+    ) -> str:
+        """Bulk-inserts a set of Pose_IDs into an indexed table, for queries to join against instead of listing the
+        Pose_IDs in the query. Tables in the main database can be read by bookmark views, and are named
+        Pose_ID_set_<digest of Pose_IDs> unless a name is given. They are dropped when no view or cached filter reads
+        from them anymore. TEMP tables are replaced when a table of the same name is created again.
+
+        Args:
+            pose_ids (iterable): Pose_IDs to store
+            table_name (str, optional): name of the table
+            temp (bool, optional): create TEMP table, only for queries that are run right away
+
+        Raises:
+            DatabaseInsertionError
+
+        Returns:
+            str: name of table with the Pose_IDs in column Pose_ID
+        """
+        pose_ids = np.unique(np.fromiter(pose_ids, dtype=np.int64))
+        if table_name is None:
+            table_name = (
+                "Pose_ID_set_" + hashlib.sha1(pose_ids.tobytes()).hexdigest()[:16]
+            )
         try:
             cur = self.conn.cursor()
-            cur.execute(sql_str)
+            if temp:
+                cur.execute(f"DROP TABLE IF EXISTS temp.{table_name}")
+            elif table_name in [
+                table[0] for table in self._fetch_existing_table_names()
+            ]:
+                cur.close()
+                return table_name
+            cur.execute(
+                f"CREATE {'TEMP ' if temp else ''}TABLE {table_name} (Pose_ID INTEGER PRIMARY KEY)"
+            )
+            cur.executemany(
+                f"INSERT INTO {table_name} (Pose_ID) VALUES (?)",
+                ((pose_id,) for pose_id in pose_ids.tolist()),
+            )
+            self.conn.commit()
             cur.close()
         except sqlite3.OperationalError as e:
-            raise DatabaseTableCreationError(
-                "Error while creating bookmark table. If database already exists, use --overwrite to drop existing tables"
+            raise DatabaseInsertionError(
+                f"Error ({e}) while storing Pose_IDs in table {table_name}"
             ) from e
+        return table_name
 
-    def _insert_cluster_data(
-        self, clusters: list, poseid_list: list, cluster_type: str, cluster_cutoff: str
-    ):
-        """Insert cluster data into ligand cluster table
+    def _prepare_interaction_bitmap_query(
+        self, include_interactions: list, exclude_interactions: list, max_miss: int
+    ) -> str:
+        """Evaluates interaction filters on the interaction bitmaps. Each filter is the union (OR) of the bitmaps of its
+        interaction indices, complemented within all poses (ANDNOT) for excluded interactions, and a pose passes if it
+        is in at least (number of filters - max_miss) of them. The passing Pose_IDs are stored in the table
+        Interaction_poses_<digest of filters and bitmaps>, which is reused by later filters with the same interactions
+        and dropped once no bookmark reads from it. Once _interaction_poses_max_tables of these tables are kept, or if
+        the table cannot be written, the filters are queried from the Interactions table instead.
 
         Args:
-            clusters (list)
-            poseid_list (list)
-            cluster_type (str)
-            cluster_cutoff (str)
+            include_interactions (list): lists of interaction indices a pose should have (one of)
+            exclude_interactions (list): lists of interaction indices a pose should not have (any of)
+            max_miss (int): max number of the interaction filters a pose is allowed to miss
+
+        Raises:
+            DatabaseQueryError
+
+        Returns:
+            str: partial query selecting the Pose_IDs passing the interaction filters
         """
-        cur = self.conn.cursor()
-        cur.execute(
-            "CREATE TABLE IF NOT EXISTS Ligand_clusters (pose_id  INT[] UNIQUE)"
-        )
-        ligand_cluster_columns = self._fetch_ligand_cluster_columns()
-        column_name = (
-            f"{self.bookmark_name}_{cluster_type}_{cluster_cutoff.replace('.', 'p')}"
+        interaction_filters = [(sorted(i), True) for i in include_interactions] + [
+            (sorted(i), False) for i in exclude_interactions
+        ]
+        max_pose_id = self.conn.execute(
+            "SELECT IFNULL(MAX(max_Pose_ID), 0) FROM Interaction_bitmaps"
+        ).fetchone()[0]
+        digest = hashlib.sha1(
+            repr((interaction_filters, max_miss, max_pose_id)).encode()
+        ).hexdigest()[:16]
+        poses_table = f"Interaction_poses_{digest}"
+        poses_tables = [
+            table[0]
+            for table in self._fetch_existing_table_names()
+            if table[0].startswith("Interaction_poses_")
+        ]
+        if poses_table in poses_tables:
+            return f"SELECT Pose_ID FROM {poses_table}"
+        if len(poses_tables) >= self._interaction_poses_max_tables:
+            self.logger.info(
+                f"{len(poses_tables)} tables of poses passing interaction filters are kept for bookmarks, filtering interactions from the Interactions table."
+            )
+            return self._prepare_interaction_filtering_query(
+                include_interactions, exclude_interactions, max_miss
+            )
+
+        bitmaps = self._fetch_interaction_bitmaps(
+            [-1] + [i for indices, _ in interaction_filters for i in indices]
         )
-        if column_name not in ligand_cluster_columns:
-            cur.execute(f"ALTER TABLE Ligand_clusters ADD COLUMN {column_name}")
-        for ci, cl in enumerate(clusters):
-            for i in cl:
-                poseid = poseid_list[i]
-                cur.execute(
-                    f"INSERT INTO Ligand_clusters (pose_id, {column_name}) VALUES (?,?) ON CONFLICT (pose_id) DO UPDATE SET {column_name}=excluded.{column_name}",
-                    (poseid, ci),
+        min_passing = len(interaction_filters) - max_miss
+        passing_pose_ids = []
+        for chunk, all_poses in bitmaps[-1].items():
+            # at_least[n]: poses passing at least n of the filters so far
+            at_least = [all_poses] + [0] * max(min_passing, 0)
+            for indices, include in interaction_filters:
+                filter_poses = 0
+                for i in indices:
+                    filter_poses |= bitmaps[i].get(chunk, 0)
+                if not include:
+                    filter_poses = all_poses & ~filter_poses
+                for n in range(len(at_least) - 1, 0, -1):
+                    at_least[n] |= at_least[n - 1] & filter_poses
+            passing = at_least[-1]
+            if passing:
+                passing_pose_ids.append(
+                    np.flatnonzero(
+                        np.unpackbits(
+                            np.frombuffer(
+                                passing.to_bytes(
+                                    1 << (self._bitmap_chunk_bits - 3), "little"
+                                ),
+                                dtype=np.uint8,
+                            ),
+                            bitorder="little",
+                        )
+                    )
+                    + (chunk << self._bitmap_chunk_bits)
                 )
-
-        cur.close()
-        self.conn.commit()
+        try:
+            self._create_pose_id_table(
+                (
+                    pose_id
+                    for pose_ids in passing_pose_ids
+                    for pose_id in pose_ids.tolist()
+                ),
+                poses_table,
+            )
+        except DatabaseInsertionError as e:
+            self.conn.rollback()
+            self.logger.warning(
+                f"Could not store poses passing interaction filters ({e.__cause__}), filtering interactions from the Interactions table."
+            )
+            return self._prepare_interaction_filtering_query(
+                include_interactions, exclude_interactions, max_miss
+            )
+        return f"SELECT Pose_ID FROM {poses_table}"
 
     def _create_indices(self):
         """Create index for specified tables and columns. 'ak' stands for 'alternate key' and is prepended to index name to avoid naming conflicts
@@ -1585,6 +3220,8 @@ class StorageManagerSQLite(StorageManager):
         Returns:
             list: of bookmark names
         """
+        if "bookmark_names" in self._metadata_cache:
+            return list(self._metadata_cache["bookmark_names"])
         try:
             cur = self.conn.cursor()
             cur.execute("SELECT Bookmark_name FROM Bookmarks;")
@@ -1596,7 +3233,8 @@ class StorageManagerSQLite(StorageManager):
                 "Error occured while fetching existing bookmark names"
             ) from e
 
-        return bookmark_names
+        self._metadata_cache["bookmark_names"] = bookmark_names
+        return list(bookmark_names)
 
     def set_bookmark_suffix(self, suffix):
         """Sets internal bookmark_suffix variable
@@ -1665,6 +3303,8 @@ class StorageManagerSQLite(StorageManager):
     def create_bookmark(self, name, query, temp=False, add_poseID=False, filters={}):
         """Takes name and selection query and creates a bookmark of name.
         Bookmarks are Ringtail specific views that whose information is stored in the 'Bookmark' table.
+        If self.materialize_bookmarks, the Pose_IDs selected by the query are stored in an indexed table
+        that the view reads from instead, unless the query cannot be refreshed for new results.
         #FIXME bug where ligand filter only results are not added as bookmarks
 
         Args:
@@ -1685,7 +3325,19 @@ class StorageManagerSQLite(StorageManager):
             temp_flag = ""
 
         bookmark_query = f"CREATE {temp_flag}VIEW {name} AS {query}"
-        self._create_view(name, bookmark_query)
+        view_query = bookmark_query
+        if not temp:
+            if self.materialize_bookmarks and self._bookmark_refreshable(
+                filters, query
+            ):
+                view_query = self._materialize_bookmark(name, query)
+            else:
+                # bookmark of same name may have been materialized before
+                self._drop_materialized_bookmark(name)
+        self._create_view(name, view_query)
+        # a replaced view may have been the last to read from a filtering table
+        self._drop_unused_filtering_tables()
+        # original query is kept in bookmark info, also for materialized bookmarks
         self._insert_bookmark_info(name, bookmark_query, filters)
         self.logger.debug(
             f"Created bookmark from the following query: {bookmark_query}"
@@ -1707,6 +3359,8 @@ class StorageManagerSQLite(StorageManager):
             raise DatabaseViewCreationError(
                 f"The given view name {name} starts with a number, view names may not start with digit."
             )
+        # views using MOL functions need chemicalite whenever they are read
+        self._load_chemicalite_if_needed(query)
         cur = self.conn.cursor()
         # drop old view if there is one
         try:
@@ -1721,53 +3375,253 @@ class StorageManagerSQLite(StorageManager):
     def _insert_bookmark_info(self, name: str, sqlite_query: str, filters={}):
         """Insert bookmark info into bookmark table (bookmarks are a Ringtail specific type of views)
 
-        Args:
-            name (str): name for bookmark
-            sqlite_query (str): sqlite query used to generate bookmark
-            filters (dict): filters used to generate bookmark
+        Args:
+            name (str): name for bookmark
+            sqlite_query (str): sqlite query used to generate bookmark
+            filters (dict): filters used to generate bookmark
+
+        Raises:
+            DatabaseInsertionError
+        """
+        sql_insert = """INSERT OR REPLACE INTO Bookmarks (
+        Bookmark_name,
+        Query,
+        filters
+        ) VALUES (?,?,?)"""
+
+        try:
+            cur = self.conn.cursor()
+            cur.execute(sql_insert, [name, sqlite_query, json.dumps(filters)])
+            self.conn.commit()
+            cur.close()
+            self._clear_metadata_cache("bookmark_names")
+
+        except sqlite3.OperationalError as e:
+            raise DatabaseInsertionError(
+                "Error while inserting Bookmark info into Bookmark table"
+            ) from e
+
+    def drop_bookmark(self, bookmark_name: str):
+        """Drops specified bookmark from database
+
+        Args:
+            bookmark_name (str): bookmark to be dropped
+
+        Raises:
+            DatabaseInsertionError
+        """
+
+        query_drop = f"DROP VIEW IF EXISTS {bookmark_name}"
+        query_delete = f"DELETE FROM Bookmarks WHERE Bookmark_name = '{bookmark_name}'"
+
+        try:
+            cur = self.conn.execute(query_drop)
+            cur.execute(query_delete)
+            self._drop_materialized_bookmark(bookmark_name)
+            self._drop_unused_filtering_tables()
+            self.conn.commit()
+            cur.close()
+            self._clear_metadata_cache("bookmark_names")
+            self.logger.info(f"Dropped bookmark {bookmark_name}.")
+        except sqlite3.OperationalError as e:
+            raise DatabaseInsertionError(
+                f"Error while attempting to drop bookmark {bookmark_name}"
+            ) from e
+
+    def _materialize_bookmark(self, name: str, query: str) -> str:
+        """Stores the Pose_IDs selected by the bookmark query in an indexed table, and records
+        the query, time and last Pose_ID included in the Materialized_bookmarks table so the
+        bookmark can be refreshed when new results are added.
+
+        Args:
+            name (str): name of bookmark
+            query (str): SQLite-formated query selecting the bookmark rows, must select Pose_ID
+
+        Raises:
+            DatabaseViewCreationError
+
+        Returns:
+            str: query to create the bookmark view over the materialized table
+        """
+        table_name = f"{name}_materialized"
+        provenance_table = """CREATE TABLE IF NOT EXISTS Materialized_bookmarks (
+        Bookmark_name       VARCHAR[] PRIMARY KEY,
+        table_name          VARCHAR[],
+        source_query        VARCHAR[],
+        max_Pose_ID         INTEGER,
+        last_refreshed      VARCHAR[])"""
+        self._load_chemicalite_if_needed(query)
+        try:
+            cur = self.conn.cursor()
+            cur.execute(provenance_table)
+            cur.execute(f"DROP TABLE IF EXISTS {table_name}")
+            cur.execute(f"CREATE TABLE {table_name} (Pose_ID INTEGER NOT NULL UNIQUE)")
+            cur.execute(
+                f"INSERT OR IGNORE INTO {table_name} (Pose_ID) SELECT Pose_ID FROM ({query})"
+            )
+            cur.execute(
+                """INSERT OR REPLACE INTO Materialized_bookmarks VALUES
+                (?,?,?,(SELECT IFNULL(MAX(Pose_ID), 0) FROM Results),datetime('now'))""",
+                (name, table_name, query),
+            )
+            self.conn.commit()
+            cur.close()
+        except sqlite3.OperationalError as e:
+            raise DatabaseViewCreationError(
+                f"Error ({e}) materializing bookmark {name} from query \n{query}"
+            ) from e
+        self.logger.debug(f"Materialized bookmark {name} in table {table_name}.")
+        # keep the order rows had in the original query
+        return f"CREATE VIEW {name} AS SELECT R.* FROM {table_name} M JOIN Results R ON R.Pose_ID = M.Pose_ID ORDER BY M.rowid"
+
+    def _bookmark_refreshable(self, filters: dict, query: str = "") -> bool:
+        """Checks if a bookmark query can be re-evaluated for new results. Percentile cutoffs, and
+        Pose_IDs from substructure position filtering and clustering, are computed when filtering
+        and written into the query or stored in Pose_ID set tables, which would be stale for new results. The same holds
+        for the interaction bitsets of interaction combinations and the Pose_IDs passing interaction
+        filters evaluated from the interaction bitmaps.
+
+        Args:
+            filters (dict): filters used to construct the bookmark query
+            query (str, optional): the bookmark query
+
+        Returns:
+            bool: if bookmark query can be refreshed
+        """
+        baked_filters = [
+            key
+            for key in ["score_percentile", "le_percentile", "ligand_substruct_pos"]
+            if filters.get(key)
+        ]
+        if self.mfpt_cluster or self.interaction_cluster:
+            baked_filters.append("clustering")
+        if self.top_k:
+            baked_filters.append("top_k")
+        if "_interaction_masks" in query:
+            baked_filters.append("interaction combinations")
+        if "_filter_masks" in query:
+            baked_filters.append("batch of filter sets")
+        if "Interaction_poses_" in query:
+            baked_filters.append("interaction filters from interaction bitmaps")
+        if baked_filters:
+            self.logger.warning(
+                f"Bookmark will not be materialized, its query contains values computed from the current results ({', '.join(baked_filters)})."
+            )
+        return not baked_filters
+
+    def _drop_materialized_bookmark(self, name: str):
+        """Drops the materialized table and provenance of bookmark, if it was materialized
 
-        Raises:
-            DatabaseInsertionError
+        Args:
+            name (str): name of bookmark
         """
-        sql_insert = """INSERT OR REPLACE INTO Bookmarks (
-        Bookmark_name,
-        Query,
-        filters
-        ) VALUES (?,?,?)"""
-
-        try:
+        materialized_tables = {
+            bookmark[0]: bookmark[1]
+            for bookmark in self._fetch_materialized_bookmarks()
+        }
+        if name in materialized_tables:
             cur = self.conn.cursor()
-            cur.execute(sql_insert, [name, sqlite_query, json.dumps(filters)])
+            cur.execute(f"DROP VIEW IF EXISTS {name}")
+            cur.execute(f"DROP TABLE IF EXISTS {materialized_tables[name]}")
+            cur.execute(
+                "DELETE FROM Materialized_bookmarks WHERE Bookmark_name = ?", (name,)
+            )
             self.conn.commit()
             cur.close()
 
-        except sqlite3.OperationalError as e:
-            raise DatabaseInsertionError(
-                "Error while inserting Bookmark info into Bookmark table"
-            ) from e
+    def _drop_unused_filtering_tables(self):
+        """Drops tables written when filtering (interaction bitsets of interaction combinations, bitsets of filter
+        set batches, Pose_IDs passing interaction filters, and Pose_ID sets from substructure position filtering and clustering)
+        no view or cached filter reads from anymore"""
+        cur = self.conn.cursor()
+        filtering_tables = [
+            table[0]
+            for table in cur.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND (name LIKE '%\\_interaction\\_masks' ESCAPE '\\' OR name LIKE 'Interaction\\_poses\\_%' ESCAPE '\\' OR name LIKE 'Pose\\_ID\\_set\\_%' ESCAPE '\\' OR name LIKE '%\\_filter\\_masks' ESCAPE '\\')"
+            ).fetchall()
+        ]
+        view_queries = [
+            view[0]
+            for view in cur.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'view'"
+            ).fetchall()
+        ]
+        # cached filters recreate their views from the stored query
+        if "Filter_cache" in [table[0] for table in self._fetch_existing_table_names()]:
+            view_queries += [
+                row[0]
+                for row in cur.execute(
+                    "SELECT view_query FROM Filter_cache WHERE view_query IS NOT NULL"
+                ).fetchall()
+            ]
+        for table in filtering_tables:
+            if not any(table in view_query for view_query in view_queries):
+                cur.execute(f"DROP TABLE IF EXISTS {table}")
+        cur.close()
 
-    def drop_bookmark(self, bookmark_name: str):
-        """Drops specified bookmark from database
+    def _fetch_materialized_bookmarks(self) -> list:
+        """Fetches provenance of all materialized bookmarks in order of creation
+
+        Returns:
+            list: of tuples (Bookmark_name, table_name, source_query, max_Pose_ID, last_refreshed)
+        """
+        if "Materialized_bookmarks" not in [
+            table[0] for table in self._fetch_existing_table_names()
+        ]:
+            return []
+        return self.conn.execute(
+            "SELECT * FROM Materialized_bookmarks ORDER BY rowid"
+        ).fetchall()
+
+    def _refresh_materialized_bookmarks(self, full_refresh: bool = False):
+        """Brings materialized bookmarks up to date with results added since they were last refreshed.
+        Only ligands with new results are re-evaluated with the original bookmark query. Bookmark
+        queries may read from Ligand_best, which must be updated before this is called.
 
         Args:
-            bookmark_name (str): bookmark to be dropped
+            full_refresh (bool, optional): re-run the bookmark queries for all ligands, needed if results were replaced in place
 
         Raises:
             DatabaseInsertionError
         """
-
-        query_drop = f"DROP VIEW IF EXISTS {bookmark_name}"
-        query_delete = f"DELETE FROM Bookmarks WHERE Bookmark_name = '{bookmark_name}'"
-
+        materialized_bookmarks = self._fetch_materialized_bookmarks()
+        if not materialized_bookmarks:
+            return
         try:
-            cur = self.conn.execute(query_drop)
-            cur.execute(query_delete)
+            cur = self.conn.cursor()
+            last_pose_id = cur.execute(
+                "SELECT IFNULL(MAX(Pose_ID), 0) FROM Results"
+            ).fetchone()[0]
+            for bookmark in materialized_bookmarks:
+                name, table_name, source_query, max_pose_id, _ = bookmark
+                self._load_chemicalite_if_needed(source_query)
+                if full_refresh:
+                    cur.execute(f"DELETE FROM {table_name}")
+                    cur.execute(
+                        f"INSERT OR IGNORE INTO {table_name} (Pose_ID) SELECT Pose_ID FROM ({source_query})"
+                    )
+                elif last_pose_id > max_pose_id:
+                    new_ligands = (
+                        f"SELECT LigName FROM Results WHERE Pose_ID > {max_pose_id}"
+                    )
+                    cur.execute(
+                        f"DELETE FROM {table_name} WHERE Pose_ID IN (SELECT Pose_ID FROM Results WHERE LigName IN ({new_ligands}))"
+                    )
+                    cur.execute(
+                        f"INSERT OR IGNORE INTO {table_name} (Pose_ID) SELECT Pose_ID FROM ({source_query}) WHERE LigName IN ({new_ligands})"
+                    )
+                else:
+                    continue
+                cur.execute(
+                    "UPDATE Materialized_bookmarks SET max_Pose_ID = ?, last_refreshed = datetime('now') WHERE Bookmark_name = ?",
+                    (last_pose_id, name),
+                )
+                self.logger.info(f"Refreshed materialized bookmark {name}.")
             self.conn.commit()
             cur.close()
-            self.logger.info(f"Dropped bookmark {bookmark_name}.")
         except sqlite3.OperationalError as e:
             raise DatabaseInsertionError(
-                f"Error while attempting to drop bookmark {bookmark_name}"
+                "Error while refreshing materialized bookmarks"
             ) from e
 
     def create_temp_table_from_bookmark(self):
@@ -1845,6 +3699,7 @@ class StorageManagerSQLite(StorageManager):
         Raises:
             DatabaseInsertionError
         """
+        self._load_chemicalite_if_needed(query)
         try:
             cur = self.conn.cursor()
             cur.execute(query)
@@ -1943,6 +3798,55 @@ class StorageManagerSQLite(StorageManager):
         query = "SELECT LigName, ligand_smile, atom_index_map, hydrogen_parents FROM Ligands WHERE LigName IN (SELECT DISTINCT LigName FROM passing_temp)"
         return self._run_query(query)
 
+    def count_passing_ligands(self) -> int:
+        """count the distinct ligands in passing_temp
+
+        Raises:
+            DatabaseQueryError
+
+        Returns:
+            int: number of passing ligands
+        """
+        try:
+            cur = self.conn.cursor()
+            cur.execute("SELECT COUNT(DISTINCT LigName) FROM passing_temp")
+            count = cur.fetchone()[0]
+            cur.close()
+            return count
+        except sqlite3.OperationalError as e:
+            raise DatabaseQueryError("Error counting passing ligands") from e
+
+    def iter_passing_ligand_output_info(self, chunk_size: int) -> iter:
+        """fetch the same information as fetch_passing_ligand_output_info, in chunks of at most chunk_size
+        ligands ordered by LigName. Each chunk is read in full and continues after the last ligand name of
+        the previous one, so no cursor is left open between chunks while the caller uses the database.
+
+        Args:
+            chunk_size (int): maximum number of ligands per chunk
+
+        Raises:
+            DatabaseQueryError
+
+        Yields:
+            list: of tuples (LigName, ligand_smile, atom_index_map, hydrogen_parents)
+        """
+        query = "SELECT LigName, ligand_smile, atom_index_map, hydrogen_parents FROM Ligands WHERE LigName IN (SELECT LigName FROM passing_temp WHERE LigName > ?) ORDER BY LigName LIMIT ?"
+        last_ligname = ""
+        while True:
+            try:
+                cur = self.conn.cursor()
+                cur.execute(query, (last_ligname, chunk_size))
+                chunk = cur.fetchall()
+                cur.close()
+            except sqlite3.OperationalError as e:
+                raise DatabaseQueryError(
+                    "Error retrieving output information of passing ligands"
+                ) from e
+            if not chunk:
+                return
+            yield chunk
+            last_ligname = chunk[-1][0]
+
     def fetch_single_ligand_output_info(self, ligname) -> str:
         """get output information for given ligand
 
@@ -2005,11 +3909,7 @@ class StorageManagerSQLite(StorageManager):
         Returns:
             iter: of interaction information for given Pose_ID
         """
-        # check if table exist
-        cur = self._run_query(
-            """SELECT name FROM sqlite_master WHERE type='table' AND name='Interactions';"""
-        )
-        if len(cur.fetchall()) == 0:
+        if not self._interactions_table_exists():
             return None
 
         query = f"""SELECT ii.interaction_type, ii.rec_chain, ii.rec_resname, ii.rec_resid, ii.rec_atom, ii.rec_atomid 
@@ -2019,6 +3919,46 @@ class StorageManagerSQLite(StorageManager):
 
         return self._run_query(query).fetchall()
 
+    def fetch_interactions_of_poses(self, pose_ids) -> dict | None:
+        """
+        Fetch the interaction parameters of a set of poses in one query
+
+        Args:
+            pose_ids (iterable): Pose_IDs
+
+        Raises:
+            DatabaseQueryError
+
+        Returns:
+            dict | None: Pose_ID: list of interaction information as from fetch_pose_interactions, None if the database has no Interactions table
+        """
+        if not self._interactions_table_exists():
+            return None
+        pose_id_table = self._create_pose_id_table(
+            pose_ids, "output_pose_ids", temp=True
+        )
+        query = f"""SELECT i.Pose_ID, ii.interaction_type, ii.rec_chain, ii.rec_resname, ii.rec_resid, ii.rec_atom, ii.rec_atomid
+        FROM {pose_id_table} P
+        JOIN Interactions i ON i.Pose_ID = P.Pose_ID
+        JOIN Interaction_indices ii ON ii.interaction_id = i.interaction_id
+        ORDER BY i.Pose_ID, i.interaction_pose_ID"""
+        interactions = {}
+        for row in self._run_query(query):
+            interactions.setdefault(row[0], []).append(row[1:])
+        return interactions
+
+    def _interactions_table_exists(self) -> bool:
+        """Checks once per session if the database has an Interactions table
+
+        Returns:
+            bool: if the Interactions table exists
+        """
+        if "interactions_table" not in self._metadata_cache:
+            self._metadata_cache["interactions_table"] = "Interactions" in [
+                table[0] for table in self._fetch_existing_table_names()
+            ]
+        return self._metadata_cache["interactions_table"]
+
     def count_receptors_in_db(self):
         """returns number of rows in Receptors table where receptor_object already has blob
 
@@ -2046,10 +3986,12 @@ class StorageManagerSQLite(StorageManager):
 
         Returns:
              iter: SQLite Cursor containing docking_score,
-                leff for the first pose for each ligand
+                leff for the best pose for each ligand
         """
+        if self._ligand_best_table_current():
+            return self._run_query("SELECT docking_score, leff FROM Ligand_best")
         return self._run_query(
-            "SELECT docking_score, leff FROM Results GROUP BY LigName"
+            "SELECT MIN(docking_score), leff FROM Results GROUP BY LigName"
         )
 
     def _fetch_passing_plot_data(self, bookmark_name: str | None = None):
@@ -2061,13 +4003,17 @@ class StorageManagerSQLite(StorageManager):
 
         Returns:
             iter: SQL Cursor containing docking_score,
-                leff for the first pose for passing ligands
+                leff for the best pose for passing ligands
         """
         if bookmark_name is None:
             bookmark_name = self.bookmark_name
 
+        if self._ligand_best_table_current():
+            return self._run_query(
+                f"SELECT docking_score, leff, Pose_ID, LigName FROM Ligand_best WHERE LigName IN (SELECT DISTINCT LigName FROM {bookmark_name})"
+            )
         return self._run_query(
-            f"SELECT docking_score, leff, Pose_ID, LigName FROM Results WHERE LigName IN (SELECT DISTINCT LigName FROM {bookmark_name}) GROUP BY LigName"
+            f"SELECT MIN(docking_score), leff, Pose_ID, LigName FROM Results WHERE LigName IN (SELECT DISTINCT LigName FROM {bookmark_name}) GROUP BY LigName"
         )
 
     def _fetch_ligand_cluster_columns(self):
@@ -2100,17 +4046,21 @@ class StorageManagerSQLite(StorageManager):
         Raises:
             StorageError
         """
-        try:
-            return [
-                column_tuple[1]
-                for column_tuple in self.conn.execute("PRAGMA table_info(Results)")
-            ]
-        except sqlite3.OperationalError as e:
-            raise StorageError(
-                "Error while fetching column names from Results table"
-            ) from e
+        # the Results table is only created, dropped or altered by _create_tables,
+        # _drop_existing_tables and the database update methods, which clear this cache
+        if "results_columns" not in self._metadata_cache:
+            try:
+                self._metadata_cache["results_columns"] = [
+                    column_tuple[1]
+                    for column_tuple in self.conn.execute("PRAGMA table_info(Results)")
+                ]
+            except sqlite3.OperationalError as e:
+                raise StorageError(
+                    "Error while fetching column names from Results table"
+                ) from e
+        return list(self._metadata_cache["results_columns"])
 
-    def to_dataframe(self, requested_data: str, table=True) -> pd.DataFrame:
+    def to_dataframe(self, requested_data: str, table=True) -> "pd.DataFrame":
         """Returns a panda dataframe of table or query given as requested_data
 
         Args:
@@ -2120,6 +4070,10 @@ class StorageManagerSQLite(StorageManager):
         Returns:
             pd.DataFrame: dataframe of requested data
         """
+        import pandas as pd
+
+        if not table:
+            self._load_chemicalite_if_needed(requested_data)
         if table:
             return pd.read_sql_query(
                 "SELECT * FROM {0}".format(requested_data), self.conn
@@ -2127,6 +4081,97 @@ class StorageManagerSQLite(StorageManager):
         else:
             return pd.read_sql_query(requested_data, self.conn)
 
+    def _export_query(self, requested_data: str, table=True, columns=None) -> str:
+        """Returns the query selecting the given columns of the table or query in requested_data
+
+        Args:
+            requested_data (str): String containing SQL-formatted query or table name
+            table (bool): Flag indicating if requested_data is table name or not
+            columns (list, optional): names of the columns to select, all columns if None
+
+        Returns:
+            str: query
+        """
+        column_str = "*"
+        if columns:
+            column_str = ", ".join(f'"{column}"' for column in columns)
+        if table:
+            return f"SELECT {column_str} FROM {requested_data}"
+        if columns:
+            return f"SELECT {column_str} FROM ({requested_data.strip().rstrip(';')})"
+        return requested_data
+
+    def fetch_data_chunks(
+        self, requested_data: str, table=True, columns=None, chunk_size: int = None
+    ) -> tuple:
+        """Runs the query for a table or query given as requested_data, to read its rows in chunks
+        instead of loading all of them at once as to_dataframe does
+
+        Args:
+            requested_data (str): String containing SQL-formatted query or table name
+            table (bool): Flag indicating if requested_data is table name or not
+            columns (list, optional): names of the columns to select, all columns if None
+            chunk_size (int, optional): number of rows per chunk, self._fetch_batch_size if None
+
+        Raises:
+            DatabaseQueryError
+
+        Returns:
+            tuple: (list of column names, iterator of lists of at most chunk_size rows)
+        """
+        if chunk_size is None:
+            chunk_size = self._fetch_batch_size
+        query = self._export_query(requested_data, table, columns)
+        if not table:
+            self._load_chemicalite_if_needed(requested_data)
+        try:
+            cur = self.conn.cursor()
+            cur.execute(query)
+        except sqlite3.OperationalError as e:
+            raise DatabaseQueryError(
+                "Unable to execute query {0}: {1}".format(query, e)
+            ) from e
+
+        def row_chunks():
+            try:
+                while rows := cur.fetchmany(chunk_size):
+                    yield rows
+            finally:
+                cur.close()
+
+        return [description[0] for description in cur.description], row_chunks()
+
+    def fetch_column_type(self, requested_data: str, column: str, table=True) -> str:
+        """Returns the SQLite storage class of the first non-NULL value in a column of the table or query given
+        as requested_data
+
+        Args:
+            requested_data (str): String containing SQL-formatted query or table name
+            column (str): name of the column
+            table (bool): Flag indicating if requested_data is table name or not
+
+        Raises:
+            DatabaseQueryError
+
+        Returns:
+            str: "integer", "real", "text" or "blob", or None if the column has only NULL values
+        """
+        if table:
+            source = requested_data
+        else:
+            source = f"({requested_data.strip().rstrip(';')})"
+        query = f'SELECT typeof("{column}") FROM {source} WHERE "{column}" IS NOT NULL LIMIT 1'
+        try:
+            cur = self.conn.cursor()
+            cur.execute(query)
+            row = cur.fetchone()
+            cur.close()
+        except sqlite3.OperationalError as e:
+            raise DatabaseQueryError(
+                "Unable to execute query {0}: {1}".format(query, e)
+            ) from e
+        return row[0] if row is not None else None
+
     def _get_length_of_table(self, table_name: str):
         """
         Finds the rowcount/length of a table based on the rowid
@@ -2310,14 +4355,446 @@ class StorageManagerSQLite(StorageManager):
             raise DatabaseQueryError(
                 f"Requested ligand name {ligname} not found in cluster {cluster_col_choice}!"
             )
-        query_ligand_cluster = query_ligand_cluster[0]  # extract from tuple
-        sql_query = f"SELECT LigName FROM Results WHERE Pose_ID IN (SELECT pose_id FROM Ligand_clusters WHERE {cluster_col_choice}={query_ligand_cluster}) GROUP BY LigName"
-        view_query = f"SELECT * FROM Results WHERE Pose_ID IN (SELECT pose_id FROM Ligand_clusters WHERE {cluster_col_choice}={query_ligand_cluster}) GROUP BY LigName"
+        query_ligand_cluster = query_ligand_cluster[0]  # extract from tuple
+        sql_query = f"SELECT LigName FROM Results WHERE Pose_ID IN (SELECT pose_id FROM Ligand_clusters WHERE {cluster_col_choice}={query_ligand_cluster}) GROUP BY LigName"
+        view_query = f"SELECT * FROM Results WHERE Pose_ID IN (SELECT pose_id FROM Ligand_clusters WHERE {cluster_col_choice}={query_ligand_cluster}) GROUP BY LigName"
+
+        self.bookmark_name = f"similar_{ligname}_{cluster_col_choice}"
+        self.create_bookmark(self.bookmark_name, view_query)
+
+        return self._run_query(sql_query), self.bookmark_name, cluster_col_choice
+
+    def search_similar_ligands(
+        self, query: str, num_neighbors: int = 10, similarity_cutoff: float = 0.5
+    ) -> tuple:
+        """Finds the ligands whose Morgan fingerprints (radius 2) are most similar by Tanimoto similarity to the query
+        ligand, and creates a bookmark with the best pose of each of them. Fingerprints are read from Ligand_morgan_fps
+        in order of how close their number of set bits is to that of the query, as |a & b| / |a | b| <= min(|a|, |b|) / max(|a|, |b|),
+        and reading stops when no fingerprint left can be more similar than the num_neighbors most similar found.
+
+        Args:
+            query (str): name of a ligand in the database, or SMILES of the query ligand
+            num_neighbors (int, optional): largest number of similar ligands to return
+            similarity_cutoff (float, optional): smallest Tanimoto similarity of the returned ligands
+
+        Raises:
+            OptionError: if the query is neither a ligand name nor a valid SMILES, or the search options are not valid
+
+        Returns:
+            tuple: list of (LigName, similarity) in order of decreasing similarity, and the name of the bookmark
+        """
+        if num_neighbors < 1 or not 0 < similarity_cutoff <= 1:
+            raise OptionError(
+                f"Similarity search needs a positive number of neighbors and a similarity cutoff above 0 and at most 1, not {num_neighbors} and {similarity_cutoff}."
+            )
+        if not self._ligand_morgan_fps_current():
+            self._create_ligand_screening_tables()
+            self._update_ligand_screening_tables()
+        query_fp = self._query_morgan_fingerprint(query)
+        query_num_bits = int(self._popcount(query_fp).sum())
+
+        similar_ligands = []
+        if query_num_bits:
+            # numbers of set bits that can reach the cutoff, by decreasing upper bound of the similarity
+            candidate_counts = self.conn.execute(
+                "SELECT num_on_bits, COUNT(*) FROM Ligand_morgan_fps WHERE num_on_bits BETWEEN ? AND ? GROUP BY num_on_bits",
+                (
+                    int(np.ceil(similarity_cutoff * query_num_bits - 1e-9)),
+                    int(np.floor(query_num_bits / similarity_cutoff + 1e-9)),
+                ),
+            ).fetchall()
+            candidate_counts.sort(
+                key=lambda count: -min(count[0], query_num_bits)
+                / max(count[0], query_num_bits)
+            )
+            num_candidates = sum(count[1] for count in candidate_counts)
+            if num_candidates >= self._similarity_parallel_min_fps:
+                import multiprocess
+
+                # each process reads every n-th number of set bits, so all read from the most similar down
+                num_procs = multiprocess.cpu_count()
+                with multiprocess.Pool(num_procs) as p:
+                    proc_hits = p.starmap(
+                        self._screen_morgan_fps,
+                        [
+                            (
+                                self.db_file,
+                                query_fp,
+                                [count[0] for count in candidate_counts[i::num_procs]],
+                                similarity_cutoff,
+                                num_neighbors,
+                            )
+                            for i in range(num_procs)
+                        ],
+                    )
+                ids = np.concatenate([hits[0] for hits in proc_hits])
+                similarities = np.concatenate([hits[1] for hits in proc_hits])
+            else:
+                ids, similarities = self._screen_morgan_fps(
+                    self.conn,
+                    query_fp,
+                    [count[0] for count in candidate_counts],
+                    similarity_cutoff,
+                    num_neighbors,
+                )
+            lignames = dict(
+                self.conn.execute(
+                    f"SELECT id, LigName FROM Ligand_screening WHERE id IN ({numlist2str(ids.tolist(), ',')})"
+                ).fetchall()
+            )
+            similar_ligands = sorted(
+                (
+                    (lignames[ligand_id], float(similarity))
+                    for ligand_id, similarity in zip(ids.tolist(), similarities)
+                ),
+                key=lambda hit: (-hit[1], hit[0]),
+            )[:num_neighbors]
+
+        # bookmark with the best pose of each similar ligand
+        pose_ids = [
+            row[0]
+            for row in self.conn.execute(
+                f"SELECT Pose_ID, MIN(docking_score) FROM Results WHERE LigName IN ({','.join('?' * len(similar_ligands))}) GROUP BY LigName",
+                [hit[0] for hit in similar_ligands],
+            )
+        ]
+        bookmark_name = f"similar_{query}"
+        if not Filters.valid_bookmark_name(bookmark_name):
+            bookmark_name = f"similar_{hashlib.sha1(query.encode()).hexdigest()[:16]}"
+        self.create_bookmark(
+            bookmark_name,
+            f"SELECT * FROM Results R WHERE R.Pose_ID IN (SELECT Pose_ID FROM {self._create_pose_id_table(pose_ids)})",
+        )
+        self.bookmark_name = bookmark_name
+        return similar_ligands, bookmark_name
+
+    def _ligand_morgan_fps_current(self) -> bool:
+        """Checks if Ligand_morgan_fps holds the Morgan fingerprints of all ligands in the ligand screening tables
+
+        Returns:
+            bool: if similarity searches can read the fingerprints from Ligand_morgan_fps
+        """
+        if not self._ligand_screening_current() or "Ligand_morgan_fps" not in [
+            table[0] for table in self._fetch_existing_table_names()
+        ]:
+            return False
+        return not self.conn.execute(
+            """SELECT EXISTS (SELECT 1 FROM Ligand_screening S JOIN Ligands L ON L.LigName = S.LigName
+            WHERE S.id > (SELECT IFNULL(MAX(id), 0) FROM Ligand_morgan_fps) AND L.ligand_rdmol IS NOT NULL)"""
+        ).fetchone()[0]
+
+    def _query_morgan_fingerprint(self, query: str) -> np.ndarray:
+        """Morgan fingerprint of a ligand in the database, or of a SMILES
+
+        Args:
+            query (str): ligand name or SMILES
+
+        Raises:
+            OptionError
+
+        Returns:
+            np.ndarray: packed fingerprint, a row of 64-bit words as from _pack_fingerprints
+        """
+        self._load_chemicalite()
+        fp = self.conn.execute(
+            f"SELECT mol_morgan_bfp(ligand_rdmol, 2, {self._morgan_fp_bits}) FROM Ligands WHERE LigName = ?",
+            (query,),
+        ).fetchone()
+        if fp is None or fp[0] is None:
+            fp = self.conn.execute(
+                f"SELECT mol_morgan_bfp(mol_from_smiles(?), 2, {self._morgan_fp_bits})",
+                (query,),
+            ).fetchone()
+        if fp is None or fp[0] is None:
+            raise OptionError(
+                f"Similarity search query {query} is neither the name of a ligand in the database nor a valid SMILES."
+            )
+        return np.frombuffer(fp[0], dtype="<u8").astype(np.uint64)
+
+    @classmethod
+    def _screen_morgan_fps(
+        cls,
+        db,
+        query_fp: np.ndarray,
+        num_on_bits: list,
+        similarity_cutoff: float,
+        num_neighbors: int,
+    ) -> tuple:
+        """Computes the Tanimoto similarity of the query fingerprint to the fingerprints in Ligand_morgan_fps with the
+        given numbers of set bits, read in the given order, and keeps the num_neighbors most similar above the cutoff.
+        Stops reading when the next number of set bits cannot give a higher similarity than the least similar kept.
+
+        Args:
+            db (str | sqlite3.Connection): database file (opened read-only when run in a process pool) or connection
+            query_fp (np.ndarray): packed query fingerprint
+            num_on_bits (list): numbers of set bits of the fingerprints to read, by decreasing upper bound of the similarity
+            similarity_cutoff (float): smallest Tanimoto similarity to keep
+            num_neighbors (int): number of most similar fingerprints to keep
+
+        Returns:
+            tuple: arrays of the ids in Ligand_screening and the similarities of the kept fingerprints
+        """
+        conn = (
+            sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+            if isinstance(db, str)
+            else db
+        )
+        query_num_bits = int(cls._popcount(query_fp).sum())
+        ids = np.zeros(0, dtype=np.int64)
+        similarities = np.zeros(0, dtype=np.float64)
+        cur = conn.cursor()
+        for count in num_on_bits:
+            bound = min(count, query_num_bits) / max(count, query_num_bits)
+            if len(ids) == num_neighbors and bound <= similarities.min():
+                break
+            cur.execute(
+                "SELECT id, fp FROM Ligand_morgan_fps WHERE num_on_bits = ?", (count,)
+            )
+            while rows := cur.fetchmany(cls._fetch_batch_size):
+                fps = np.frombuffer(b"".join(row[1] for row in rows), dtype="<u8")
+                common = cls._popcount(fps.reshape(len(rows), -1) & query_fp).sum(
+                    axis=1
+                )
+                block_similarities = common / (count + query_num_bits - common)
+                kept = block_similarities >= similarity_cutoff
+                ids = np.concatenate(
+                    [
+                        ids,
+                        np.fromiter(
+                            (row[0] for row in rows), dtype=np.int64, count=len(rows)
+                        )[kept],
+                    ]
+                )
+                similarities = np.concatenate([similarities, block_similarities[kept]])
+                if len(ids) > num_neighbors:
+                    most_similar = np.argpartition(-similarities, num_neighbors - 1)[
+                        :num_neighbors
+                    ]
+                    ids = ids[most_similar]
+                    similarities = similarities[most_similar]
+        cur.close()
+        if isinstance(db, str):
+            conn.close()
+        return ids, similarities
+
+    def search_similar_poses(
+        self,
+        reference,
+        num_poses: int = 10,
+        metric: str = "tanimoto",
+        tversky_alpha: float = 1.0,
+        tversky_beta: float = 0.0,
+        within_bookmark: str = None,
+    ) -> tuple:
+        """Finds the poses with the interaction fingerprints most similar to those of a reference pose or a list of
+        interactions, and creates a bookmark with them. Only poses sharing an interaction with the reference can be
+        similar, so candidates are read from the interaction bitmaps (or the Interactions table if the bitmaps are not
+        current), and their packed fingerprints are compared to the reference a block at a time. With A the reference
+        interactions and B those of a pose, the Tanimoto similarity is |A & B| / |A | B|, and the Tversky similarity
+        is |A & B| / (|A & B| + alpha * |A - B| + beta * |B - A|).
+
+        Args:
+            reference (int | list): Pose_ID of the reference pose, or list of interactions as
+                "<type>:<chain>:<resname>:<resid>:<atom>", with type H, V or R and empty fields matching any value
+            num_poses (int, optional): largest number of similar poses to return
+            metric (str, optional): "tanimoto" or "tversky"
+            tversky_alpha (float, optional): weight of the reference interactions missing from a pose
+            tversky_beta (float, optional): weight of the interactions of a pose missing from the reference
+            within_bookmark (str, optional): only search the poses in this bookmark
+
+        Raises:
+            OptionError: if the reference or search options are not valid
+
+        Returns:
+            tuple: list of (Pose_ID, LigName, similarity) in order of decreasing similarity, and the name of the bookmark
+        """
+        if num_poses < 1:
+            raise OptionError(
+                f"Pose similarity search needs a positive number of poses, not {num_poses}."
+            )
+        if metric == "tanimoto":
+            tversky_alpha = tversky_beta = 1.0
+        elif metric != "tversky":
+            raise OptionError(
+                f"Given similarity metric {metric} is not valid, choose 'tanimoto' or 'tversky'."
+            )
+        if tversky_alpha < 0 or tversky_beta < 0 or tversky_alpha + tversky_beta == 0:
+            raise OptionError(
+                f"Tversky weights must not be negative or both 0, not {tversky_alpha} and {tversky_beta}."
+            )
+
+        reference_ids = self._fetch_reference_interaction_ids(reference)
+        similar_poses = []
+        if len(reference_ids):
+            candidate_pose_ids = self._fetch_poses_with_interactions(reference_ids)
+            if isinstance(reference, int):
+                candidate_pose_ids = candidate_pose_ids[candidate_pose_ids != reference]
+            if within_bookmark is not None:
+                candidate_pose_ids = np.intersect1d(
+                    candidate_pose_ids,
+                    np.fromiter(
+                        (
+                            row[0]
+                            for row in self._run_query(
+                                f"SELECT Pose_ID FROM {within_bookmark}"
+                            )
+                        ),
+                        dtype=np.int64,
+                    ),
+                )
+            num_interactions = self._get_length_of_table("Interaction_indices")
+            reference_fp = self._set_fingerprint_bits(
+                1,
+                num_interactions,
+                np.zeros(len(reference_ids), dtype=np.int64),
+                reference_ids - 1,
+            )[0]
+            num_reference_bits = len(reference_ids)
+            pose_ids = np.zeros(0, dtype=np.int64)
+            similarities = np.zeros(0, dtype=np.float64)
+            for start in range(
+                0, len(candidate_pose_ids), self._pose_similarity_block_size
+            ):
+                block_pose_ids = candidate_pose_ids[
+                    start : start + self._pose_similarity_block_size
+                ]
+                fps = self._generate_interaction_bitvectors(block_pose_ids)
+                common = self._popcount(fps & reference_fp).sum(axis=1)
+                num_bits = self._popcount(fps).sum(axis=1)
+                pose_ids = np.concatenate([pose_ids, block_pose_ids])
+                similarities = np.concatenate(
+                    [
+                        similarities,
+                        common
+                        / (
+                            common
+                            + tversky_alpha * (num_reference_bits - common)
+                            + tversky_beta * (num_bits - common)
+                        ),
+                    ]
+                )
+                if len(pose_ids) > num_poses:
+                    # ties are kept for the lowest Pose_IDs, so results do not depend on the block size
+                    most_similar = np.lexsort((pose_ids, -similarities))[:num_poses]
+                    pose_ids = pose_ids[most_similar]
+                    similarities = similarities[most_similar]
+            lignames = dict(
+                self.conn.execute(
+                    f"SELECT Pose_ID, LigName FROM Results WHERE Pose_ID IN ({numlist2str(pose_ids.tolist(), ',')})"
+                ).fetchall()
+            )
+            similar_poses = sorted(
+                (
+                    (pose_id, lignames[pose_id], float(similarity))
+                    for pose_id, similarity in zip(pose_ids.tolist(), similarities)
+                ),
+                key=lambda hit: (-hit[2], hit[0]),
+            )
+        else:
+            self.logger.warning(
+                f"Reference {reference} of pose similarity search has no interactions, no poses are similar."
+            )
 
-        self.bookmark_name = f"similar_{ligname}_{cluster_col_choice}"
-        self.create_bookmark(self.bookmark_name, view_query)
+        bookmark_name = (
+            f"similar_poses_{reference}"
+            if isinstance(reference, int)
+            else f"similar_poses_{hashlib.sha1(repr(sorted(reference)).encode()).hexdigest()[:16]}"
+        )
+        self.create_bookmark(
+            bookmark_name,
+            f"SELECT * FROM Results R WHERE R.Pose_ID IN (SELECT Pose_ID FROM {self._create_pose_id_table(hit[0] for hit in similar_poses)})",
+        )
+        self.bookmark_name = bookmark_name
+        return similar_poses, bookmark_name
 
-        return self._run_query(sql_query), self.bookmark_name, cluster_col_choice
+    def _fetch_reference_interaction_ids(self, reference) -> np.ndarray:
+        """Interaction indices of the reference of a pose similarity search
+
+        Args:
+            reference (int | list): Pose_ID, or list of interactions as "<type>:<chain>:<resname>:<resid>:<atom>"
+
+        Raises:
+            OptionError
+
+        Returns:
+            np.ndarray: sorted unique interaction indices
+        """
+        if isinstance(reference, int):
+            if not self.conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM Results WHERE Pose_ID = ?)", (reference,)
+            ).fetchone()[0]:
+                raise OptionError(
+                    f"Reference pose {reference} of pose similarity search is not in the database."
+                )
+            interaction_ids = [
+                row[0]
+                for row in self.conn.execute(
+                    "SELECT interaction_id FROM Interactions WHERE Pose_ID = ?",
+                    (reference,),
+                )
+            ]
+        else:
+            interaction_ids = []
+            interaction_not_found = []
+            for interaction in reference:
+                interaction_info = interaction.split(":")
+                if len(interaction_info) != 5:
+                    raise OptionError(
+                        f"Reference interaction {interaction} of pose similarity search is not formatted as <type>:<chain>:<resname>:<resid>:<atom>."
+                    )
+                interaction_indices = [
+                    i[0] for i in self._get_interaction_indices(interaction_info)
+                ]
+                if not interaction_indices:
+                    interaction_not_found.append(interaction)
+                interaction_ids += interaction_indices
+            if interaction_not_found:
+                raise OptionError(
+                    f"Reference interactions {interaction_not_found} of pose similarity search are not in the database."
+                )
+        return np.unique(np.asarray(interaction_ids, dtype=np.int64))
+
+    def _fetch_poses_with_interactions(self, interaction_ids) -> np.ndarray:
+        """Pose_IDs of the poses with any of the given interactions, from the interaction bitmaps if they are current
+
+        Args:
+            interaction_ids (iterable): interaction indices
+
+        Returns:
+            np.ndarray: sorted Pose_IDs
+        """
+        interaction_ids = [int(i) for i in interaction_ids]
+        if not self._interaction_bitmaps_current():
+            return np.fromiter(
+                (
+                    row[0]
+                    for row in self.conn.execute(
+                        f"SELECT DISTINCT Pose_ID FROM Interactions WHERE interaction_id IN ({numlist2str(interaction_ids, ',')}) ORDER BY Pose_ID"
+                    )
+                ),
+                dtype=np.int64,
+            )
+        bitmaps = self._fetch_interaction_bitmaps(interaction_ids)
+        pose_ids = []
+        for chunk in sorted({chunk for i in interaction_ids for chunk in bitmaps[i]}):
+            chunk_poses = 0
+            for i in interaction_ids:
+                chunk_poses |= bitmaps[i].get(chunk, 0)
+            pose_ids.append(
+                np.flatnonzero(
+                    np.unpackbits(
+                        np.frombuffer(
+                            chunk_poses.to_bytes(
+                                1 << (self._bitmap_chunk_bits - 3), "little"
+                            ),
+                            dtype=np.uint8,
+                        ),
+                        bitorder="little",
+                    )
+                )
+                + (chunk << self._bitmap_chunk_bits)
+            )
+        return np.concatenate([np.zeros(0, dtype=np.int64)] + pose_ids)
 
     def fetch_passing_pose_properties(self, ligname):
         """fetch coordinates for poses passing filter for given ligand
@@ -2332,6 +4809,45 @@ class StorageManagerSQLite(StorageManager):
         query = f"SELECT Pose_ID, docking_score, leff, ligand_coordinates, flexible_res_coordinates FROM Results WHERE Pose_ID IN (SELECT Pose_ID FROM passing_temp WHERE LigName LIKE '{ligname}')"
         return self._run_query(query)
 
+    def fetch_ligand_poses_for_output(
+        self, lignames: list, write_nonpassing: bool = False
+    ) -> iter:
+        """fetch coordinates of the poses passing the filter (and the non-passing poses, if requested) of a chunk of ligands
+        in one query, for writing out molecules. The ligand names are joined against the index of Results on LigName.
+
+        Args:
+            lignames (list): names of ligands to fetch coordinates for
+            write_nonpassing (bool, optional): also fetch the poses of the ligands that did not pass the filter
+
+        Raises:
+            DatabaseQueryError
+
+        Returns:
+            iter: SQLite cursor that contains LigName, Pose_ID, docking_score, leff, ligand_coordinates,
+                flexible_res_coordinates, ordered by ligand name with the passing poses of each ligand first
+        """
+        try:
+            cur = self.conn.cursor()
+            cur.execute("DROP TABLE IF EXISTS temp.output_lignames")
+            cur.execute(
+                "CREATE TEMP TABLE output_lignames (LigName VARCHAR PRIMARY KEY) WITHOUT ROWID"
+            )
+            cur.executemany(
+                "INSERT OR IGNORE INTO output_lignames (LigName) VALUES (?)",
+                ((ligname,) for ligname in lignames),
+            )
+            cur.close()
+        except sqlite3.OperationalError as e:
+            raise DatabaseQueryError(
+                "Error while storing ligand names for output"
+            ) from e
+        passing = "R.Pose_ID IN (SELECT Pose_ID FROM passing_temp)"
+        query = f"""SELECT R.LigName, R.Pose_ID, R.docking_score, R.leff, R.ligand_coordinates, R.flexible_res_coordinates
+        FROM temp.output_lignames L JOIN Results R ON R.LigName = L.LigName
+        {"" if write_nonpassing else "WHERE " + passing}
+        ORDER BY R.LigName, {passing} DESC, R.Pose_ID"""
+        return self._run_query(query)
+
     def fetch_nonpassing_pose_properties(self, ligname):
         """fetch coordinates for poses of ligname which did not pass the filter
 
@@ -2346,7 +4862,10 @@ class StorageManagerSQLite(StorageManager):
         return self._run_query(query)
 
     def _calc_percentile_cutoff(self, percentile: float, column="docking_score"):
-        """Make query for percentile by calculating energy or leff cutoff
+        """Make query for percentile by calculating energy or leff cutoff. The cutoff is the
+        per-ligand best (minimum) value of the column at position k = percentile * number of ligands,
+        fetched with LIMIT 1 OFFSET k. Note that OFFSET still steps over k rows: with an index on the
+        per-ligand values this avoids sorting, but the lookup is O(k), not O(1).
 
         Args:
             percentile (float): cutoff percentile
@@ -2362,16 +4881,45 @@ class StorageManagerSQLite(StorageManager):
             cur.execute("SELECT COUNT(LigName) FROM Ligands")
             n_ligands = int(cur.fetchone()[0])
             n_passing = int((percentile / 100) * n_ligands)
-            # find energy cutoff
-            counter = 0
-            for i in cur.execute(
-                f"SELECT {column} FROM Results GROUP BY LigName ORDER BY {column}"
-            ):
-                if counter == n_passing:
-                    cutoff = i[0]
-                    break
-                counter += 1
+            # cutoff is the value of the n_passing-th best ligand, let sqlite skip
+            # straight to it in the index of the per-ligand best poses
+            n_passing = max(min(n_passing, n_ligands - 1), 0)
+            if self.cache_filters:
+                cache_key = self._filter_cache_key(
+                    {"column": column, "n_passing": n_passing}, kind="percentile"
+                )
+                cutoff = self._fetch_cached_filter(cache_key, column="cutoff")
+                if cutoff is not None:
+                    self.logger.debug(
+                        f"{column} percentile cutoff is {cutoff} (from filter cache)"
+                    )
+                    return cutoff
+            if self._ligand_best_table_current():
+                best_column = {"docking_score": "docking_score", "leff": "best_leff"}[
+                    column
+                ]
+                best_values = f"SELECT {best_column} AS best FROM Ligand_best"
+            else:
+                best_values = (
+                    f"SELECT MIN({column}) AS best FROM Results GROUP BY LigName"
+                )
+            cutoff_query = f"SELECT best FROM ({best_values}) ORDER BY best LIMIT 1 OFFSET {n_passing}"
+            time0 = time.perf_counter()
+            cutoff = cur.execute(cutoff_query).fetchone()[0]
+            cur.close()
+            self._record_query_profile(
+                f"{column} percentile cutoff",
+                cutoff_query,
+                time.perf_counter() - time0,
+                1,
+            )
             self.logger.debug(f"{column} percentile cutoff is {cutoff}")
+            if self.cache_filters:
+                self._insert_cached_filter(
+                    cache_key,
+                    {"column": column, "percentile": percentile},
+                    cutoff=cutoff,
+                )
             return cutoff
         except sqlite3.OperationalError as e:
             raise StorageError("Error while generating percentile query") from e
@@ -2541,14 +5089,29 @@ class StorageManagerSQLite(StorageManager):
         # process filter values to lists and dicts that are easily incorporated in sql queries
         processed_filters = self._process_filters_for_query(filters_dict)
 
+        # check if clustering
+        clustering = bool(self.mfpt_cluster or self.interaction_cluster)
+
         # raise error if no filters are present and no clusterings
         if not processed_filters and not clustering:
             raise DatabaseQueryError(
                 "Ringtail query strings are empty, please check filter options."
             )
 
-        # check if clustering
-        clustering = bool(self.mfpt_cluster or self.interaction_cluster)
+        # an upper limit on the docking score alone is decided by the best pose of each ligand,
+        # filters on other columns may be passed by any pose and need the full query
+        best_pose_filtering = (
+            not clustering
+            and not self.output_all_poses
+            and filtering_window == "Results"
+            and list(processed_filters) == ["num_filters"]
+            and all(
+                filters_dict.get(key) is None
+                for key in ["ebest", "leworst", "lebest", "le_percentile", "hb_count"]
+            )
+            and self._ligand_best_table_current()
+            and not (self.top_k and self._ranking_column() != "docking_score")
+        )
         # if clustering without filtering
         if clustering:
             # allows for clustering without filtering
@@ -2563,55 +5126,26 @@ class StorageManagerSQLite(StorageManager):
             unclustered_query = ""
 
         # create query string from filters if present
-        if processed_filters:
+        if best_pose_filtering:
+            best_pose_query = "SELECT Pose_ID FROM Ligand_best WHERE " + " AND ".join(
+                processed_filters["num_filters"]
+            )
+            # the best ranked ligands are read from the docking score index of Ligand_best
+            if self.top_k:
+                best_pose_query += f" ORDER BY docking_score LIMIT {int(self.top_k)}"
+            unclustered_query = "WHERE R.Pose_ID IN (" + best_pose_query + ")"
+        elif processed_filters:
             # start stringing together queries
-            # check what filters are present, and prepare them as partial queries
-            if "num_filters" in processed_filters:
-                num_query = " AND ".join(
-                    ["R." + filter for filter in processed_filters["num_filters"]]
-                )
-            # check for interactions and prepare for query
-            if "int_filters" in processed_filters:
-                # if interaction filters are present and valid, two lists of included and excluded interactions are returned
-                # each item in the lists to be joined by "AND", and each item within the list item (if >1) to be joined by "OR"
-                include_interactions, exclude_interactions = (
-                    self._prepare_interaction_indices_for_filtering(
-                        interaction_list=processed_filters["int_filters"]
-                    )
-                )
-                # ensure there are interactions in the list after processing
-                if bool(exclude_interactions or include_interactions):
-                    # prepare partial queries for the different interaction combinations
-                    int_query = self._prepare_interaction_filtering_query(
-                        include_interactions,
-                        exclude_interactions,
-                        processed_filters["max_miss"],
-                    )
-            # check if ligand filters and prepare for query
-            if "lig_filters" in processed_filters:
-                lig_filters = processed_filters["lig_filters"]
-                ligand_queries = []
-                if (
-                    "ligand_substruct" in lig_filters
-                    or "ligand_name" in lig_filters
-                    or "ligand_max_atoms" in lig_filters
-                ):
-                    ligand_queries.append(
-                        self._generate_ligand_filtering_query(lig_filters)
-                    )
-                # if complex ligand filter, generate partial query
-                if "ligand_substruct_pos" in lig_filters:
-                    for substruct_pos in lig_filters["ligand_substruct_pos"]:
-                        temp_lig_filter = lig_filters
-                        temp_lig_filter["ligand_substruct_pos"] = substruct_pos
-                        ligand_substruct_queries.append(
-                            self._ligand_substructure_position_filter(temp_lig_filter)
-                        )
-                    join_stmnt = " " + lig_filters["ligand_operator"] + " "
-                # join all ligand queries that are not empty
-                lig_query = " AND ".join(
-                    [lig_filter for lig_filter in ligand_queries if lig_filter]
-                )
+            (
+                num_query,
+                int_query,
+                lig_query,
+                ligand_substruct_queries,
+                join_stmnt,
+            ) = self._prepare_partial_filter_queries(processed_filters)
+            # time the partial queries on their own to see what the filtering time is spent on
+            self._profile_partial_query("interaction filters", int_query)
+            self._profile_partial_query("ligand filters", lig_query)
             # if filter queries exist for each group, string them together appropriately
             if int_query:
                 # add with a join statement
@@ -2632,8 +5166,8 @@ class StorageManagerSQLite(StorageManager):
                     unclustered_query += num_query
                 # if both numerical and ligand_substruct_pos handle appropriately
                 if num_query and ligand_substruct_queries:
-                    unclustered_query += " AND " + join_stmnt.join(
-                        ligand_substruct_queries
+                    unclustered_query += (
+                        " AND (" + join_stmnt.join(ligand_substruct_queries) + ")"
                     )
                 # if not, only the ligand_substruct_pos sets the WHERE condition
                 else:
@@ -2651,19 +5185,144 @@ class StorageManagerSQLite(StorageManager):
             # if not clustering, rename query
             query = unclustered_query
 
+        # keep only the best ranked ligands, which are already one pose per ligand
+        if self.top_k and not best_pose_filtering:
+            query = self._top_k_query(filtering_window, query)
         # choose columns to be selected from filtering_window
         query_select_string = f"""SELECT {", ".join("R." + column for column in outfield_columns)} FROM {filtering_window} R """
         # adding if we only want to keep one pose per ligand (will keep first entry)
-        if not self.output_all_poses:
+        if not self.output_all_poses and not best_pose_filtering and not self.top_k:
             query += " GROUP BY R.LigName "
         # add how to order results
-        if self.order_results:
-            query += " ORDER BY " + self.field_to_column_name[self.order_results]
+        if self.order_results or self.top_k:
+            query += " ORDER BY " + self._ranking_column()
 
         output_query = query_select_string + query
         view_query = f"SELECT * FROM {filtering_window} R " + query
         return output_query, view_query
 
+    def _prepare_partial_filter_queries(self, processed_filters: dict) -> tuple:
+        """Prepares the partial queries for the numerical, interaction and ligand filters
+
+        Args:
+            processed_filters (dict): filters from _process_filters_for_query
+
+        Returns:
+            tuple: (numerical conditions on Results, query selecting Pose_IDs passing the interaction filters,
+                query selecting LigNames passing the ligand filters, list of conditions for each ligand_substruct_pos filter,
+                operator joining the ligand_substruct_pos conditions)
+        """
+        num_query = ""
+        int_query = ""
+        lig_query = ""
+        ligand_substruct_queries = []
+        join_stmnt = ""
+        # check what filters are present, and prepare them as partial queries
+        if "num_filters" in processed_filters:
+            num_query = " AND ".join(
+                ["R." + filter for filter in processed_filters["num_filters"]]
+            )
+        # check for interactions and prepare for query
+        if "int_filters" in processed_filters:
+            # if interaction filters are present and valid, two lists of included and excluded interactions are returned
+            # each item in the lists to be joined by "AND", and each item within the list item (if >1) to be joined by "OR"
+            include_interactions, exclude_interactions = (
+                self._prepare_interaction_indices_for_filtering(
+                    interaction_list=processed_filters["int_filters"]
+                )
+            )
+            # ensure there are interactions in the list after processing
+            if bool(exclude_interactions or include_interactions):
+                # prepare partial queries for the different interaction combinations
+                # materialized bookmarks re-run the query for new results
+                if (
+                    self._interaction_bitmaps_current()
+                    and not self.materialize_bookmarks
+                ):
+                    int_query = self._prepare_interaction_bitmap_query(
+                        include_interactions,
+                        exclude_interactions,
+                        processed_filters["max_miss"],
+                    )
+                else:
+                    int_query = self._prepare_interaction_filtering_query(
+                        include_interactions,
+                        exclude_interactions,
+                        processed_filters["max_miss"],
+                    )
+        # check if ligand filters and prepare for query
+        if "lig_filters" in processed_filters:
+            lig_filters = processed_filters["lig_filters"]
+            ligand_queries = []
+            if (
+                "ligand_substruct" in lig_filters
+                or "ligand_name" in lig_filters
+                or "ligand_max_atoms" in lig_filters
+            ):
+                ligand_queries.append(
+                    self._generate_ligand_filtering_query(lig_filters)
+                )
+            # if complex ligand filter, generate partial query
+            if "ligand_substruct_pos" in lig_filters:
+                ligand_substruct_queries = self._ligand_substructure_position_filter(
+                    lig_filters
+                )
+                join_stmnt = " " + lig_filters["ligand_operator"] + " "
+            # join all ligand queries that are not empty
+            lig_query = " AND ".join(
+                [lig_filter for lig_filter in ligand_queries if lig_filter]
+            )
+        return num_query, int_query, lig_query, ligand_substruct_queries, join_stmnt
+
+    def _ranking_column(self) -> str:
+        """Column results are ordered and ranked by, the order_results field or the docking score
+
+        Returns:
+            str: column name in Results
+        """
+        if self.order_results:
+            return self.field_to_column_name[self.order_results]
+        return "docking_score"
+
+    def _top_k_query(self, filtering_window: str, query: str) -> str:
+        """Reduces a filtering query to the self.top_k best ranked ligands (poses, if self.output_all_poses). Passing poses
+        are read in order of the ranking column, from the index on the column (created if missing) where the query
+        planner walks it, and reading stops after top_k ligands, keeping the best ranked pose of each. The Pose_IDs are stored in a Pose_ID set table.
+
+        Args:
+            filtering_window (str): table or bookmark that is filtered
+            query (str): partial filtering query following "SELECT ... FROM filtering_window R"
+
+        Returns:
+            str: partial query selecting the top_k best ranked poses
+        """
+        self._create_ranking_index()
+        ranked_query = f"SELECT R.Pose_ID, R.LigName FROM {filtering_window} R {query} ORDER BY R.{self._ranking_column()}"
+        time0 = time.perf_counter()
+        cur = self._run_query(ranked_query)
+        pose_ids = []
+        lignames = set()
+        while len(pose_ids) < self.top_k and (
+            rows := cur.fetchmany(self._fetch_batch_size)
+        ):
+            for pose_id, ligname in rows:
+                if not self.output_all_poses:
+                    if ligname in lignames:
+                        continue
+                    lignames.add(ligname)
+                pose_ids.append(pose_id)
+                if len(pose_ids) == self.top_k:
+                    break
+        cur.close()
+        if self.profile_queries:
+            self._record_query_profile(
+                "top_k ranking",
+                ranked_query,
+                time.perf_counter() - time0,
+                len(pose_ids),
+            )
+        return f"WHERE R.Pose_ID IN (SELECT Pose_ID FROM {self._create_pose_id_table(pose_ids)})"
+
     def _prepare_cluster_query(self, unclustered_query: str) -> str | None:
         """
         These methods will take data returned from unclustered filter query, then run the cluster query and cluster the filtered data.
@@ -2676,70 +5335,30 @@ class StorageManagerSQLite(StorageManager):
         Returns:
             str: (reduced) query to include in overall filter query if clustering returned results
         """
+        from rdkit import DataStructs
+
         if self.interaction_cluster and self.mfpt_cluster:
             self.logger.warning(
                 "N.B.: If using both interaction and morgan fingerprint clustering, the morgan fingerprint clustering will be performed on the results staus post interaction fingerprint clustering."
             )
 
-        def _clusterFps(fps, cutoff):
-            """
-            https://macinchem.org/2023/03/05/options-for-clustering-large-datasets-of-molecules/
-
-            Args:
-                fps (): fingerprints
-                cutoff distance (float)
-            """
-
-            # first generate the distance matrix:
-            dists = []
-            nfps = len(fps)
-            inputs = []
-
-            def gen(fps):
-                for i in range(1, len(fps)):
-                    yield (i, fps)
-
-            def mp_wrapper(input_tpl):
-                i, fps = input_tpl
-                return DataStructs.BulkTanimotoSimilarity(fps[i], fps[:i])
-
-            with multiprocess.Pool() as p:
-                inputs = gen(fps)
-                for sims in p.imap(mp_wrapper, inputs):
-                    dists.extend([1 - x for x in sims])
-
-            # now cluster the data:
-            cs = Butina.ClusterData(dists, nfps, cutoff, isDistData=True)
-            return cs
-
         cluster_query_string = None
 
         if self.interaction_cluster:
             cluster_query = f"SELECT Pose_ID, leff FROM Results WHERE Pose_ID IN ({unclustered_query})"
             # resulting data
             poseid_leffs = self._run_query(cluster_query).fetchall()
-            cluster_poseids = (
-                "("
-                + ",".join(map(str, [(poseid_leff[0]) for poseid_leff in poseid_leffs]))
-                + ")"
-            )
-            poseid_bvs = self._generate_interaction_bitvectors(cluster_poseids)
-
-            # create a list of tuples from the query data and bitvector
-            poseid_leff_bvs = [
-                (poseid_leff[0], poseid_leff[1], poseid_bvs[str(poseid_leff[0])])
-                for poseid_leff in poseid_leffs
-            ]
-            # index 2 is the bitvector string element
-            bclusters = _clusterFps(
-                [
-                    DataStructs.CreateFromBitString(poseid_leff_bv[2])
-                    for poseid_leff_bv in poseid_leff_bvs
-                ],
+            bclusters = self._cluster_poses(
+                "ifp",
                 self.interaction_cluster,
+                [poseid_leff[0] for poseid_leff in poseid_leffs],
+                [poseid_leff[1] for poseid_leff in poseid_leffs],
+                lambda: self._generate_interaction_bitvectors(
+                    [poseid_leff[0] for poseid_leff in poseid_leffs]
+                ),
             )
             self.logger.info(
-                f"Number of interaction fingerprint butina clusters: {len(bclusters)}"
+                f"Number of interaction fingerprint {self.cluster_method or 'butina'} clusters: {len(bclusters)}"
             )
 
             # select ligand from each cluster with best ligand efficiency
@@ -2749,16 +5368,16 @@ class StorageManagerSQLite(StorageManager):
             for cluster in bclusters:
                 # element 1 in individual pose id item is the ligand efficiency (leff)
                 c_leffs = np.array(
-                    [poseid_leff_bvs[cluster_element][1] for cluster_element in cluster]
+                    [poseid_leffs[cluster_element][1] for cluster_element in cluster]
                 )
-                # element 0 ([0]) in each leff_poseid_ifps row is the pose_id
-                best_lig_c = poseid_leff_bvs[cluster[np.argmin(c_leffs)]][0]
-                int_rep_poseids.append(str(best_lig_c))
+                # element 0 ([0]) in each poseid_leffs row is the pose_id
+                best_lig_c = poseid_leffs[cluster[np.argmin(c_leffs)]][0]
+                int_rep_poseids.append(best_lig_c)
 
-            # element 0 ([0]) in each leff_poseid_ifps row is the pose_id
+            # element 0 ([0]) in each poseid_leffs row is the pose_id
             self._insert_cluster_data(
                 bclusters,
-                [l[0] for l in poseid_leff_bvs],
+                [l[0] for l in poseid_leffs],
                 "ifp",
                 str(self.interaction_cluster),
             )
@@ -2769,32 +5388,45 @@ class StorageManagerSQLite(StorageManager):
                     "No passing results prior to clustering. Clustering not performed."
                 )
             else:
-                cluster_query_string = "R.Pose_ID = " + " OR R.Pose_ID = ".join(
-                    int_rep_poseids
+                pose_id_table = self._create_pose_id_table(int_rep_poseids)
+                cluster_query_string = (
+                    f"R.Pose_ID IN (SELECT Pose_ID FROM {pose_id_table})"
                 )
                 # if more clustering
                 if self.mfpt_cluster is not None:
                     # carry the pose ids returned by this cluster to the MFPT clustering
-                    unclustered_query = (
-                        f"SELECT R.Pose_ID FROM Results WHERE {cluster_query_string}"
-                    )
+                    unclustered_query = f"SELECT Pose_ID FROM {pose_id_table}"
 
         if self.mfpt_cluster:
-            cluster_query = f"SELECT R.Pose_ID, R.leff, mol_morgan_bfp(L.ligand_rdmol, 2, 1024) FROM Ligands L INNER JOIN Results R ON R.LigName = L.LigName WHERE R.Pose_ID IN ({unclustered_query})"
-            poseid_leff_mfps = self._run_query(cluster_query).fetchall()
-            bclusters = _clusterFps(
-                [DataStructs.CreateFromBinaryText(mol[2]) for mol in poseid_leff_mfps],
+            cluster_from = f"FROM Ligands L INNER JOIN Results R ON R.LigName = L.LigName WHERE R.Pose_ID IN ({unclustered_query}) ORDER BY R.Pose_ID"
+            poseid_leff_mfps = self._run_query(
+                f"SELECT R.Pose_ID, R.leff {cluster_from}"
+            ).fetchall()
+            # fingerprints are only computed if the clusters are not cached
+            bclusters = self._cluster_poses(
+                "mfp",
                 self.mfpt_cluster,
+                [mol[0] for mol in poseid_leff_mfps],
+                [mol[1] for mol in poseid_leff_mfps],
+                lambda: self._pack_fingerprints(
+                    [
+                        list(DataStructs.CreateFromBinaryText(mfp[0]).GetOnBits())
+                        for mfp in self._run_query(
+                            f"SELECT mol_morgan_bfp(L.ligand_rdmol, 2, 1024) {cluster_from}"
+                        )
+                    ],
+                    1024,
+                ),
             )
             self.logger.info(
-                f"Number of Morgan fingerprint butina clusters: {len(bclusters)}"
+                f"Number of Morgan fingerprint {self.cluster_method or 'butina'} clusters: {len(bclusters)}"
             )
             # select ligand from each cluster with best ligand efficiency
             fp_rep_poseids = []
             for c in bclusters:
                 c_leffs = np.array([poseid_leff_mfps[i][1] for i in c])
                 best_lig_c = poseid_leff_mfps[c[np.argmin(c_leffs)]][0]
-                fp_rep_poseids.append(str(best_lig_c))
+                fp_rep_poseids.append(best_lig_c)
 
             self._insert_cluster_data(
                 bclusters,
@@ -2809,8 +5441,9 @@ class StorageManagerSQLite(StorageManager):
                     "No passing results prior to clustering. Clustering not performed."
                 )
             else:
-                cluster_query_string = "R.Pose_ID = " + " OR R.Pose_ID = ".join(
-                    fp_rep_poseids
+                pose_id_table = self._create_pose_id_table(fp_rep_poseids)
+                cluster_query_string = (
+                    f"R.Pose_ID IN (SELECT Pose_ID FROM {pose_id_table})"
                 )
         return cluster_query_string
 
@@ -2828,6 +5461,21 @@ class StorageManagerSQLite(StorageManager):
         Returns:
             str: partial query to include in main filter query
         """
+        if exclude_interactions:
+            # a pose passes an excluded interaction if it does not have it, so poses are counted
+            # with the interaction filters they satisfy, including poses without interactions
+            satisfied = []
+            for indices in include_interactions:
+                satisfied.append(
+                    f"IFNULL(MAX(I.interaction_id IN ({numlist2str(indices, ',')})), 0)"
+                )
+            for indices in exclude_interactions:
+                satisfied.append(
+                    f"(1 - IFNULL(MAX(I.interaction_id IN ({numlist2str(indices, ',')})), 0))"
+                )
+            return f"""SELECT R.Pose_ID AS Pose_ID FROM Results R LEFT JOIN Interactions I ON I.Pose_ID = R.Pose_ID
+                GROUP BY R.Pose_ID HAVING {" + ".join(satisfied)} >= {len(satisfied) - max_miss}"""
+
         # nonsensical number to count an interaction if it satisfies an incomplete ("wildcard") interaction
         nonsense_counter = -10000
         num_of_interactions = (
@@ -2924,138 +5572,553 @@ class StorageManagerSQLite(StorageManager):
         # 4. add grouping and wildcard for total interactions minus max_miss, essentially
         query += f") GROUP BY Pose_ID HAVING COUNT(DISTINCT filtered_interactions) >= ({num_of_interactions}) "
 
-        return query
+        return query
+
+    def _ligand_substructure_position_filter(self, ligand_filters_dict: dict) -> list:
+        """
+        Method that takes all ligand filters in the presence of a ligand_substruct_pos filter, and reduces the query to
+        " IN pose_ids" based on what pose_ids passed each ligand_substruct_pos filter, stored in a Pose_ID set table. Each candidate ligand is parsed
+        once and matched once per SMARTS, and the distances to the positions are computed for all poses of the ligand
+        at once, in a process pool if there are many candidate poses.
+
+        Args:
+            ligand_filters_dict (dict): all specified ligand filters
+
+        Raises:
+            OptionError
+
+        Returns:
+            list: of partial queries that identify pose ids passing each ligand_substruct_pos filter
+        """
+        substruct_pos_filters = [
+            (
+                str(substruct_pos[0]),
+                int(substruct_pos[1]),
+                float(substruct_pos[2]),
+                float(substruct_pos[3]),
+                float(substruct_pos[4]),
+                float(substruct_pos[5]),
+            )
+            for substruct_pos in ligand_filters_dict["ligand_substruct_pos"]
+        ]
+        # create temporary table with molecules that pass the smarts
+        tmp_lig_filters = {"ligand_operator": ligand_filters_dict["ligand_operator"]}
+        if "ligand_max_atoms" in ligand_filters_dict:
+            tmp_lig_filters["ligand_max_atoms"] = ligand_filters_dict[
+                "ligand_max_atoms"
+            ]
+        tmp_lig_filters["ligand_substruct"] = [
+            substruct_pos[0] for substruct_pos in substruct_pos_filters
+        ]
+        cmd = self._generate_ligand_filtering_query(tmp_lig_filters)
+        cmd = cmd.replace(
+            "SELECT L.LigName FROM Ligands L",
+            "SELECT "
+            "R.Pose_ID, "
+            "L.LigName, "
+            "L.ligand_smile, "
+            "L.atom_index_map, "
+            "R.ligand_coordinates "
+            "FROM Ligands L INNER JOIN Results R ON R.LigName = L.LigName",
+        )
+        cmd = "CREATE TEMP TABLE passed_smarts AS " + cmd
+        self._load_chemicalite_if_needed(cmd)
+        cur = self.conn.cursor()
+        cur.execute("DROP TABLE IF EXISTS passed_smarts")
+        time0 = time.perf_counter()
+        cur.execute(cmd)
+        if self.profile_queries:
+            self._record_query_profile(
+                "ligand_substruct_pos candidate poses",
+                cmd,
+                time.perf_counter() - time0,
+                cur.execute("SELECT COUNT(*) FROM passed_smarts").fetchone()[0],
+            )
+
+        # group poses by ligand
+        ligands = []
+        num_poses = 0
+        for pose_id, ligname, smiles, idxmap, coords in cur.execute(
+            "SELECT * FROM passed_smarts ORDER BY LigName"
+        ):
+            if not ligands or ligands[-1][0] != ligname:
+                ligands.append((ligname, smiles, idxmap, []))
+            ligands[-1][3].append((pose_id, coords))
+            num_poses += 1
+        cur.close()
+
+        if num_poses >= self._substruct_pos_parallel_min_poses:
+            import multiprocess
+
+            with multiprocess.Pool() as p:
+                num_chunks = max(1, min(len(ligands), 4 * multiprocess.cpu_count()))
+                chunk_hits = p.starmap(
+                    self._substruct_position_hits,
+                    [
+                        (ligands[i::num_chunks], substruct_pos_filters)
+                        for i in range(num_chunks)
+                    ],
+                )
+            pose_id_lists = [
+                [pose_id for hits in chunk_hits for pose_id in hits[i]]
+                for i in range(len(substruct_pos_filters))
+            ]
+        else:
+            pose_id_lists = self._substruct_position_hits(
+                ligands, substruct_pos_filters
+            )
+
+        if not any(pose_id_lists):
+            raise OptionError(
+                "There are no ligands passing the 'ligand_substruct_pos' filter, please revise your filter query."
+            )
+
+        return [
+            f"R.Pose_ID IN (SELECT Pose_ID FROM {self._create_pose_id_table(pose_ids)})"
+            for pose_ids in pose_id_lists
+        ]
+
+    @staticmethod
+    def _substruct_position_hits(ligands: list, substruct_pos_filters: list) -> list:
+        """Finds the poses with an atom of a substructure within the cutoff distance of a position,
+        for each ligand_substruct_pos filter
+
+        Args:
+            ligands (list): of (ligand name, smiles, atom index map, list of (Pose_ID, ligand coordinates))
+            substruct_pos_filters (list): of (smarts, index of atom in smarts, cutoff distance, x, y, z)
+
+        Returns:
+            list: of lists of passing Pose_IDs for each filter
+        """
+        from rdkit import Chem
+
+        smarts_mols = [Chem.MolFromSmarts(f[0]) for f in substruct_pos_filters]
+        # substructure matches only depend on the smiles
+        matches_by_smiles = {}
+        pose_id_lists = [[] for _ in substruct_pos_filters]
+        for _, smiles, idxmap, poses in ligands:
+            if smiles not in matches_by_smiles:
+                mol = Chem.MolFromSmiles(smiles)
+                matches_by_smiles[smiles] = [
+                    mol.GetSubstructMatches(smarts_mol) for smarts_mol in smarts_mols
+                ]
+            idxmap = [int(value) - 1 for value in json.loads(idxmap)]
+            idxmap = {
+                idxmap[j * 2]: idxmap[j * 2 + 1] for j in range(int(len(idxmap) / 2))
+            }
+            # coordinates of all poses of the ligand, decoded once
+            coordinates = None
+            for i, (smarts, index, cutoff, x, y, z) in enumerate(substruct_pos_filters):
+                atoms = sorted(
+                    {idxmap[hit[index]] for hit in matches_by_smiles[smiles][i]}
+                )
+                if not atoms:
+                    continue
+                if coordinates is None:
+                    coordinates = np.array(
+                        [json.loads(coords) for _, coords in poses], dtype=float
+                    )
+                sqdist = ((coordinates[:, atoms, :] - (x, y, z)) ** 2).sum(axis=2)
+                passing = (sqdist <= cutoff**2).any(axis=1)
+                pose_id_lists[i].extend(
+                    pose_id for (pose_id, _), p in zip(poses, passing) if p
+                )
+        return pose_id_lists
+
+    @staticmethod
+    def _pack_fingerprints(on_bits: list, num_bits: int) -> np.ndarray:
+        """Packs fingerprints into rows of 64-bit words
+
+        Args:
+            on_bits (list): of lists of the indices of the set bits of each fingerprint
+            num_bits (int): length of the fingerprints
+
+        Returns:
+            np.ndarray: uint64 array of shape (number of fingerprints, number of words)
+        """
+        rows = np.repeat(np.arange(len(on_bits)), [len(bits) for bits in on_bits])
+        bits = np.fromiter(
+            (bit for bits in on_bits for bit in bits), dtype=np.int64, count=len(rows)
+        )
+        return StorageManagerSQLite._set_fingerprint_bits(
+            len(on_bits), num_bits, rows, bits
+        )
+
+    @staticmethod
+    def _set_fingerprint_bits(
+        num_fps: int, num_bits: int, rows: np.ndarray, bits: np.ndarray
+    ) -> np.ndarray:
+        """Packed fingerprints with the given bits set
+
+        Args:
+            num_fps (int): number of fingerprints
+            num_bits (int): length of the fingerprints
+            rows (np.ndarray): fingerprint (row) of each set bit
+            bits (np.ndarray): index of each set bit
+
+        Returns:
+            np.ndarray: uint64 array of shape (number of fingerprints, number of words)
+        """
+        fps = np.zeros((num_fps, max(1, (num_bits + 63) // 64)), dtype=np.uint64)
+        bits = np.asarray(bits, dtype=np.int64)
+        np.bitwise_or.at(
+            fps,
+            (rows, bits >> 6),
+            np.left_shift(np.uint64(1), (bits & 63).astype(np.uint64)),
+        )
+        return fps
+
+    @staticmethod
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        """Number of set bits in each 64-bit word
+
+        Args:
+            words (np.ndarray): uint64 array
+
+        Returns:
+            np.ndarray: array of bit counts of the same shape
+        """
+        if hasattr(np, "bitwise_count"):
+            return np.bitwise_count(words)
+        counts = np.unpackbits(words.view(np.uint8)).reshape(words.shape + (64,))
+        return counts.sum(axis=-1, dtype=np.uint8)
+
+    @classmethod
+    def _tanimoto_neighbors(
+        cls, fps: np.ndarray, cutoff: float, start: int, stop: int
+    ) -> tuple:
+        """Finds the pairs of fingerprints within a Tanimoto distance cutoff, for the fingerprints in rows start to stop and
+        the fingerprints before them. Fingerprints must be sorted by number of set bits, so that only the fingerprints
+        with enough set bits to be within the cutoff are compared, in blocks of cls._cluster_block_size.
+
+        Args:
+            fps (np.ndarray): packed fingerprints sorted by number of set bits, from _pack_fingerprints
+            cutoff (float): Tanimoto distance cutoff
+            start (int): first row
+            stop (int): row after the last row
 
-    def _ligand_substructure_position_filter(self, ligand_filters_dict: dict) -> str:
+        Returns:
+            tuple: arrays of the rows i and j < i of the pairs
         """
-        Method that takes all ligand filters in the presence of a ligand_substruct_pos filter, and reduces the query to
-        " IN pose_ids" based on what pose_ids passed the ligand filters
+        counts = cls._popcount(fps).sum(axis=1, dtype=np.int64)
+        pairs_i, pairs_j = [], []
+        for row_start in range(start, stop, cls._cluster_block_size):
+            row_stop = min(row_start + cls._cluster_block_size, stop)
+            # fingerprints with fewer than (1 - cutoff) * count set bits are not within the cutoff
+            col_start = int(
+                np.searchsorted(counts, (1 - cutoff) * counts[row_start], side="left")
+            )
+            for block_start in range(col_start, row_stop, cls._cluster_block_size):
+                block_stop = min(block_start + cls._cluster_block_size, row_stop)
+                common = cls._popcount(
+                    fps[row_start:row_stop, None, :]
+                    & fps[None, block_start:block_stop, :]
+                ).sum(axis=2, dtype=np.int64)
+                union = (
+                    counts[row_start:row_stop, None]
+                    + counts[None, block_start:block_stop]
+                    - common
+                )
+                similarity = np.divide(
+                    common,
+                    union,
+                    out=np.zeros(common.shape, dtype=np.float64),
+                    where=union > 0,
+                )
+                rows, cols = np.nonzero(1 - similarity <= cutoff)
+                rows += row_start
+                cols += block_start
+                lower = cols < rows
+                pairs_i.append(rows[lower].astype(np.int32))
+                pairs_j.append(cols[lower].astype(np.int32))
+        if not pairs_i:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        return np.concatenate(pairs_i), np.concatenate(pairs_j)
 
-        Args:
-            ligand_filters_dict (dict): all specified ligand filters
+    @classmethod
+    def _butina_clusters(cls, fps: np.ndarray, cutoff: float) -> tuple:
+        """Butina clustering of fingerprints by Tanimoto distance, with the same clusters as rdkit.ML.Cluster.Butina.ClusterData.
+        Only the pairs of fingerprints within the cutoff are kept, as sparse neighbor lists, and are computed in a process pool
+        if there are many fingerprints.
 
-        Raises:
-            OptionError
+        Args:
+            fps (np.ndarray): packed fingerprints, from _pack_fingerprints
+            cutoff (float): Tanimoto distance cutoff
 
         Returns:
-            str: partial query that identifies pose ids passing the ligand substructure filter
+            tuple: of clusters, each a tuple of fingerprint indices starting with the cluster centroid
         """
-        queries = []
-        nr_args_per_group = 6
-        nr_smarts = int(
-            len(ligand_filters_dict["ligand_substruct_pos"]) / nr_args_per_group
-        )
-        # create temporary table with molecules that pass all smiles
-        tmp_lig_filters = {"ligand_operator": ligand_filters_dict["ligand_operator"]}
-        if "ligand_max_atoms" in ligand_filters_dict:
-            tmp_lig_filters["ligand_max_atoms"] = ligand_filters_dict[
-                "ligand_max_atoms"
-            ]
-        tmp_lig_filters["ligand_substruct"] = [
-            ligand_filters_dict["ligand_substruct_pos"][i * nr_args_per_group]
-            for i in range(nr_smarts)
-        ]
-        cmd = self._generate_ligand_filtering_query(tmp_lig_filters)
-        cmd = cmd.replace(
-            "SELECT L.LigName FROM Ligands L",
-            "SELECT "
-            "R.Pose_ID, "
-            "L.LigName, "
-            "L.ligand_smile, "
-            "L.atom_index_map, "
-            "R.ligand_coordinates "
-            "FROM Ligands L INNER JOIN Results R ON R.LigName = L.LigName",
+        return cls._butina_from_neighbors(
+            len(fps), *cls._tanimoto_neighbor_pairs(fps, cutoff)
         )
-        cmd = "CREATE TEMP TABLE passed_smarts AS " + cmd
-        cur = self.conn.cursor()
-        cur.execute("DROP TABLE IF EXISTS passed_smarts")
-        cur.execute(cmd)
-        smarts_loc_filters = []
-        for i in range(nr_smarts):
-            smarts = ligand_filters_dict["ligand_substruct_pos"][
-                i * nr_args_per_group + 0
-            ]
-            index = int(
-                ligand_filters_dict["ligand_substruct_pos"][i * nr_args_per_group + 1]
+
+    @classmethod
+    def _tanimoto_neighbor_pairs(cls, fps: np.ndarray, cutoff: float) -> tuple:
+        """Finds all pairs of fingerprints within a Tanimoto distance cutoff, in a process pool if there are many fingerprints
+
+        Args:
+            fps (np.ndarray): packed fingerprints, from _pack_fingerprints
+            cutoff (float): Tanimoto distance cutoff
+
+        Returns:
+            tuple: arrays of the indices i and j of the pairs, each pair once
+        """
+        num_fps = len(fps)
+        # sorted by number of set bits, pairs are found for the sorted fingerprints
+        order = np.argsort(cls._popcount(fps).sum(axis=1), kind="stable")
+        sorted_fps = fps[order]
+        if num_fps >= cls._cluster_parallel_min_fps:
+            import multiprocess
+
+            # row ranges with about the same number of pairs to compare
+            num_ranges = multiprocess.cpu_count()
+            bounds = sorted(
+                {int(num_fps * np.sqrt(k / num_ranges)) for k in range(num_ranges + 1)}
             )
-            sqdist = (
-                float(
-                    ligand_filters_dict["ligand_substruct_pos"][
-                        i * nr_args_per_group + 2
-                    ]
+            with multiprocess.Pool() as p:
+                range_pairs = p.starmap(
+                    cls._tanimoto_neighbors,
+                    [
+                        (sorted_fps[:stop], cutoff, start, stop)
+                        for start, stop in zip(bounds[:-1], bounds[1:])
+                    ],
                 )
-                ** 2
+            pairs_i = np.concatenate([pairs[0] for pairs in range_pairs])
+            pairs_j = np.concatenate([pairs[1] for pairs in range_pairs])
+        else:
+            pairs_i, pairs_j = cls._tanimoto_neighbors(sorted_fps, cutoff, 0, num_fps)
+        return order[pairs_i], order[pairs_j]
+
+    @staticmethod
+    def _butina_from_neighbors(
+        num_fps: int, pairs_i: np.ndarray, pairs_j: np.ndarray
+    ) -> tuple:
+        """Butina clustering from the pairs of fingerprints within the cutoff
+
+        Args:
+            num_fps (int): number of fingerprints
+            pairs_i (np.ndarray): indices i of the pairs
+            pairs_j (np.ndarray): indices j of the pairs
+
+        Returns:
+            tuple: of clusters, each a tuple of fingerprint indices starting with the cluster centroid
+        """
+        # neighbor lists in ascending order of the indices
+        rows = np.concatenate([pairs_i, pairs_j])
+        cols = np.concatenate([pairs_j, pairs_i])
+        neighbor_order = np.lexsort((cols, rows))
+        neighbors = cols[neighbor_order]
+        indptr = np.zeros(num_fps + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_fps), out=indptr[1:])
+
+        # fingerprints with most neighbors (each is its own neighbor) first, ties by descending index
+        degrees = np.diff(indptr) + 1
+        clusters = []
+        seen = np.zeros(num_fps, dtype=bool)
+        for idx in np.lexsort((np.arange(num_fps), degrees))[::-1].tolist():
+            if seen[idx]:
+                continue
+            seen[idx] = True
+            idx_neighbors = neighbors[indptr[idx] : indptr[idx + 1]]
+            new_members = idx_neighbors[~seen[idx_neighbors]]
+            seen[new_members] = True
+            clusters.append((idx, *new_members.tolist()))
+        return tuple(clusters)
+
+    @classmethod
+    def _sphere_exclusion_clusters(
+        cls, fps: np.ndarray, cutoff: float, priorities: list
+    ) -> tuple:
+        """Sphere exclusion (leader) clustering of fingerprints by Tanimoto distance. In order of priority, each fingerprint
+        not yet in a cluster becomes a cluster centroid, and the unclustered fingerprints within the cutoff of it join the
+        cluster. Every centroid is compared only to the fingerprints still unclustered, so no neighbor lists are kept.
+
+        Args:
+            fps (np.ndarray): packed fingerprints, from _pack_fingerprints
+            cutoff (float): Tanimoto distance cutoff
+            priorities (list): value of each fingerprint, lowest is picked first as a centroid
+
+        Returns:
+            tuple: of clusters, each a tuple of fingerprint indices starting with the cluster centroid
+        """
+        counts = cls._popcount(fps).sum(axis=1, dtype=np.int64)
+        # unclustered fingerprints, kept in order of priority
+        remaining = np.argsort(np.asarray(priorities, dtype=np.float64), kind="stable")
+        clusters = []
+        while len(remaining):
+            idx = remaining[0]
+            common = cls._popcount(fps[remaining] & fps[idx]).sum(
+                axis=1, dtype=np.int64
             )
-            x = float(
-                ligand_filters_dict["ligand_substruct_pos"][i * nr_args_per_group + 3]
+            union = counts[remaining] + counts[idx] - common
+            similarity = np.divide(
+                common,
+                union,
+                out=np.zeros(common.shape, dtype=np.float64),
+                where=union > 0,
             )
-            y = float(
-                ligand_filters_dict["ligand_substruct_pos"][i * nr_args_per_group + 4]
+            in_sphere = 1 - similarity <= cutoff
+            in_sphere[0] = True
+            clusters.append((int(idx), *np.sort(remaining[in_sphere][1:]).tolist()))
+            remaining = remaining[~in_sphere]
+        return tuple(clusters)
+
+    @classmethod
+    def _minhash_signatures(
+        cls, fps: np.ndarray, num_hashes: int, seed: int = 0
+    ) -> np.ndarray:
+        """MinHash signatures of packed fingerprints: for each of num_hashes random permutations of the bit positions,
+        the lowest permuted position of the set bits. Fingerprints without set bits get the number of bits as signature.
+
+        Args:
+            fps (np.ndarray): packed fingerprints, from _pack_fingerprints
+            num_hashes (int): number of permutations
+            seed (int): seed of the random permutations
+
+        Returns:
+            np.ndarray: int32 array of shape (number of fingerprints, num_hashes)
+        """
+        num_bits = fps.shape[1] * 64
+        rng = np.random.default_rng(seed)
+        permutations = np.array(
+            [rng.permutation(num_bits) for _ in range(num_hashes)], dtype=np.int32
+        )
+        signatures = np.full((len(fps), num_hashes), num_bits, dtype=np.int32)
+        for block_start in range(0, len(fps), cls._minhash_block_size):
+            block = fps[block_start : block_start + cls._minhash_block_size]
+            # set bits of the block, by row, with bit i of word w at position 64 * w + i
+            rows, bits = np.nonzero(
+                np.unpackbits(
+                    block.astype("<u8").view(np.uint8), axis=1, bitorder="little"
+                )
             )
-            z = float(
-                ligand_filters_dict["ligand_substruct_pos"][i * nr_args_per_group + 5]
+            if not len(rows):
+                continue
+            row_starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+            signatures[block_start + rows[row_starts]] = np.minimum.reduceat(
+                permutations[:, bits], row_starts, axis=1
+            ).T
+        return signatures
+
+    @classmethod
+    def _lsh_clusters(
+        cls, fps: np.ndarray, cutoff: float, priorities: list, num_bands: int
+    ) -> tuple:
+        """Approximate sphere exclusion clustering of fingerprints by Tanimoto distance, with MinHash locality-sensitive hashing.
+        The MinHash signatures are split into num_bands bands, with the number of rows per band chosen so that fingerprints
+        at the cutoff distance share at least one band with probability of about 1/2. In order of priority, each
+        fingerprint not yet in a cluster becomes a cluster centroid, and the unclustered fingerprints sharing a band with it
+        and within the cutoff join the cluster. More bands find more of the fingerprints within the cutoff.
+
+        Args:
+            fps (np.ndarray): packed fingerprints, from _pack_fingerprints
+            cutoff (float): Tanimoto distance cutoff
+            priorities (list): value of each fingerprint, lowest is picked first as a centroid
+            num_bands (int): number of MinHash bands
+
+        Returns:
+            tuple: of clusters, each a tuple of fingerprint indices starting with the cluster centroid
+        """
+        similarity_cutoff = min(max(1 - cutoff, 0.05), 0.95)
+        rows_per_band = max(1, round(np.log(num_bands) / -np.log(similarity_cutoff)))
+        signatures = cls._minhash_signatures(fps, num_bands * rows_per_band)
+        counts = cls._popcount(fps).sum(axis=1, dtype=np.int64)
+        # fingerprints without set bits are not within any cutoff below 1, and not bucketed
+        bucketed = np.flatnonzero(counts > 0)
+        band_members = []
+        band_indptrs = []
+        band_buckets = []
+        for band in range(num_bands):
+            buckets = np.full(len(fps), -1, dtype=np.int64)
+            buckets[bucketed] = np.unique(
+                signatures[bucketed, band * rows_per_band : (band + 1) * rows_per_band],
+                axis=0,
+                return_inverse=True,
+            )[1].reshape(-1)
+            band_members.append(bucketed[np.argsort(buckets[bucketed], kind="stable")])
+            indptr = np.zeros(buckets.max() + 2, dtype=np.int64)
+            np.cumsum(np.bincount(buckets[bucketed]), out=indptr[1:])
+            band_indptrs.append(indptr)
+            band_buckets.append(buckets)
+
+        clusters = []
+        clustered = np.zeros(len(fps), dtype=bool)
+        for idx in np.argsort(
+            np.asarray(priorities, dtype=np.float64), kind="stable"
+        ).tolist():
+            if clustered[idx]:
+                continue
+            clustered[idx] = True
+            if counts[idx] == 0:
+                clusters.append((idx,))
+                continue
+            candidates = np.concatenate(
+                [
+                    members[indptr[buckets[idx]] : indptr[buckets[idx] + 1]]
+                    for members, indptr, buckets in zip(
+                        band_members, band_indptrs, band_buckets
+                    )
+                ]
             )
-            # save filter for bookmark
-            smarts_loc_filters.append((smarts, index, x, y, z))
-            poses = self._run_query("SELECT * FROM passed_smarts")
-            pose_id_list = []
-            smartsmol = Chem.MolFromSmarts(smarts)
-            for pose_id, ligname, smiles, idxmap, coords in poses:
-                mol = Chem.MolFromSmiles(smiles)
-                idxmap = [int(value) - 1 for value in json.loads(idxmap)]
-                idxmap = {
-                    idxmap[j * 2]: idxmap[j * 2 + 1]
-                    for j in range(int(len(idxmap) / 2))
-                }
-                for hit in mol.GetSubstructMatches(smartsmol):
-                    xyz = [
-                        float(value) for value in json.loads(coords)[idxmap[hit[index]]]
-                    ]
-                    d2 = (xyz[0] - x) ** 2 + (xyz[1] - y) ** 2 + (xyz[2] - z) ** 2
-                    if d2 <= sqdist:
-                        pose_id_list.append(str(pose_id))
-                        break  # add pose only once
-            if len(pose_id_list) > 0:
-                queries.append("R.Pose_ID IN ({0})".format(",".join(pose_id_list)))
-        cur.close()
-        if not queries:
-            raise OptionError(
-                "There are no ligands passing the 'ligand_substruct_pos' filter, please revise your filter query."
+            candidates = np.unique(candidates[~clustered[candidates]])
+            common = cls._popcount(fps[candidates] & fps[idx]).sum(
+                axis=1, dtype=np.int64
             )
+            similarity = common / (counts[candidates] + counts[idx] - common)
+            new_members = candidates[1 - similarity <= cutoff]
+            clustered[new_members] = True
+            clusters.append((idx, *new_members.tolist()))
+        return tuple(clusters)
+
+    def _cluster_fingerprints(
+        self, fps: np.ndarray, cutoff: float, leffs: list
+    ) -> tuple:
+        """Clusters fingerprints with the algorithm given by cluster_method
+
+        Args:
+            fps (np.ndarray): packed fingerprints, from _pack_fingerprints
+            cutoff (float): Tanimoto distance cutoff
+            leffs (list): ligand efficiency of each fingerprint, lowest are picked first as sphere exclusion centroids
 
-        return "".join(queries)
+        Returns:
+            tuple: of clusters, each a tuple of fingerprint indices starting with the cluster centroid
+        """
+        if self.cluster_method == "sphere_exclusion":
+            return self._sphere_exclusion_clusters(fps, cutoff, leffs)
+        if self.cluster_method == "lsh":
+            return self._lsh_clusters(fps, cutoff, leffs, self.lsh_bands or 16)
+        return self._butina_clusters(fps, cutoff)
 
-    def _generate_interaction_bitvectors(self, pose_ids: str) -> dict:
+    def _generate_interaction_bitvectors(self, pose_ids: list) -> np.ndarray:
         """
-        Method to generate a dict of generate bitvector strings from pose_ids
+        Method to generate the packed interaction fingerprints of pose_ids, with bit i - 1 set for interaction_id i
 
         Args:
-            pose_ids (str): query formatted list of pose_ids (as tuple)
+            pose_ids (list): of Pose_IDs
 
         Returns:
-            dict: of "pose_id":"bitvector"
+            np.ndarray: uint64 array of packed fingerprints, one row per Pose_ID in the order of pose_ids
         """
-        # create a list of 0 items the length of interaction_indices table
         ii_length = self._get_length_of_table("Interaction_indices")
         # for each pose id, get a list of interaction_indices from joining the two tables i and ii
-        poseid_intind_query = f"""SELECT Pose_ID, interaction_id
-                                    FROM Interactions
-                                    WHERE Pose_ID IN {pose_ids}"""
-        poseid_intinds = self._run_query(poseid_intind_query).fetchall()
-        # cast string to list
-        pose_id_list = list((pose_ids.strip("()")).split(","))
-        # make dict of pose id and bitvector
-        poseid_bvlist = {(pose_id): [0] * ii_length for pose_id in pose_id_list}
-        # iterate over the tuple results from the query
-        for poseid_intind in poseid_intinds:
-            poseid_bvlist[str(poseid_intind[0])][poseid_intind[1] - 1] = 1
-
-        # join list as string without any delimiter
-        poseid_bv = {
-            key: "".join(map(str, value)) for (key, value) in poseid_bvlist.items()
-        }
-        # return dict of pose id as string and bitvector
-        return poseid_bv
+        pose_id_table = self._create_pose_id_table(
+            pose_ids, "bitvector_pose_ids", temp=True
+        )
+        poseid_intind_query = f"""SELECT I.Pose_ID, I.interaction_id
+                                    FROM Interactions I
+                                    JOIN {pose_id_table} P ON P.Pose_ID = I.Pose_ID"""
+        poseid_intinds = np.array(
+            self._run_query(poseid_intind_query).fetchall(), dtype=np.int64
+        ).reshape(-1, 2)
+        # row of each pose id in pose_ids
+        pose_ids = np.asarray(pose_ids, dtype=np.int64)
+        pose_id_order = np.argsort(pose_ids, kind="stable")
+        rows = pose_id_order[
+            np.searchsorted(pose_ids[pose_id_order], poseid_intinds[:, 0])
+        ]
+        return self._set_fingerprint_bits(
+            len(pose_ids), ii_length, rows, poseid_intinds[:, 1] - 1
+        )
 
     def _prepare_interaction_indices_for_filtering(self, interaction_list: list):
         """
@@ -3110,6 +6173,36 @@ class StorageManagerSQLite(StorageManager):
         else:
             return include_interactions, exclude_interactions
 
+    def _fetch_interaction_filter_indices(
+        self, interaction_type: str, interaction: str
+    ) -> list:
+        """Looks up the interaction indices matching one interaction filter
+
+        Args:
+            interaction_type (str): type of interaction filter, e.g. "hb_interactions"
+            interaction (str): interaction as "chain:resname:resid:atomname", any field may be empty
+
+        Raises:
+            OptionError: if interaction is not in database
+
+        Returns:
+            list: of interaction indices (more than one if interaction had a "wildcard")
+        """
+        interaction_name_to_letter = {
+            "vdw_interactions": "V",
+            "hb_interactions": "H",
+            "reactive_interactions": "R",
+        }
+        interaction_info = [interaction_name_to_letter[interaction_type]] + (
+            interaction.split(":")
+        )
+        indices = [i[0] for i in self._get_interaction_indices(interaction_info)]
+        if not indices:
+            raise OptionError(
+                f"The following interactions do not exist in the database: {[':'.join(interaction_info[:4])]} not found in the database. Please check for spelling errors or remove from filter."
+            )
+        return indices
+
     def _get_interaction_indices(self, interaction_list) -> iter:
         """takes list of interaction info and looks up corresponding interaction index
 
@@ -3163,6 +6256,8 @@ class StorageManagerSQLite(StorageManager):
             logical_operator = "OR"
         if logical_operator is None:
             logical_operator = "AND"
+        # screen ligands with stored atom counts and pattern fingerprints before exact substructure matches
+        screening = self._ligand_screening_current()
         for kw in ligand_filters.keys():
             fils = ligand_filters[kw]
             if kw == "ligand_name":
@@ -3172,11 +6267,18 @@ class StorageManagerSQLite(StorageManager):
                     name_sql_str = " L.LigName LIKE '%{value}%' OR".format(value=name)
                     sql_ligand_string += name_sql_str
             if kw == "ligand_max_atoms" and ligand_filters[kw] is not None:
-                maxatom_sql_str = " mol_num_hvyatms(ligand_rdmol) <= {} {}".format(
-                    ligand_filters[kw], logical_operator
-                )
+                if screening:
+                    maxatom_sql_str = " L.LigName IN (SELECT LigName FROM Ligand_screening WHERE num_heavy_atoms <= {}) {}".format(
+                        ligand_filters[kw], logical_operator
+                    )
+                else:
+                    maxatom_sql_str = " mol_num_hvyatms(ligand_rdmol) <= {} {}".format(
+                        ligand_filters[kw], logical_operator
+                    )
                 sql_ligand_string += maxatom_sql_str
             if kw == "ligand_substruct":
+                from rdkit import Chem
+
                 for smarts in fils:
                     # check for hydrogens in smarts pattern
                     smarts_mol = Chem.MolFromSmarts(smarts)
@@ -3185,9 +6287,17 @@ class StorageManagerSQLite(StorageManager):
                             raise DatabaseQueryError(
                                 f"Given ligand substructure filter {smarts} contains explicit hydrogens. Please re-run query with SMARTs without hydrogen."
                             )
-                    substruct_sql_str = " mol_is_substruct(ligand_rdmol, mol_from_smarts('{smarts}')) {logical_operator}".format(
-                        smarts=smarts, logical_operator=logical_operator
-                    )
+                    if screening:
+                        # exact match only for ligands whose pattern fingerprint contains that of the substructure
+                        substruct_sql_str = " (L.LigName IN (SELECT S.LigName FROM Ligand_screening S WHERE S.id IN (SELECT id FROM Ligand_pattern_fps WHERE id MATCH rdtree_subset(mol_pattern_bfp(mol_from_smarts('{smarts}'), {bits})))) AND mol_is_substruct(ligand_rdmol, mol_from_smarts('{smarts}'))) {logical_operator}".format(
+                            smarts=smarts,
+                            bits=self._pattern_fp_bits,
+                            logical_operator=logical_operator,
+                        )
+                    else:
+                        substruct_sql_str = " mol_is_substruct(ligand_rdmol, mol_from_smarts('{smarts}')) {logical_operator}".format(
+                            smarts=smarts, logical_operator=logical_operator
+                        )
                     sql_ligand_string += substruct_sql_str
         if sql_ligand_string.endswith("AND"):
             sql_ligand_string = sql_ligand_string.rstrip("AND")
@@ -3224,20 +6334,30 @@ class StorageManagerSQLite(StorageManager):
             StorageError
         """
         try:
+            self._clear_metadata_cache()
             self.conn = self._create_connection()
+            self.closed_connection = False
+            self._chemicalite_loaded = False
+            # existing bookmarks built on MOL functions need chemicalite to be read
+            if self._views_require_chemicalite():
+                self._load_chemicalite()
             signal(
                 SIGINT, self._sigint_handler
             )  # signal handler to catch keyboard interupts
             if self._db_empty() or self.overwrite:  # write and drop tables as necessary
-                if not self._db_empty():
-                    self._drop_existing_tables()
-                self._create_tables()
-                self._set_ringtail_db_schema_version(self._db_schema_ver)
+                self._initialize_storage()
 
             self.logger.info(f"Ringtail connected to database {self.db_file}.")
         except Exception as e:
             raise StorageError(f"Errow while creating or connecting to database: {e}.")
 
+    def _initialize_storage(self):
+        """Drops existing tables if the database is not empty, and creates the Ringtail tables"""
+        if not self._db_empty():
+            self._drop_existing_tables()
+        self._create_tables()
+        self._set_ringtail_db_schema_version(self._db_schema_ver)
+
     def check_storage_ready(
         self, run_mode: str, docking_mode: str, store_all_poses: bool, max_poses: int
     ):
@@ -3253,6 +6373,8 @@ class StorageManagerSQLite(StorageManager):
             StorageError
             OptionError: if database options are not compatible
         """
+        # results will be added, per-ligand best poses must be checked again before use
+        self._clear_metadata_cache("ligand_best")
         count = self.conn.execute("SELECT COUNT (*) FROM DB_properties").fetchone()[0]
 
         compatible = True
@@ -3308,6 +6430,146 @@ class StorageManagerSQLite(StorageManager):
             self.conn.backup(bck, pages=1)
         bck.close()
 
+    def copy_bookmark_to_db(self, bookmark_db_file: str):
+        """Copies the results in the current bookmark, with their ligands and interactions, into a database that
+        was created with the Ringtail tables. Only the rows of the bookmark are read, with INSERT ... SELECT into the
+        attached database. Receptors, database properties, interaction indices (which keep their ids, as interaction
+        fingerprints and bookmark queries refer to them) and bookmarks are copied in full, and other tables with
+        Pose_IDs (e.g. materialized bookmarks) for the poses of the bookmark. Tables derived from the results
+        are left empty, to be rebuilt in the new database.
+
+        Args:
+            bookmark_db_file (str): file of the database to copy the bookmark to
+
+        Raises:
+            StorageError
+        """
+        schema = "bookmark_db"
+        self._attach_db(bookmark_db_file, schema)
+        try:
+            cur = self.conn.cursor()
+            cur.execute("DROP TABLE IF EXISTS temp.export_pose_ids")
+            cur.execute(
+                "CREATE TEMP TABLE export_pose_ids (Pose_ID INTEGER PRIMARY KEY)"
+            )
+            cur.execute(
+                f"INSERT OR IGNORE INTO temp.export_pose_ids SELECT Pose_ID FROM {self.bookmark_name}"
+            )
+            export_pose_ids = "SELECT Pose_ID FROM temp.export_pose_ids"
+            row_selections = {
+                "Results": f"Pose_ID IN ({export_pose_ids})",
+                "Ligands": f"LigName IN (SELECT LigName FROM {schema}.Results)",
+                "Interactions": f"Pose_ID IN ({export_pose_ids})",
+            }
+            main_tables = dict(
+                cur.execute(
+                    "SELECT name, sql FROM main.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\' ORDER BY rootpage"
+                ).fetchall()
+            )
+            # virtual tables (e.g. the rdtree of Ligand_pattern_fps) and their shadow tables are not copied,
+            # they are created again by the module when the derived tables are rebuilt
+            virtual_tables = [
+                table
+                for table, sql in main_tables.items()
+                if sql.upper().startswith("CREATE VIRTUAL")
+            ]
+            skipped_tables = set(self._export_rebuilt_tables) | {
+                table
+                for table in main_tables
+                if any(
+                    table == vtab or table.startswith(vtab + "_")
+                    for vtab in virtual_tables
+                )
+            }
+            copied_tables = [
+                table
+                for table in ["Results", "Ligands", "Interactions"]
+                if table in main_tables
+            ] + [
+                table
+                for table in main_tables
+                if table not in row_selections and table not in skipped_tables
+            ]
+            for table in copied_tables:
+                existing_columns = [
+                    row[1]
+                    for row in cur.execute(f"PRAGMA {schema}.table_info({table})")
+                ]
+                if not existing_columns:
+                    cur.execute(self._sql_in_schema(main_tables[table], schema))
+                    existing_columns = [
+                        row[1]
+                        for row in cur.execute(f"PRAGMA {schema}.table_info({table})")
+                    ]
+                main_columns = {
+                    row[1].lower(): row[1]
+                    for row in cur.execute(f"PRAGMA main.table_info({table})")
+                }
+                columns = ", ".join(
+                    f'"{column}"'
+                    for column in existing_columns
+                    if column.lower() in main_columns
+                )
+                selection = row_selections.get(table)
+                if selection is None and "pose_id" in main_columns:
+                    selection = f'"{main_columns["pose_id"]}" IN ({export_pose_ids})'
+                where_str = f" WHERE {selection}" if selection is not None else ""
+                cur.execute(
+                    f"INSERT INTO {schema}.{table} ({columns}) SELECT {columns} FROM main.{table}{where_str}"
+                )
+            # new rows get ids after those of the original database
+            cur.execute(
+                f"DELETE FROM {schema}.sqlite_sequence WHERE name IN (SELECT name FROM main.sqlite_sequence)"
+            )
+            cur.execute(
+                f"INSERT INTO {schema}.sqlite_sequence SELECT * FROM main.sqlite_sequence"
+            )
+            # indices (created after the rows are inserted) and views
+            existing_objects = [
+                row[0]
+                for row in cur.execute(f"SELECT name FROM {schema}.sqlite_master")
+            ]
+            for name, object_type, table, sql in cur.execute(
+                "SELECT name, type, tbl_name, sql FROM main.sqlite_master WHERE type IN ('index', 'view') AND sql IS NOT NULL ORDER BY type, rowid"
+            ).fetchall():
+                if name in existing_objects or table in skipped_tables:
+                    continue
+                try:
+                    cur.execute(self._sql_in_schema(sql, schema))
+                except sqlite3.OperationalError as e:
+                    self.logger.warning(
+                        f"Could not copy {object_type} {name} to {bookmark_db_file}: {e}"
+                    )
+            self.conn.commit()
+            cur.execute("DROP TABLE temp.export_pose_ids")
+            cur.close()
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            raise StorageError(
+                f"Error occured while copying bookmark {self.bookmark_name} to {bookmark_db_file}"
+            ) from e
+        finally:
+            self._detach_db(schema)
+
+    @staticmethod
+    def _sql_in_schema(sql: str, schema: str) -> str:
+        """Qualifies the name of the table, index or view created by a CREATE statement from sqlite_master with a schema
+
+        Args:
+            sql (str): CREATE statement
+            schema (str): name of the attached database
+
+        Returns:
+            str: CREATE statement for the object in the attached database
+        """
+        return re.sub(
+            r"^(CREATE\s+(?:UNIQUE\s+|VIRTUAL\s+)?(?:TABLE|INDEX|VIEW)\s+(?:IF\s+NOT\s+EXISTS\s+)?)",
+            rf"\g<1>{schema}.",
+            sql,
+            count=1,
+            flags=re.IGNORECASE,
+        )
+
     def _set_ringtail_db_schema_version(self, db_version: str = "2.0.0"):
         """Will check current stoarge manager db schema version and only set if it is compatible with the code base version (i.e., version(ringtail)).
 
@@ -3323,6 +6585,7 @@ class StorageManagerSQLite(StorageManager):
             cur.execute(f"PRAGMA user_version = {rtdb_version}")
             self.conn.commit()
             cur.close()
+            self._metadata_cache["db_version"] = rtdb_version
             self.logger.info("Database version set to {0}".format(rtdb_version))
         else:
             raise StorageError(
@@ -3337,8 +6600,13 @@ class StorageManagerSQLite(StorageManager):
             bool: whether or not db is compatible with the code base
             str: current database version
         """
-        cur = self.conn.cursor()
-        db_version = str(cur.execute("PRAGMA user_version").fetchone()[0])
+        if "db_version" not in self._metadata_cache:
+            cur = self.conn.cursor()
+            self._metadata_cache["db_version"] = str(
+                cur.execute("PRAGMA user_version").fetchone()[0]
+            )
+            cur.close()
+        db_version = self._metadata_cache["db_version"]
         db_schema_ver = ".".join([*db_version])
         if version("ringtail") in self._db_schema_code_compatibility[db_schema_ver]:
             is_compatible = True
@@ -3354,7 +6622,6 @@ class StorageManagerSQLite(StorageManager):
                     db_schema_ver, version("ringtail")
                 )
             )
-        cur.close()
         return is_compatible, db_version
 
     def update_database_version(self, new_version, consent=False):
@@ -3391,6 +6658,7 @@ class StorageManagerSQLite(StorageManager):
             cur.execute(f"DROP VIEW IF EXISTS {v[0]}")
         # delete all rows in bookmarks table
         cur.execute("DELETE FROM Bookmarks")
+        self._clear_metadata_cache("bookmark_names")
 
         # if current version is 1.0.0
         if self.check_ringtaildb_version()[1] == "1.0.0":
@@ -3418,6 +6686,14 @@ class StorageManagerSQLite(StorageManager):
         elif new_version == "2.0.0":
             # major table updates and sets db version inside method
             self._update_db_110_to_200()
+            self._create_ligand_best_table()
+            self._update_ligand_best_table(full_rebuild=True)
+            self._create_ligand_screening_tables()
+            self._update_ligand_screening_tables()
+            self._create_interaction_bitmap_table()
+            self._update_interaction_bitmaps(full_rebuild=True)
+        # tables and bookmarks have changed, cached metadata is stale
+        self._clear_metadata_cache()
 
         return consent
 
@@ -3486,15 +6762,6 @@ class StorageManagerSQLite(StorageManager):
         """
         try:
             con = sqlite3.connect(self.db_file)
-            try:
-                con.enable_load_extension(True)
-                con.load_extension("chemicalite")
-                con.enable_load_extension(False)
-            except sqlite3.OperationalError as e:
-                self.logger.critical(
-                    "Failed to load chemicalite cartridge. Please ensure chemicalite is installed with `conda install -c conda-forge chemicalite`."
-                )
-                raise e
             cursor = con.execute("PRAGMA synchronous = OFF;")
             cursor.execute("PRAGMA journal_mode = MEMORY;")
             con.commit()
@@ -3505,6 +6772,60 @@ class StorageManagerSQLite(StorageManager):
             ) from e
         return con
 
+    def _load_chemicalite(self):
+        """Loads the chemicalite extension into the open connection. The extension is only
+        loaded once per connection, and only when a query needs MOL functions.
+
+        Raises:
+            DatabaseConnectionError
+        """
+        if self._chemicalite_loaded:
+            return
+        try:
+            self.conn.enable_load_extension(True)
+            self.conn.load_extension("chemicalite")
+            self.conn.enable_load_extension(False)
+        except (sqlite3.OperationalError, AttributeError) as e:
+            self.logger.critical(
+                "Failed to load chemicalite cartridge. Please ensure chemicalite is installed with `conda install -c conda-forge chemicalite`."
+            )
+            raise DatabaseConnectionError(
+                "Error while loading the chemicalite extension"
+            ) from e
+        self._chemicalite_loaded = True
+        self.logger.debug("Loaded chemicalite extension.")
+
+    def _load_chemicalite_if_needed(self, query: str):
+        """Loads chemicalite if given query calls any chemicalite MOL functions
+
+        Args:
+            query (str): SQLite query about to be executed
+        """
+        if not self._chemicalite_loaded and self._chemicalite_function_pattern.search(
+            query
+        ):
+            self._load_chemicalite()
+
+    def _views_require_chemicalite(self, schema: str = "main") -> bool:
+        """Checks if any views in the given database schema are built on chemicalite MOL functions
+
+        Args:
+            schema (str, optional): name of (attached) database schema to check
+
+        Returns:
+            bool: True if reading from any of the views requires chemicalite
+        """
+        cur = self.conn.execute(
+            f"SELECT sql FROM {schema}.sqlite_master WHERE type = 'view'"
+        )
+        needs_chemicalite = any(
+            self._chemicalite_function_pattern.search(view_sql)
+            for (view_sql,) in cur.fetchall()
+            if view_sql is not None
+        )
+        cur.close()
+        return needs_chemicalite
+
     def _close_connection(self):
         """Closes connection to database"""
         self.logger.info("Closing database")
@@ -3565,6 +6886,8 @@ class StorageManagerSQLite(StorageManager):
             cur.close()
         except sqlite3.OperationalError as e:
             raise StorageError(f"Error occurred while attaching {new_db}") from e
+        if self._views_require_chemicalite(new_db_name):
+            self._load_chemicalite()
 
     def _detach_db(self, new_db_name):
         """Detaches new database file from current database
@@ -3596,6 +6919,16 @@ class StorageManagerSQLite(StorageManager):
         # fetch existing tables
         cur = self.conn.cursor()
         tables = self._fetch_existing_table_names()
+        # the rdtree virtual table needs chemicalite to be dropped, and drops its own shadow tables
+        if ("Ligand_pattern_fps",) in tables:
+            try:
+                self._load_chemicalite()
+                cur.execute("DROP TABLE Ligand_pattern_fps")
+            except sqlite3.OperationalError as e:
+                raise StorageError(
+                    "Error occurred while dropping table Ligand_pattern_fps"
+                ) from e
+            tables = self._fetch_existing_table_names()
 
         # drop tables
         for table in tables:
@@ -3609,6 +6942,7 @@ class StorageManagerSQLite(StorageManager):
                     "Error occurred while dropping table {0}".format(table[0])
                 ) from e
         cur.close()
+        self._clear_metadata_cache()
 
     def _fetch_existing_table_names(self):
         """Returns list of all tables in database
@@ -3629,6 +6963,137 @@ class StorageManagerSQLite(StorageManager):
                 "Error while getting names of existing database tables"
             ) from e
 
+    def suggest_indices(self, filters_dict: dict, create: bool = False) -> list:
+        """Suggests single-column indices on Results for the numerical filters and result ordering.
+        The composite index ak_results is led by LigName, so it cannot serve range filters on other columns.
+
+        Args:
+            filters_dict (dict): filters as in ringtail.Filters().todict()
+            create (bool, optional): create the suggested indices
+
+        Returns:
+            list: SQLite statements creating the suggested indices
+
+        Raises:
+            StorageError
+        """
+        filter_columns = {
+            "eworst": "docking_score",
+            "ebest": "docking_score",
+            "score_percentile": "docking_score",
+            "leworst": "leff",
+            "lebest": "leff",
+            "le_percentile": "leff",
+            "hb_count": "num_hb",
+        }
+        columns = {
+            column
+            for key, column in filter_columns.items()
+            if filters_dict.get(key) is not None
+        }
+        if self.order_results:
+            columns.add(self.field_to_column_name[self.order_results])
+        try:
+            indexed_columns = self._leading_index_columns()
+            suggested_indices = [
+                f"CREATE INDEX IF NOT EXISTS ak_results_{column} ON Results({column})"
+                for column in self._advisable_index_columns
+                if column in columns and column not in indexed_columns
+            ]
+            if create and suggested_indices:
+                for index_query in suggested_indices:
+                    self.conn.execute(index_query)
+                self.conn.commit()
+                self.logger.info(
+                    f"Created {len(suggested_indices)} indices on Results: "
+                    + "; ".join(suggested_indices)
+                )
+        except sqlite3.OperationalError as e:
+            raise StorageError("Error while creating suggested indices") from e
+        return suggested_indices
+
+    def _leading_index_columns(self) -> set:
+        """Columns of Results that lead an index, which can serve range filters and ordering on the column
+
+        Returns:
+            set: of column names
+        """
+        indexed_columns = set()
+        for index in self.conn.execute("PRAGMA index_list(Results)").fetchall():
+            index_info = self.conn.execute(f"PRAGMA index_info({index[1]})").fetchall()
+            indexed_columns.update(info[2] for info in index_info if info[0] == 0)
+        return indexed_columns
+
+    def _create_ranking_index(self):
+        """Creates an index on Results for the ranking column, if no index is led by it, so that poses can be read
+        in ranking order from the index instead of sorting all passing poses. Databases that cannot be written
+        to are filtered without the index.
+        """
+        column = self._ranking_column()
+        try:
+            if column in self._leading_index_columns():
+                return
+            self.conn.execute(
+                f"CREATE INDEX IF NOT EXISTS ak_results_{column} ON Results({column})"
+            )
+            self.conn.commit()
+            self.logger.info(f"Created index ak_results_{column} on Results for top_k.")
+        except sqlite3.OperationalError as e:
+            self.logger.warning(
+                f"Could not create index on Results({column}) for top_k, all passing poses will be sorted: {e}"
+            )
+
+    def _record_query_profile(
+        self, stage: str, query: str, time_s: float, num_rows: int | None
+    ):
+        """Adds query, its query plan, number of rows returned and time to the profile of the current filtering,
+        if self.profile_queries
+
+        Args:
+            stage (str): description of filtering stage
+            query (str): SQLite query that was run
+            time_s (float): time in seconds to run the query
+            num_rows (int): number of rows returned by query
+        """
+        if not self.profile_queries:
+            return
+        try:
+            # the detail of each step of the plan is the last column
+            query_plan = [
+                row[-1]
+                for row in self.conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+            ]
+        except sqlite3.OperationalError as e:
+            query_plan = [f"Could not explain query: {e}"]
+        self.query_profile.append(
+            {
+                "stage": stage,
+                "query": query,
+                "query_plan": query_plan,
+                "rows": num_rows,
+                "time": time_s,
+            }
+        )
+        self.logger.info(
+            f"Query profile, {stage}: {num_rows} rows in {time_s:.3f} seconds\n"
+            + f"Query: {query}\nQuery plan:\n  "
+            + "\n  ".join(query_plan)
+        )
+
+    def _profile_partial_query(self, stage: str, query: str):
+        """Runs and profiles part of a filtering query on its own, if self.profile_queries
+
+        Args:
+            stage (str): description of filtering stage
+            query (str): SQLite partial query
+        """
+        if not self.profile_queries or not query:
+            return
+        self._load_chemicalite_if_needed(query)
+        time0 = time.perf_counter()
+        num_rows = self.conn.execute(f"SELECT COUNT(*) FROM ({query})").fetchone()[0]
+        self._record_query_profile(stage, query, time.perf_counter() - time0, num_rows)
+
     def _run_query(self, query):
         """Executes provided SQLite query. Returns cursor for results.
             Since cursor remains open, added to list of open cursors
@@ -3639,6 +7104,7 @@ class StorageManagerSQLite(StorageManager):
         Returns:
             SQLite cursor: Contains results of query
         """
+        self._load_chemicalite_if_needed(query)
         try:
             cur = self.conn.cursor()
             cur.execute(query)
@@ -8,6 +8,8 @@ import sqlite3
 import os
 import json
 import pytest
+import types
+import numpy as np
 
 
 @pytest.fixture
@@ -144,6 +146,62 @@ class TestRingtailCore:
         assert "enumerated_bookmark_0" in bookmarks
         assert "enumerated_bookmark_union" in bookmarks
 
+    def test_interaction_combinations_single_pass(self):
+        rtc = RingtailCore(db_file="output.db")
+        interactions = {
+            "hb_interactions": [("A:VAL:279:", True), ("A:LYS:162:", True)],
+            "vdw_interactions": [("A:VAL:279:", True), ("A:LYS:162:", True)],
+        }
+        rtc.filter(
+            eworst=-6,
+            max_miss=1,
+            enumerate_interaction_combs=True,
+            bookmark_name="single_pass",
+            **interactions,
+        )
+        # the combination with all interactions is the last one
+        count_all_interactions = rtc.filter(
+            eworst=-6, bookmark_name="all_interactions", **interactions
+        )
+        with rtc.storageman:
+            cur = rtc.storageman.conn.cursor()
+            count_combination = cur.execute(
+                "SELECT COUNT(DISTINCT LigName) FROM single_pass_4"
+            ).fetchone()[0]
+            count_union = cur.execute(
+                "SELECT COUNT(DISTINCT LigName) FROM single_pass_union"
+            ).fetchone()[0]
+            cur.close()
+        assert count_combination == count_all_interactions
+        assert count_union == 33
+
+    def test_interaction_combinations_keep_earlier_bookmarks(self):
+        rtc = RingtailCore(db_file="output.db")
+        rtc.filter(
+            eworst=-6,
+            hb_interactions=[("A:VAL:279:", True), ("A:LYS:162:", True)],
+            vdw_interactions=[("A:VAL:279:", True), ("A:LYS:162:", True)],
+            max_miss=1,
+            enumerate_interaction_combs=True,
+            bookmark_name="rerun_combs",
+        )
+        conn = sqlite3.connect("output.db")
+        cur = conn.cursor()
+        query = "SELECT Pose_ID FROM rerun_combs_4 ORDER BY Pose_ID"
+        first_poses = cur.execute(query).fetchall()
+        # filtering again under the same name writes new bitsets, the combination not written again keeps its own
+        rtc.filter(
+            eworst=-6,
+            hb_interactions=[("A:VAL:279:", True), ("A:LYS:162:", True)],
+            vdw_interactions=[("A:LYS:162:", False)],
+            max_miss=1,
+            enumerate_interaction_combs=True,
+            bookmark_name="rerun_combs",
+        )
+        assert cur.execute(query).fetchall() == first_poses
+        cur.close()
+        conn.close()
+
     def test_ligand_filters(self):
         rtc = RingtailCore(db_file="output.db")
 
@@ -169,6 +227,22 @@ class TestRingtailCore:
         )
         assert count_ligands_passing == 12
 
+    def test_ligand_substruct_pos_parallel(self, monkeypatch):
+        from ringtail.storagemanager import StorageManagerSQLite
+
+        # evaluate substructure positions in a process pool regardless of number of poses
+        monkeypatch.setattr(
+            StorageManagerSQLite, "_substruct_pos_parallel_min_poses", 0
+        )
+        rtc = RingtailCore(db_file="output.db")
+        count_ligands_passing = rtc.filter(
+            ligand_substruct_pos=[
+                ["[C][Oh]", 1, 10, 102, 106, 154],
+                ["C=O", 1, 10, 102, 106, 154],
+            ]
+        )
+        assert count_ligands_passing == 12
+
     def test_all_filters(self):
         rtc = RingtailCore(db_file="output.db")
         count_ligands_passing = rtc.filter(
@@ -219,6 +293,59 @@ class TestRingtailCore:
 
         assert number_similar == 8
 
+    def test_search_similar_ligands(self):
+        rtc = RingtailCore(db_file="output.db")
+        ligand_name = "287065"
+        similar_ligands = rtc.search_similar_ligands(
+            ligand_name, num_neighbors=5, similarity_cutoff=0.2
+        )
+
+        assert similar_ligands[0] == (ligand_name, 1.0)
+        assert len(similar_ligands) <= 5
+        similarities = [similarity for _, similarity in similar_ligands]
+        assert similarities == sorted(similarities, reverse=True)
+        assert min(similarities) >= 0.2
+        # the bookmark holds the best pose of each similar ligand
+        with rtc.storageman:
+            bookmark_ligands = [
+                row[0]
+                for row in rtc.storageman.conn.execute(
+                    f"SELECT LigName FROM similar_{ligand_name}"
+                )
+            ]
+        assert sorted(bookmark_ligands) == sorted(
+            ligname for ligname, _ in similar_ligands
+        )
+
+    def test_search_similar_poses(self):
+        rtc = RingtailCore(db_file="output.db")
+        with rtc.storageman:
+            reference = rtc.storageman.conn.execute(
+                "SELECT Pose_ID FROM Interactions GROUP BY Pose_ID ORDER BY COUNT(*) DESC LIMIT 1"
+            ).fetchone()[0]
+            reference_interactions = [
+                ":".join(row)
+                for row in rtc.storageman.conn.execute(
+                    "SELECT interaction_type, rec_chain, rec_resname, rec_resid, rec_atom FROM Interaction_indices WHERE interaction_id IN (SELECT interaction_id FROM Interactions WHERE Pose_ID = ?)",
+                    (reference,),
+                )
+            ]
+        similar_poses = rtc.search_similar_poses(reference, num_poses=5)
+
+        assert 0 < len(similar_poses) <= 5
+        assert reference not in [pose_id for pose_id, _, _ in similar_poses]
+        similarities = [similarity for _, _, similarity in similar_poses]
+        assert similarities == sorted(similarities, reverse=True)
+        assert 0 < min(similarities) and max(similarities) <= 1
+
+        # fraction of the reference interactions each pose has
+        similar_poses = rtc.search_similar_poses(
+            reference_interactions, num_poses=5, metric="tversky"
+        )
+        similarities = [similarity for _, _, similarity in similar_poses]
+        assert similarities == sorted(similarities, reverse=True)
+        assert 0 < min(similarities) and max(similarities) <= 1
+
     def test_create_rdkitmol(self):
         bookmark_name = "rdkit_test"
         rtc = RingtailCore(db_file="output.db")
@@ -229,6 +356,31 @@ class TestRingtailCore:
         num_of_atoms = rdkit_dict["14303"]["ligand"].GetNumAtoms()
         assert num_of_atoms == 10
 
+    def test_create_rdkitmol_parallel(self, monkeypatch):
+        bookmark_name = "rdkit_test"
+        rtc = RingtailCore(db_file="output.db")
+        rtc.filter(ebest=-3, bookmark_name=bookmark_name)
+        serial_dict = rtc.ligands_rdkit_mol(
+            bookmark_name=bookmark_name, write_nonpassing=True
+        )
+        # build the mols in chunks of 3 ligands in a process pool
+        monkeypatch.setattr(RingtailCore, "_mol_parallel_min_ligands", 1)
+        monkeypatch.setattr(RingtailCore, "_mol_chunk_size", 3)
+        monkeypatch.setattr("multiprocess.cpu_count", lambda: 2)
+        parallel_dict = rtc.ligands_rdkit_mol(
+            bookmark_name=bookmark_name, write_nonpassing=True
+        )
+
+        assert list(parallel_dict) == list(serial_dict)
+        for ligname, info in serial_dict.items():
+            assert parallel_dict[ligname]["properties"] == info["properties"]
+            parallel_mol = parallel_dict[ligname]["ligand"]
+            assert parallel_mol.GetNumConformers() == info["ligand"].GetNumConformers()
+            for conf, parallel_conf in zip(
+                info["ligand"].GetConformers(), parallel_mol.GetConformers()
+            ):
+                assert (conf.GetPositions() == parallel_conf.GetPositions()).all()
+
     def test_write_sdfs(self):
         sdf_path = "sdf_files"
         rtc = RingtailCore(db_file="output.db")
@@ -262,6 +414,33 @@ class TestRingtailCore:
             os.remove(sdf_path + "/" + f)
         os.rmdir(sdf_path)
 
+    def test_write_sdfs_compressed(self, monkeypatch):
+        import gzip
+        import shutil
+
+        sdf_path = "sdf_files"
+        rtc = RingtailCore(db_file="output.db")
+        rtc.filter(eworst=-7)
+        rtc.write_molecule_sdfs(sdf_path)
+        # stream the molecules in chunks of 3 ligands to a compressed file
+        monkeypatch.setattr(RingtailCore, "_mol_chunk_size", 3)
+        rtc.write_molecule_sdfs(sdf_path, compress=True)
+        with open(sdf_path + "/output_passing_results.sdf") as sdf:
+            expected_sdf = sdf.read()
+        with gzip.open(sdf_path + "/output_passing_results.sdf.gz", "rt") as sdf:
+            assert sdf.read() == expected_sdf
+
+        # one compressed file per ligand written by worker processes
+        monkeypatch.setattr(RingtailCore, "_mol_parallel_min_ligands", 1)
+        monkeypatch.setattr("multiprocess.cpu_count", lambda: 2)
+        rtc.write_molecule_sdfs(sdf_path + "/ligands", all_in_one=False, compress=True)
+        ligand_sdfs = os.listdir(sdf_path + "/ligands")
+        assert len(ligand_sdfs) == 7
+        assert all(f.endswith(".sdf.gz") for f in ligand_sdfs)
+        with gzip.open(sdf_path + "/ligands/136065.sdf.gz", "rt") as sdf:
+            assert sdf.read() in expected_sdf
+        shutil.rmtree(sdf_path)
+
     def test_pymol(self):
         # will not add a test for now, as I cannot figure out an unambiguous, lightweight way to test
         pass
@@ -274,6 +453,47 @@ class TestRingtailCore:
         assert os.path.exists("Ligands.csv")
         os.system("rm Ligands.csv")
 
+    def test_export_csv_chunks(self, monkeypatch):
+        import pandas as pd
+        from ringtail import StorageManagerSQLite
+
+        rtc = RingtailCore(db_file="output.db")
+        rtc.filter(eworst=-7)
+        with rtc.storageman:
+            expected_df = rtc.storageman.to_dataframe("Results", table=True)
+        expected_df.to_csv("expected.csv")
+        # stream the rows in chunks of 4
+        monkeypatch.setattr(StorageManagerSQLite, "_fetch_batch_size", 4)
+        rtc.export_csv("Results", "Results.csv", True)
+        with open("Results.csv") as f, open("expected.csv") as expected:
+            assert f.read() == expected.read()
+
+        rtc.export_csv(
+            "SELECT * FROM Results", "query.csv", columns=["LigName", "docking_score"]
+        )
+        df = pd.read_csv("query.csv", index_col=0)
+        assert list(df.columns) == ["LigName", "docking_score"]
+        assert len(df) == len(expected_df)
+        os.system("rm Results.csv expected.csv query.csv")
+
+    def test_export_parquet(self):
+        pq = pytest.importorskip("pyarrow.parquet")
+
+        rtc = RingtailCore(db_file="output.db")
+        rtc.filter(eworst=-7)
+        rtc.export_parquet(
+            "passing_results",
+            "passing_results.parquet",
+            table=True,
+            columns=["LigName", "docking_score"],
+            row_group_size=3,
+        )
+        parquet_file = pq.ParquetFile("passing_results.parquet")
+        assert parquet_file.schema_arrow.names == ["LigName", "docking_score"]
+        assert parquet_file.metadata.num_rows == 7
+        assert parquet_file.num_row_groups == 3
+        os.system("rm passing_results.parquet")
+
     def test_export_receptor(self, dbquery):
         rtc = RingtailCore(db_file="output.db")
         rtc.export_receptors()
@@ -436,6 +656,66 @@ class TestRingtailCore:
 
         os.system("rm " + bookmark_db_name)
 
+    def test_export_bookmark_db_contents(self):
+        rtc = RingtailCore(db_file="output.db")
+        rtc.filter(eworst=-6, bookmark_name="export_test")
+        bookmark_db_name = rtc.export_bookmark_db()
+
+        queries = {
+            "poses": "SELECT Pose_ID FROM export_test ORDER BY Pose_ID",
+            "ligands": "SELECT LigName FROM Ligands WHERE LigName IN (SELECT LigName FROM export_test) ORDER BY LigName",
+            "interactions": "SELECT Pose_ID, interaction_id FROM Interactions WHERE Pose_ID IN (SELECT Pose_ID FROM export_test) ORDER BY Pose_ID, interaction_id",
+            "interaction_indices": "SELECT * FROM Interaction_indices ORDER BY interaction_id",
+            "receptors": "SELECT RecName FROM Receptors",
+            "version": "PRAGMA user_version",
+        }
+        data = {}
+        for db in ["output.db", bookmark_db_name]:
+            conn = sqlite3.connect(db)
+            data[db] = {
+                key: conn.execute(query).fetchall() for key, query in queries.items()
+            }
+            data[db]["num_results"] = conn.execute(
+                "SELECT COUNT(*) FROM Results"
+            ).fetchone()[0]
+            conn.close()
+
+        # only the results of the bookmark are copied
+        assert data[bookmark_db_name]["num_results"] == len(data["output.db"]["poses"])
+        for key in queries:
+            assert data[bookmark_db_name][key] == data["output.db"][key]
+
+        os.system("rm " + bookmark_db_name)
+
+    def test_export_bookmark_db_screening_tables(self):
+        os.system("rm output.db output_log.txt")
+        rtc = RingtailCore(db_file="output.db")
+        rtc.add_results_from_files(file_path="test_data/adgpu/group1")
+        conn = sqlite3.connect("output.db")
+        assert conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'Ligand_pattern_fps'"
+        ).fetchone() == (1,)
+        conn.close()
+        rtc.filter(eworst=-6, bookmark_name="export_test")
+        bookmark_db_name = rtc.export_bookmark_db()
+
+        # the virtual pattern fingerprint table is rebuilt for the exported ligands
+        export_rtc = RingtailCore(db_file=bookmark_db_name)
+        count_export = export_rtc.filter(ligand_substruct=["C=O"])
+        count_source = rtc.filter(
+            ligand_substruct=["C=O"],
+            filter_bookmark="export_test",
+            bookmark_name="export_substruct",
+        )
+        assert count_export == count_source
+        with export_rtc.storageman:
+            num_ligands, num_fps = export_rtc.storageman._run_query(
+                "SELECT (SELECT COUNT(*) FROM Ligands), (SELECT COUNT(*) FROM Ligand_screening)"
+            ).fetchone()
+        assert num_fps == num_ligands
+
+        os.system("rm " + bookmark_db_name)
+
     def test_duplicate_handling(self, countrows):
         os.system("rm output.db output_log.txt")
 
@@ -632,6 +912,42 @@ class TestStorageMan:
             "10%_leff": -0.444,
         }
 
+    def test_ligand_best_table(self, countrows):
+        num_ligands = countrows("SELECT COUNT(*) FROM Ligands")
+        assert countrows("SELECT COUNT(*) FROM Ligand_best") == num_ligands
+        assert countrows("SELECT SUM(num_poses) FROM Ligand_best") == countrows(
+            "SELECT COUNT(*) FROM Results"
+        )
+        # stored pose is the one with the lowest docking score of each ligand
+        mismatches = countrows(
+            "SELECT COUNT(*) FROM Ligand_best B JOIN (SELECT LigName, MIN(docking_score) AS score FROM Results GROUP BY LigName) M ON B.LigName = M.LigName WHERE B.docking_score != M.score"
+        )
+        assert mismatches == 0
+        # best ligand efficiency is taken over all poses of each ligand
+        mismatches = countrows(
+            "SELECT COUNT(*) FROM Ligand_best B JOIN (SELECT LigName, MIN(leff) AS leff FROM Results GROUP BY LigName) M ON B.LigName = M.LigName WHERE B.best_leff != M.leff"
+        )
+        assert mismatches == 0
+
+    def test_ligand_screening_tables(self, countrows):
+        num_ligands = countrows("SELECT COUNT(*) FROM Ligands")
+        assert countrows("SELECT COUNT(*) FROM Ligand_screening") == num_ligands
+        assert (
+            countrows(
+                "SELECT COUNT(*) FROM Ligand_screening WHERE num_heavy_atoms IS NULL"
+            )
+            == 0
+        )
+        rtc = RingtailCore("output.db")
+        # screened filters give the same ligands as matching every ligand
+        count_screened = rtc.filter(ligand_substruct=["C=O"], ligand_max_atoms=20)
+        with rtc.storageman:
+            rtc.storageman._metadata_cache["ligand_screening"] = False
+            count_unscreened = rtc.storageman._run_query(
+                f"SELECT COUNT(*) FROM ({rtc.storageman._generate_ligand_filtering_query({'ligand_substruct': ['C=O'], 'ligand_max_atoms': 20, 'ligand_operator': 'OR'})})"
+            ).fetchone()[0]
+        assert count_screened == count_unscreened
+
     def test_bookmark_info(self, dbquery):
         rtc = RingtailCore("output.db")
         rtc.add_results_from_files(
@@ -668,6 +984,416 @@ class TestStorageMan:
         }
         assert bookmark_filters_db_str == json.dumps(filters)
 
+    def test_persistent_session(self):
+        rtc = RingtailCore("output.db")
+        with rtc:
+            conn = rtc.storageman.conn
+            assert "passing_results" in rtc.get_bookmark_names()
+            with rtc.storageman:
+                rtc.storageman.create_bookmark(
+                    "session_bookmark", "SELECT Pose_ID FROM Results"
+                )
+            # cached bookmark names are refreshed when bookmarks change
+            assert "session_bookmark" in rtc.get_bookmark_names()
+            rtc.drop_bookmark("session_bookmark")
+            assert "session_bookmark" not in rtc.get_bookmark_names()
+            # same connection is reused for the whole session
+            assert rtc.storageman.conn is conn
+        assert rtc.storageman.closed_connection
+
+    def test_query_profile(self):
+        rtc = RingtailCore("output.db")
+        rtc.filter(leworst=-0.4, order_results="e", profile_queries=True)
+        profile = rtc.get_query_profile()
+        assert profile[-1]["stage"] == "filtering"
+        assert profile[-1]["rows"] > 0
+        assert profile[-1]["query_plan"]
+
+        suggested = rtc.suggest_indices(create=True)
+        assert any("Results(leff)" in index for index in suggested)
+        assert rtc.suggest_indices() == []
+
+    def test_filter_cache(self):
+        rtc = RingtailCore("output.db")
+        filters = {
+            "score_percentile": 50,
+            "hb_interactions": [("A:VAL:279:", True)],
+            "bookmark_name": "cached_bm",
+            "cache_filters": True,
+        }
+        count_filtered = rtc.filter(**filters)
+        count_cached = rtc.filter(**filters)
+        assert count_cached == count_filtered
+
+        conn = sqlite3.connect("output.db")
+        cur = conn.cursor()
+        # one entry for the filters, one for the percentile cutoff
+        num_entries = cur.execute("SELECT COUNT(*) FROM Filter_cache").fetchone()[0]
+        num_poses = cur.execute("SELECT COUNT(*) FROM Filter_cache_poses").fetchone()[0]
+        cur.close()
+        conn.close()
+        assert num_entries == 2
+        assert num_poses == count_filtered
+
+    def test_cluster_cache(self):
+        rtc = RingtailCore("output.db")
+        # the same poses, filtered with different filters
+        for bookmark_name, ebest in [("cluster_cached", None), ("cluster_hit", -100)]:
+            rtc.filter(
+                eworst=-6,
+                ebest=ebest,
+                interaction_cluster=0.5,
+                cache_filters=True,
+                bookmark_name=bookmark_name,
+            )
+        # poses contained in the clustered ones, reclustered from cached neighbor pairs
+        count_subset = rtc.filter(
+            eworst=-7,
+            interaction_cluster=0.5,
+            cache_filters=True,
+            bookmark_name="cluster_subset",
+        )
+        count_uncached = rtc.filter(
+            eworst=-7,
+            interaction_cluster=0.5,
+            cache_filters=False,
+            bookmark_name="cluster_uncached",
+        )
+        assert count_subset == count_uncached
+
+        conn = sqlite3.connect("output.db")
+        cur = conn.cursor()
+        num_entries = cur.execute("SELECT COUNT(*) FROM Cluster_cache").fetchone()[0]
+        clusters = {}
+        for bookmark_name in [
+            "cluster_cached",
+            "cluster_hit",
+            "cluster_subset",
+            "cluster_uncached",
+        ]:
+            rows = cur.execute(
+                f"SELECT pose_id, {bookmark_name}_ifp_0p5 FROM Ligand_clusters WHERE {bookmark_name}_ifp_0p5 IS NOT NULL"
+            ).fetchall()
+            clusters[bookmark_name] = sorted(
+                sorted(pose_id for pose_id, cluster in rows if cluster == cluster_id)
+                for cluster_id in {cluster for _, cluster in rows}
+            )
+        cur.close()
+        conn.close()
+        assert num_entries == 2
+        assert clusters["cluster_hit"] == clusters["cluster_cached"]
+        assert clusters["cluster_subset"] == clusters["cluster_uncached"]
+
+    def test_filter_return_iter(self):
+        rtc = RingtailCore("output.db")
+        count_filtered = rtc.filter(eworst=-6)
+        filtered_results = rtc.filter(eworst=-6, return_iter=True)
+        assert isinstance(filtered_results, types.GeneratorType)
+        assert len(list(filtered_results)) == count_filtered
+        # the session opened for the stream is closed once it is consumed
+        assert not rtc.storageman.session_active
+
+    def test_top_k(self):
+        from ringtail import exceptions as e
+
+        rtc = RingtailCore("output.db")
+        rtc.filter(eworst=-6, output_all_poses=True, bookmark_name="all_bm")
+        count_top = rtc.filter(
+            eworst=-6, output_all_poses=True, top_k=3, bookmark_name="top_bm"
+        )
+        assert count_top == 3
+
+        conn = sqlite3.connect("output.db")
+        cur = conn.cursor()
+        scores_all = [row[0] for row in cur.execute("SELECT docking_score FROM all_bm")]
+        scores_top = [row[0] for row in cur.execute("SELECT docking_score FROM top_bm")]
+        cur.close()
+        conn.close()
+        assert scores_top == sorted(scores_all)[:3]
+
+        # the ranking column is indexed when missing, so poses are read in ranking order without sorting
+        conn = sqlite3.connect("output.db")
+        conn.execute("DROP INDEX IF EXISTS ak_results_docking_score")
+        conn.commit()
+        rtc.filter(eworst=-6, output_all_poses=True, top_k=3, bookmark_name="top_bm")
+        num_indices = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND name = 'ak_results_docking_score'"
+        ).fetchone()[0]
+        conn.close()
+        assert num_indices == 1
+
+        with pytest.raises(e.OptionError):
+            rtc.filter(eworst=-6, top_k=0)
+
+    def test_filter_batch(self):
+        rtc = RingtailCore("output.db")
+        filter_sets = [
+            {"eworst": -6},
+            {
+                "eworst": -6,
+                "hb_interactions": [("A:VAL:279:", True)],
+                "bookmark_name": "batch_hb",
+            },
+        ]
+        counts = rtc.filter_batch(filter_sets)
+        assert list(counts) == ["passing_results_0", "batch_hb"]
+        assert counts["passing_results_0"] == rtc.filter(
+            eworst=-6, bookmark_name="single_0"
+        )
+        assert counts["batch_hb"] == rtc.filter(
+            eworst=-6, hb_interactions=[("A:VAL:279:", True)], bookmark_name="single_1"
+        )
+
+        conn = sqlite3.connect("output.db")
+        cur = conn.cursor()
+        num_ligands = cur.execute(
+            "SELECT COUNT(DISTINCT LigName) FROM batch_hb"
+        ).fetchone()[0]
+        cur.close()
+        conn.close()
+        assert num_ligands == counts["batch_hb"]
+
+    def test_filter_batch_keeps_earlier_bookmarks(self):
+        rtc = RingtailCore("output.db")
+        rtc.filter_batch(
+            [
+                {"eworst": -6, "bookmark_name": "first_batch_0"},
+                {"eworst": -7, "bookmark_name": "first_batch_1"},
+            ]
+        )
+        conn = sqlite3.connect("output.db")
+        cur = conn.cursor()
+        queries = {
+            name: f"SELECT Pose_ID FROM {name} ORDER BY Pose_ID"
+            for name in ["first_batch_0", "first_batch_1"]
+        }
+        first_poses = {
+            name: cur.execute(query).fetchall() for name, query in queries.items()
+        }
+        # a second batch writes its own bitsets, the views of the first batch keep reading theirs
+        rtc.filter_batch(
+            [
+                {"eworst": -5, "bookmark_name": "second_batch_0"},
+                {"ebest": -7, "bookmark_name": "second_batch_1"},
+            ]
+        )
+        for name, query in queries.items():
+            assert cur.execute(query).fetchall() == first_poses[name]
+        cur.close()
+        conn.close()
+
+    def test_pose_id_set_tables(self):
+        rtc = RingtailCore("output.db")
+        count_clustered = rtc.filter(
+            ebest=-6, interaction_cluster=0.5, bookmark_name="clustered_bm"
+        )
+
+        conn = sqlite3.connect("output.db")
+        cur = conn.cursor()
+        view_sql = cur.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'clustered_bm'"
+        ).fetchone()[0]
+        pose_id_tables = [
+            table[0]
+            for table in cur.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'Pose_ID_set_%'"
+            ).fetchall()
+        ]
+        assert any(table in view_sql for table in pose_id_tables)
+        # cluster representatives are read from the table, not listed in the query
+        assert " OR R.Pose_ID = " not in view_sql
+        assert cur.execute("SELECT COUNT(*) FROM clustered_bm").fetchone()[0] == (
+            count_clustered
+        )
+        cur.close()
+        conn.close()
+
+    def test_butina_clusters(self):
+        import random
+        from rdkit import DataStructs
+        from rdkit.ML.Cluster import Butina
+        from ringtail.storagemanager import StorageManagerSQLite
+
+        rng = random.Random(0)
+        on_bits = [
+            sorted(rng.sample(range(128), rng.randint(0, 12))) for _ in range(200)
+        ]
+        fps = []
+        for bits in on_bits:
+            fp = DataStructs.ExplicitBitVect(128)
+            for bit in bits:
+                fp.SetBit(bit)
+            fps.append(fp)
+        dists = []
+        for i in range(1, len(fps)):
+            dists.extend(
+                [1 - sim for sim in DataStructs.BulkTanimotoSimilarity(fps[i], fps[:i])]
+            )
+        rdkit_clusters = Butina.ClusterData(dists, len(fps), 0.6, isDistData=True)
+
+        clusters = StorageManagerSQLite._butina_clusters(
+            StorageManagerSQLite._pack_fingerprints(on_bits, 128),
+            0.6,
+        )
+        assert [list(cluster) for cluster in clusters] == [
+            list(cluster) for cluster in rdkit_clusters
+        ]
+
+    def test_lsh_clusters(self):
+        from ringtail.storagemanager import StorageManagerSQLite
+
+        # fingerprints scattered around 50 centroids
+        rng = np.random.default_rng(0)
+        centroids = [rng.choice(1024, 40, replace=False) for _ in range(50)]
+        on_bits = [
+            centroids[i % 50][rng.random(40) > 0.15].tolist() for i in range(1000)
+        ]
+        fps = StorageManagerSQLite._pack_fingerprints(on_bits, 1024)
+        counts = StorageManagerSQLite._popcount(fps).sum(axis=1)
+        leffs = rng.random(1000)
+
+        num_clusters = {}
+        for num_bands in [4, 32]:
+            clusters = StorageManagerSQLite._lsh_clusters(fps, 0.5, leffs, num_bands)
+            assert sorted(i for cluster in clusters for i in cluster) == list(
+                range(1000)
+            )
+            for cluster in clusters:
+                members = list(cluster[1:])
+                common = StorageManagerSQLite._popcount(
+                    fps[members] & fps[cluster[0]]
+                ).sum(axis=1)
+                similarity = common / (counts[members] + counts[cluster[0]] - common)
+                assert (1 - similarity <= 0.5).all()
+            num_clusters[num_bands] = len(clusters)
+        exact_clusters = StorageManagerSQLite._butina_clusters(fps, 0.5)
+        # more bands miss fewer neighbors, getting closer to the exact clustering
+        assert len(exact_clusters) <= num_clusters[32] <= num_clusters[4]
+
+    def test_sphere_exclusion_clusters(self):
+        rtc = RingtailCore("output.db")
+        count_clustered = rtc.filter(
+            eworst=-6,
+            interaction_cluster=0.5,
+            cluster_method="sphere_exclusion",
+            bookmark_name="sphere_bm",
+        )
+
+        conn = sqlite3.connect("output.db")
+        cur = conn.cursor()
+        num_poses, num_clusters = cur.execute(
+            "SELECT COUNT(sphere_bm_ifp_0p5), COUNT(DISTINCT sphere_bm_ifp_0p5) FROM Ligand_clusters"
+        ).fetchone()
+        num_passing = cur.execute(
+            "SELECT COUNT(*) FROM Results WHERE docking_score < -6"
+        ).fetchone()[0]
+        cur.close()
+        conn.close()
+        # every pose passing the filters is in a cluster, and each cluster gives one representative
+        assert num_poses == num_passing
+        assert 0 < count_clustered <= num_clusters
+
+    def test_interaction_bitmaps(self):
+        rtc = RingtailCore("output.db")
+        interactions = {
+            "hb_interactions": [("A:VAL:279:", True), ("A:LYS:162:", False)],
+            "vdw_interactions": [("A:VAL:279:", True)],
+        }
+        count_bitmaps = rtc.filter(
+            eworst=-6, max_miss=1, bookmark_name="bitmap_bm", **interactions
+        )
+        # materialized bookmarks are filtered from the Interactions table
+        count_interactions = rtc.filter(
+            eworst=-6,
+            max_miss=1,
+            bookmark_name="interactions_bm",
+            materialize_bookmarks=True,
+            **interactions,
+        )
+        assert count_bitmaps == count_interactions
+
+        conn = sqlite3.connect("output.db")
+        cur = conn.cursor()
+        bookmark_query = cur.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'bitmap_bm'"
+        ).fetchone()[0]
+        cur.close()
+        conn.close()
+        assert "Interaction_poses_" in bookmark_query
+
+    def test_interaction_poses_tables_capped(self):
+        rtc = RingtailCore("output.db")
+        interactions = {"vdw_interactions": [("A:LYS:162:", True)]}
+        count_bitmaps = rtc.filter(bookmark_name="poses_table_bm", **interactions)
+        # once the maximum number of tables is kept, interaction filters do not write new ones
+        rtc.storageman._interaction_poses_max_tables = 0
+        count_capped = rtc.filter(
+            hb_interactions=[("A:LYS:162:", False)],
+            bookmark_name="capped_bm",
+            **interactions,
+        )
+        count_capped_same = rtc.filter(bookmark_name="capped_same_bm", **interactions)
+        assert count_capped_same == count_bitmaps
+
+        conn = sqlite3.connect("output.db")
+        cur = conn.cursor()
+        bookmark_queries = dict(
+            cur.execute(
+                "SELECT name, sql FROM sqlite_master WHERE name IN ('capped_bm', 'capped_same_bm')"
+            ).fetchall()
+        )
+        cur.close()
+        conn.close()
+        assert count_capped > 0
+        assert "Interaction_poses_" not in bookmark_queries["capped_bm"]
+        # existing tables are still reused
+        assert "Interaction_poses_" in bookmark_queries["capped_same_bm"]
+
+    def test_materialized_bookmark(self):
+        os.system("rm materialized.db")
+        rtc = RingtailCore("materialized.db")
+        rtc.add_results_from_files(file_path="test_data/adgpu/group1")
+        rtc.filter(eworst=-6, bookmark_name="mat_bm", materialize_bookmarks=True)
+        # new results are added to the materialized bookmark on ingest
+        rtc.add_results_from_files(file_path="test_data/adgpu/group2")
+
+        conn = sqlite3.connect("materialized.db")
+        cur = conn.cursor()
+        materialized = cur.execute(
+            "SELECT COUNT(*) FROM mat_bm_materialized"
+        ).fetchone()[0]
+        (source_query,) = cur.execute(
+            "SELECT source_query FROM Materialized_bookmarks WHERE Bookmark_name = 'mat_bm'"
+        ).fetchone()
+        expected = cur.execute(f"SELECT COUNT(*) FROM ({source_query})").fetchone()[0]
+        cur.close()
+        conn.close()
+        assert materialized == expected
+
+        rtc.drop_bookmark("mat_bm")
+        conn = sqlite3.connect("materialized.db")
+        cur = conn.cursor()
+        leftover = cur.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'mat_bm_materialized'"
+        ).fetchone()[0]
+        cur.close()
+        conn.close()
+        assert leftover == 0
+
+        # percentile cutoffs are fixed in the query, the bookmark is a plain view
+        rtc.filter(
+            score_percentile=10, bookmark_name="pct_bm", materialize_bookmarks=True
+        )
+        conn = sqlite3.connect("materialized.db")
+        cur = conn.cursor()
+        materialized = cur.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'pct_bm_materialized'"
+        ).fetchone()[0]
+        cur.close()
+        conn.close()
+        os.system("rm materialized.db")
+        assert materialized == 0
+
     def test_version_info(self):
         rtc = RingtailCore("output.db")
         with rtc.storageman:
@@ -688,6 +1414,26 @@ class TestLogger:
         assert log_level == "INFO"
 
 
+class TestImports:
+
+    def test_lazy_imports(self):
+        import subprocess
+        import sys
+
+        # guards the import time of ringtail: these modules account for nearly all of it,
+        # so checking they are not imported is a machine-independent regression test
+        heavy_modules = ("rdkit", "meeko", "matplotlib", "pandas", "multiprocess")
+        code = (
+            "import sys\n"
+            "import ringtail\n"
+            f"print([m for m in {heavy_modules} if m in sys.modules])"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout.splitlines()
+        assert output[0] == "[]"
+
+
 class TestOptions:
     def test_option_error(self):
         from ringtail import exceptions as e